@@ -18,10 +18,15 @@ def get_path(codename):
 
 TBMODELS_PATH = get_path('tbmodels')
 BANDS_INSPECT_PATH = get_path('bands-inspect')
+# The tbmodels code is installed with the system python3, which also
+# runs the driver script of the eigenvals calculation.
+PYTHON_PATH = get_path('python3')
 
 with open(sys.argv[1], 'r') as f:
     RES = f.read().format(
-        tbmodels_path=TBMODELS_PATH, bands_inspect_path=BANDS_INSPECT_PATH
+        tbmodels_path=TBMODELS_PATH,
+        bands_inspect_path=BANDS_INSPECT_PATH,
+        python_path=PYTHON_PATH
     )
 with open(sys.argv[2], 'w') as f:
     f.write(RES)
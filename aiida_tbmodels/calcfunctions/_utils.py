@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines helpers which are shared by the calcfunctions.
+"""
+
+import shutil
+import tempfile
+import contextlib
+
+MODEL_FILENAME = 'model_out.hdf5'
+
+
+@contextlib.contextmanager
+def temporary_directory():
+    """
+    Context manager which creates a temporary directory, and removes it with its content on exit.
+    """
+    dirpath = tempfile.mkdtemp()
+    try:
+        yield dirpath
+    finally:
+        shutil.rmtree(dirpath)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines calcfunctions which run the tbmodels commands in-process, through the TBmodels Python interface. They have the same inputs and outputs as the corresponding calculations, but do not go through the scheduler.
+
+These functions require the ``tbmodels`` package to be installed in the Python environment of the AiiDA daemon.
+"""
+
+import os
+import shutil
+
+import h5py
+import numpy as np
+
+from aiida.engine import calcfunction
+from aiida.plugins import DataFactory
+
+from ..calculations.parse import get_wannier_prefix, get_wannier_input_filenames
+from ..data.model import TbModelData
+from ..data.eigenvectors import EigenvectorsData, create_eigenvectors_file, copy_eigenvectors
+from ..io import DEFAULT_CHUNK_SIZE, get_band_slice
+from ..dos import DEFAULT_NUM_ENERGIES, get_bin_edges, add_histogram, create_dos_data
+from ..scripts.eigenvals_driver import sparse_eigenval, sparse_eigh
+from .kpoints import get_explicit_kpoints
+from ._utils import MODEL_FILENAME, temporary_directory
+
+
+def load_model(tb_model):
+    """
+    Load a TBmodels Model from a SinglefileData in TBmodels HDF5 format. For a TbModelData, the cached :meth:`.TbModelData.to_model` is used.
+    """
+    import tbmodels
+    if isinstance(tb_model, TbModelData):
+        return tb_model.to_model()
+    with tb_model.open(mode='rb') as in_file:
+        with h5py.File(in_file, 'r') as hdf5_handle:
+            return tbmodels.Model.from_hdf5(hdf5_handle)
+
+
+def model_to_singlefile(model):
+    """
+    Create a TbModelData containing the given TBmodels Model in HDF5 format.
+    """
+    with temporary_directory() as dirpath:
+        filepath = os.path.join(dirpath, MODEL_FILENAME)
+        model.to_hdf5_file(filepath)
+        return TbModelData(file=filepath)
+
+
+def load_symmetries(symmetries):
+    """
+    Load the content of a SinglefileData containing symmetries in HDF5 format.
+    """
+    import symmetry_representation as sr
+    # The symmetries are copied to a file because the legacy HDF5 format
+    # can only be loaded from a path.
+    with temporary_directory() as dirpath:
+        filepath = os.path.join(dirpath, 'symmetries.hdf5')
+        with symmetries.open(mode='rb') as in_file:
+            with open(filepath, 'wb') as out_file:
+                shutil.copyfileobj(in_file, out_file)
+        return sr.io.load(filepath)
+
+
+def _symmetrize(sym, model):
+    """
+    Symmetrize the model with the content of a symmetries file, which can be a (nested) list of symmetry groups or operations. This follows the 'tbmodels symmetrize' command.
+    """
+    import symmetry_representation as sr
+    if isinstance(sym, sr.SymmetryGroup):
+        return model.symmetrize(
+            symmetries=sym.symmetries, full_group=sym.full_group
+        )
+    if isinstance(sym, sr.SymmetryOperation):
+        return model.symmetrize(symmetries=[sym], full_group=False)
+    try:
+        for sub_sym in sym:
+            model = _symmetrize(sub_sym, model)
+    except TypeError:
+        raise ValueError(
+            "Invalid type '{}' for the symmetries.".format(type(sym))
+        )
+    return model
+
+
+def _get_window_slice(eigenvals, band_window, energy_window):
+    """
+    Return the slice of bands selected by the (optional) band and energy window List nodes, or None if no window is given.
+    """
+    if band_window is None and energy_window is None:
+        return None
+    band_slice = get_band_slice(
+        eigenvals.shape[1],
+        band_window=None if band_window is None else list(band_window),
+        energy_window=None if energy_window is None else list(energy_window),
+        band_extrema=(eigenvals.min(axis=0), eigenvals.max(axis=0))
+    )
+    if len(range(eigenvals.shape[1])[band_slice]) == 0:
+        raise ValueError(
+            'The band or energy window does not contain any of the calculated bands.'
+        )
+    return band_slice
+
+
+@calcfunction
+def eigenvals_inline(
+    tb_model,
+    kpoints,
+    band_window=None,
+    energy_window=None,
+    num_eigenvals=None,
+    target_energy=None,
+    eigenvectors=None
+):
+    """
+    Compute the eigenvalues of the tight-binding model at the given k-points, like the tbmodels.eigenvals calculation. The optional ``band_window`` and ``energy_window`` (List) correspond to the options of the calculation.
+
+    If ``num_eigenvals`` (Int) is given, only this number of eigenvalues closest to ``target_energy`` (Float, default 0) are computed at each k-point, with a sparse shift-invert solver instead of a dense diagonalization. This requires ``scipy``, and is intended for large models with sparse hopping matrices.
+
+    If ``eigenvectors`` (Bool) is True, the eigenvectors of the Hamiltonian (in the convention of :meth:`tbmodels.Model.hamilton`) are returned as an additional ``eigenvectors`` output of type :class:`.EigenvectorsData`. They are written to disk one k-point at a time, and never held in memory for all k-points.
+    """
+    model = load_model(tb_model)
+    bands = DataFactory('array.bands')()
+    # BandsData cannot have a mesh as k-points
+    if 'mesh' in kpoints.attributes:
+        bands.set_kpoints(kpoints.get_kpoints_mesh(print_list=True))
+    else:
+        bands.set_kpointsdata(kpoints)
+    kpoints_explicit = bands.get_kpoints()
+
+    if num_eigenvals is None:
+        target_energy = None
+
+        def eigh(k):
+            return np.linalg.eigh(model.hamilton(k))
+
+        def eigenval(k):
+            return model.eigenval(k)
+    else:
+        num_eigenvals = num_eigenvals.value
+        if not 0 < num_eigenvals < model.size:
+            raise ValueError(
+                "The number of eigenvalues must be between 1 and {} (the number of orbitals minus one), got '{}'."
+                .format(model.size - 1, num_eigenvals)
+            )
+        target_energy = 0. if target_energy is None else target_energy.value
+
+        def eigh(k):
+            return sparse_eigh(model, k, num_eigenvals, target_energy)
+
+        def eigenval(k):
+            return sparse_eigenval(model, k, num_eigenvals, target_energy)
+
+    result = {'bands': bands}
+    if eigenvectors is None or not eigenvectors.value:
+        eigenvals = np.array([eigenval(k) for k in kpoints_explicit])
+        band_slice = _get_window_slice(eigenvals, band_window, energy_window)
+    else:
+        with temporary_directory() as dirpath:
+            all_path = os.path.join(dirpath, 'eigenvectors_all.hdf5')
+            with h5py.File(all_path, 'w') as hdf5_handle:
+                eigenvals_dset = eigenvectors_dset = None
+                for i, k in enumerate(kpoints_explicit):
+                    eigenvals_k, eigenvectors_k = eigh(k)
+                    if eigenvectors_dset is None:
+                        eigenvals_dset, eigenvectors_dset = create_eigenvectors_file(
+                            hdf5_handle, kpoints_explicit,
+                            *eigenvectors_k.shape
+                        )
+                    eigenvals_dset[i] = eigenvals_k
+                    eigenvectors_dset[i] = eigenvectors_k
+                eigenvals = eigenvals_dset[()]
+            band_slice = _get_window_slice(
+                eigenvals, band_window, energy_window
+            )
+            if band_slice is None:
+                out_path = all_path
+            else:
+                out_path = os.path.join(dirpath, 'eigenvectors.hdf5')
+                copy_eigenvectors([all_path], out_path, band_slice)
+            result['eigenvectors'] = EigenvectorsData(file=out_path)
+
+    if target_energy is not None:
+        bands.set_attribute('target_energy', target_energy)
+    if band_slice is not None:
+        eigenvals = eigenvals[:, band_slice]
+        bands.set_attribute('first_band_index', band_slice.start)
+    bands.set_bands(eigenvals)
+    return result
+
+
+@calcfunction
+def dos_inline(
+    tb_model, kpoints, energy_range, num_energies=None, smearing=None
+):
+    """
+    Compute the density of states of the tight-binding model, like the tbmodels.dos calculation. The eigenvalues are computed ``DEFAULT_CHUNK_SIZE`` k-points at a time, and added to the histogram before the next chunk is computed. Because the eigenvalues are not kept, the ``energy_range`` (List) is required. The optional ``num_energies`` (Int) and ``smearing`` (Float) correspond to the options of the calculation.
+    """
+    model = load_model(tb_model)
+    kpoints_explicit = get_explicit_kpoints(kpoints)
+    smearing = None if smearing is None else smearing.value
+    bin_edges = get_bin_edges(
+        energy_range.get_list(),
+        DEFAULT_NUM_ENERGIES if num_energies is None else num_energies.value
+    )
+    histogram = np.zeros(len(bin_edges) - 1)
+    for start in range(0, len(kpoints_explicit), DEFAULT_CHUNK_SIZE):
+        eigenvals = np.array([
+            model.eigenval(k)
+            for k in kpoints_explicit[start:start + DEFAULT_CHUNK_SIZE]
+        ])
+        add_histogram(histogram, eigenvals, bin_edges)
+    return {
+        'dos':
+        create_dos_data(histogram, bin_edges, len(kpoints_explicit), smearing)
+    }
+
+
+@calcfunction
+def parse_inline(wannier_folder, pos_kind=None):
+    """
+    Create a tight-binding model from Wannier90 output, like the tbmodels.parse calculation.
+    """
+    import tbmodels
+    prefix = get_wannier_prefix(wannier_folder)
+    pos_kind = 'wannier' if pos_kind is None else pos_kind.value
+    with temporary_directory() as dirpath:
+        for filename in get_wannier_input_filenames(
+            wannier_folder.list_object_names(), prefix, pos_kind
+        ):
+            with wannier_folder.open(filename, 'rb') as in_file:
+                with open(os.path.join(dirpath, filename), 'wb') as out_file:
+                    shutil.copyfileobj(in_file, out_file)
+        model = tbmodels.Model.from_wannier_folder(
+            folder=dirpath,
+            prefix=prefix,
+            ignore_orbital_order=True,
+            pos_kind=pos_kind
+        )
+    return {'tb_model': model_to_singlefile(model)}
+
+
+@calcfunction
+def slice_inline(tb_model, slice_idx):
+    """
+    Re-order or slice the orbitals of a tight-binding model, like the tbmodels.slice calculation.
+    """
+    model = load_model(tb_model)
+    model_slice = model.slice_orbitals(slice_idx=list(slice_idx))
+    return {'tb_model': model_to_singlefile(model_slice)}
+
+
+@calcfunction
+def symmetrize_inline(tb_model, symmetries):
+    """
+    Symmetrize a tight-binding model with the given symmetries, like the tbmodels.symmetrize calculation.
+    """
+    model = load_model(tb_model)
+    model_sym = _symmetrize(load_symmetries(symmetries), model)
+    return {'tb_model': model_to_singlefile(model_sym)}
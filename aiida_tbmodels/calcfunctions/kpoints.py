@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines calcfunctions to split k-points into shards, and to merge the band structures calculated on these shards.
+"""
+
+import numpy as np
+
+from aiida.engine import calcfunction
+from aiida.plugins import DataFactory
+
+_SHARD_PREFIX = 'shard_'
+
+
+def get_explicit_kpoints(kpoints):
+    """
+    Return the explicit list of k-points contained in a KpointsData, also if the k-points are given as a mesh.
+    """
+    if 'mesh' in kpoints.attributes:
+        return np.array(kpoints.get_kpoints_mesh(print_list=True))
+    return np.array(kpoints.get_kpoints())
+
+
+def get_num_kpoints(kpoints):
+    """
+    Return the number of k-points in a KpointsData, without creating the explicit k-points of a mesh.
+    """
+    if 'mesh' in kpoints.attributes:
+        return int(np.prod(kpoints.get_kpoints_mesh()[0]))
+    return kpoints.get_shape('kpoints')[0]
+
+
+def get_symmetry_operations(symmetries):
+    """
+    Return the symmetry operations contained in a SinglefileData in symmetry_representation HDF5 format, as a list of (rotation matrix, time reversal) pairs. The file can contain (nested lists of) symmetry groups or operations. This requires the ``symmetry_representation`` package.
+    """
+    from .inline import load_symmetries
+    from .symmetries import flatten_symmetry_operations
+    operations = flatten_symmetry_operations(load_symmetries(symmetries))
+    return [(np.array(op.rotation_matrix), op.repr.has_cc)
+            for op in operations]
+
+
+def get_irreducible_mesh(mesh, offset, operations, tolerance=1e-6):
+    """
+    Reduce a k-point mesh with the given symmetry operations, which are (rotation matrix, time reversal) pairs acting on reduced real-space coordinates. The operations do not need to form a closed group, the orbits are closed by repeated application.
+
+    Returns the indices of the irreducible k-points in the explicit list of the mesh (see :meth:`KpointsData.get_kpoints_mesh`), and for each k-point of the mesh the position of its irreducible k-point in that list.
+    """
+    mesh = np.array(mesh)
+    offset = np.array(offset, dtype=float)
+    indices = np.mgrid[0:mesh[0], 0:mesh[1], 0:mesh[2]].reshape(3, -1).T
+    kpoints = (indices + offset) / mesh
+
+    images = []
+    for rotation_matrix, time_reversal in operations:
+        k_rotation = np.linalg.inv(rotation_matrix).T
+        if time_reversal:
+            k_rotation = -k_rotation
+        image_indices = np.dot(kpoints, k_rotation.T) * mesh - offset
+        rounded = np.round(image_indices)
+        on_mesh = np.all(abs(image_indices - rounded) < tolerance, axis=1)
+        rounded = np.mod(rounded.astype(int), mesh)
+        image = np.ravel_multi_index(rounded.T, mesh)
+        images.append((np.flatnonzero(on_mesh), image[on_mesh]))
+
+    # Propagate the smallest index within each orbit until it is stable.
+    representative = np.arange(len(kpoints))
+    while True:
+        updated = representative.copy()
+        for source, image in images:
+            np.minimum.at(updated, source, representative[image])
+            np.minimum.at(updated, image, representative[source])
+        if np.all(updated == representative):
+            break
+        representative = updated
+    irreducible, mapping = np.unique(representative, return_inverse=True)
+    return irreducible, mapping
+
+
+def reduce_kpoints_mesh(kpoints, symmetries):
+    """
+    Reduce the k-point mesh of a KpointsData with the symmetries contained in a SinglefileData. Returns the explicit irreducible k-points, and for each k-point of the mesh the index of its irreducible k-point.
+    """
+    if 'mesh' not in kpoints.attributes:
+        raise ValueError(
+            'The k-points can only be reduced by symmetry if they are given as a mesh.'
+        )
+    mesh, offset = kpoints.get_kpoints_mesh()
+    irreducible, mapping = get_irreducible_mesh(
+        mesh, offset, get_symmetry_operations(symmetries)
+    )
+    return get_explicit_kpoints(kpoints)[irreducible], mapping
+
+
+def get_shard_label(index):
+    """
+    Return the link label used for the shard with the given index.
+    """
+    return '{}{}'.format(_SHARD_PREFIX, index)
+
+
+def _get_shard_index(label):
+    return int(label[len(_SHARD_PREFIX):])
+
+
+def _copy_cell(source, target):
+    if 'cell' in source.attributes:
+        target.set_cell(source.cell, pbc=source.pbc)
+
+
+def get_bands_data(kpoints, eigenvals):
+    """
+    Create a BandsData with the given eigenvalues at the k-points of a KpointsData. The cell, periodic boundary conditions, labels and weights of explicit k-points are kept. A mesh is converted to explicit k-points, keeping its cell.
+    """
+    bands = DataFactory('array.bands')()
+    if 'mesh' in kpoints.attributes:
+        _copy_cell(kpoints, bands)
+        bands.set_kpoints(get_explicit_kpoints(kpoints))
+    else:
+        bands.set_kpointsdata(kpoints)
+    bands.set_bands(eigenvals)
+    return bands
+
+
+def _get_kpoints_part(kpoints, kpoints_explicit, start, stop):
+    """
+    Create an explicit KpointsData with the k-points ``start:stop`` of the given KpointsData, keeping its cell and the labels and weights of these k-points.
+    """
+    part = DataFactory('array.kpoints')()
+    _copy_cell(kpoints, part)
+    labels = None
+    weights = None
+    if 'mesh' not in kpoints.attributes:
+        labels = [(index - start, label)
+                  for index, label in kpoints.labels or []
+                  if start <= index < stop] or None
+        if 'weights' in kpoints.get_arraynames():
+            weights = kpoints.get_array('weights')[start:stop]
+    part.set_kpoints(
+        kpoints_explicit[start:stop], labels=labels, weights=weights
+    )
+    return part
+
+
+@calcfunction
+def split_kpoints(kpoints, num_shards):
+    """
+    Split the k-points into ``num_shards`` explicit KpointsData of approximately equal size, keeping the original order. The cell, and the labels and weights of explicit k-points are kept.
+    """
+    num_shards = num_shards.value
+    if num_shards < 1:
+        raise ValueError(
+            "The number of shards must be positive, got '{}'.".
+            format(num_shards)
+        )
+    kpoints_explicit = get_explicit_kpoints(kpoints)
+    num_kpoints = len(kpoints_explicit)
+    num_parts = min(num_shards, num_kpoints)
+    bounds = [i * num_kpoints // num_parts for i in range(num_parts + 1)]
+    return {
+        get_shard_label(i):
+        _get_kpoints_part(kpoints, kpoints_explicit, start, stop)
+        for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))
+    }
+
+
+@calcfunction
+def merge_bands(kpoints, **bands):
+    """
+    Merge the band structures calculated on the shards created by :func:`split_kpoints` into a single BandsData, at the original ``kpoints``.
+    """
+    labels = sorted(bands, key=_get_shard_index)
+    eigenvals = np.concatenate([bands[label].get_bands() for label in labels])
+    num_kpoints = get_num_kpoints(kpoints)
+    if len(eigenvals) != num_kpoints:
+        raise ValueError(
+            'The number of k-points in the merged bands ({}) does not match the number of input k-points ({}).'
+            .format(len(eigenvals), num_kpoints)
+        )
+    return get_bands_data(kpoints, eigenvals)
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the calcfunction which assigns the results of a tbmodels.packed calculation to the individual tasks.
+"""
+
+from aiida.engine import calcfunction
+
+
+@calcfunction
+def unpack_task(tb_model, result, kpoints=None, slice_idx=None):  # pylint: disable=unused-argument
+    """
+    Return a copy of the ``result`` of a single task of a packed calculation, with the model and the ``kpoints`` (for 'eigenvals') or ``slice_idx`` (for 'slice') of the task as inputs. The output node is thus linked to the inputs of its own task, instead of all inputs of the packed calculation.
+    """
+    return result.clone()
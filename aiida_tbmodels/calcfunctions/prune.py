@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.prune calcfunction, which removes small and long-range hoppings from a tight-binding model.
+"""
+
+import os
+
+import h5py
+import numpy as np
+
+from aiida.orm import Float
+from aiida.engine import calcfunction
+
+from ..data.model import TbModelData
+from .kpoints import get_explicit_kpoints
+from ._utils import MODEL_FILENAME, temporary_directory
+
+_KPOINTS_CHUNK_SIZE = 64
+
+
+def read_hopping_entry(entry, size):
+    """
+    Read an entry of the 'hop' group of a model in TBmodels HDF5 format. Returns the R-vector, and the row indices, column indices and values of the non-zero hopping elements. The hopping matrix can be dense, or sparse in CSR format (with ``sparse=True`` in TBmodels), and is never created as a dense matrix in the latter case.
+    """
+    r_vec = np.array(entry['R'][()], dtype=int)
+    csr_group = entry.get('mat', entry)
+    if isinstance(csr_group, h5py.Group):
+        indptr = csr_group['indptr'][()]
+        rows = np.repeat(np.arange(size), np.diff(indptr))
+        cols = csr_group['indices'][()]
+        values = np.array(csr_group['data'][()], dtype=complex)
+        nonzero = values != 0
+        return r_vec, rows[nonzero], cols[nonzero], values[nonzero]
+    mat = np.array(csr_group[()], dtype=complex)
+    rows, cols = np.nonzero(mat)
+    return r_vec, rows, cols, mat[rows, cols]
+
+
+def iter_hoppings(model_group):
+    """
+    Iterate over the hoppings of a model in TBmodels HDF5 format, one R-vector at a time, in the form returned by :func:`read_hopping_entry`.
+    """
+    size = int(model_group['size'][()])
+    hop_group = model_group['hop']
+    for key in sorted(hop_group, key=int):
+        yield read_hopping_entry(hop_group[key], size)
+
+
+def _is_on_site(r_vec, rows, cols):
+    return (rows == cols) & (not np.any(r_vec))
+
+
+def get_max_hopping(model_group):
+    """
+    Return the largest absolute value of the hoppings of a model in TBmodels HDF5 format, excluding the on-site energies.
+    """
+    max_abs = 0.
+    for r_vec, rows, cols, values in iter_hoppings(model_group):
+        off_site = ~_is_on_site(r_vec, rows, cols)
+        if np.any(off_site):
+            max_abs = max(max_abs, np.abs(values[off_site]).max())
+    return max_abs
+
+
+def get_hopping_mask(
+    r_vec, rows, cols, values, pos, cell=None, min_abs=0., cutoff=None
+):
+    """
+    Return the boolean mask of the hopping elements of one R-vector which are kept. The hoppings with an absolute value below ``min_abs`` are removed. If ``cutoff`` is given, the hoppings between orbitals which are further apart than the cutoff are removed. The distance is in the Cartesian coordinates of the ``cell``, or in reduced coordinates if no cell is given. The on-site energies are always kept.
+    """
+    mask = np.abs(values) >= min_abs
+    if cutoff is not None:
+        # The hopping hop[i, j] of R-vector R connects orbital i in the home
+        # cell with orbital j in the cell R.
+        delta = r_vec + pos[cols] - pos[rows]
+        if cell is not None:
+            delta = np.dot(delta, cell)
+        mask &= np.linalg.norm(delta, axis=-1) <= cutoff
+    return mask | _is_on_site(r_vec, rows, cols)
+
+
+def get_eigenvals(model_group, kpoints):
+    """
+    Compute the eigenvalues of a model in TBmodels HDF5 format at the (reduced) k-points. Like in TBmodels, the hermitian conjugate of the hopping terms is added. The Hamiltonians are built for ``_KPOINTS_CHUNK_SIZE`` k-points at a time, reading the hoppings one R-vector at a time.
+    """
+    size = int(model_group['size'][()])
+    eigenvals = []
+    for start in range(0, len(kpoints), _KPOINTS_CHUNK_SIZE):
+        k_chunk = kpoints[start:start + _KPOINTS_CHUNK_SIZE]
+        ham = np.zeros((len(k_chunk), size, size), dtype=complex)
+        for r_vec, rows, cols, values in iter_hoppings(model_group):
+            phases = np.exp(2j * np.pi * np.dot(k_chunk, r_vec))
+            ham[:, rows, cols] += np.outer(phases, values)
+        ham += np.conjugate(np.swapaxes(ham, 1, 2))
+        eigenvals.append(np.linalg.eigvalsh(ham))
+    return np.concatenate(eigenvals)
+
+
+def _write_hopping_entry(entry, r_vec, rows, cols, values, size, sparse):
+    """
+    Write the R-vector and hopping matrix of an entry of the 'hop' group, as dense matrix or in the CSR format of TBmodels.
+    """
+    entry['R'] = r_vec
+    if sparse:
+        order = np.lexsort((cols, rows))
+        entry['data'] = values[order]
+        entry['indices'] = cols[order]
+        entry['indptr'] = np.concatenate(
+            [[0], np.cumsum(np.bincount(rows, minlength=size))]
+        )
+        entry['shape'] = (size, size)
+    else:
+        mat = np.zeros((size, size), dtype=complex)
+        mat[rows, cols] = values
+        entry['mat'] = mat
+
+
+def _write_pruned_model(in_file, out_file, sparse, **kwargs):
+    """
+    Copy a model in TBmodels HDF5 format, removing the hoppings which are not selected by :func:`get_hopping_mask` with the given keyword arguments. The R-vectors which no longer contain any hopping are removed. The hoppings are processed one R-vector at a time.
+    """
+    in_model = in_file.get('tb_model', in_file)
+    groups = [(in_file, out_file)]
+    if in_model is in_file:
+        out_model = out_file
+    else:
+        out_model = out_file.create_group('tb_model')
+        groups.append((in_model, out_model))
+    # The hoppings are not copied, because HDF5 does not free the space
+    # of deleted datasets.
+    for in_group, out_group in groups:
+        for key in in_group:
+            if key not in ('tb_model', 'hop', 'sparse'):
+                in_group.copy(key, out_group)
+    out_model['sparse'] = sparse
+    size = int(in_model['size'][()])
+    pos = in_model['pos'][()]
+    cell = in_model['uc'][()] if 'uc' in in_model else None
+    hop_group = out_model.create_group('hop')
+    for r_vec, rows, cols, values in iter_hoppings(in_model):
+        mask = get_hopping_mask(
+            r_vec, rows, cols, values, pos, cell=cell, **kwargs
+        )
+        if not np.any(mask) and np.any(r_vec):
+            continue
+        _write_hopping_entry(
+            hop_group.create_group(str(len(hop_group))),
+            r_vec,
+            rows[mask],
+            cols[mask],
+            values[mask],
+            size=size,
+            sparse=sparse
+        )
+
+
+def _is_sparse(model_group):
+    """
+    Check if the hopping matrices of a model in TBmodels HDF5 format are stored in CSR format.
+    """
+    if 'sparse' in model_group:
+        return bool(model_group['sparse'][()])
+    return any(
+        'mat' not in entry or isinstance(entry['mat'], h5py.Group)
+        for entry in model_group['hop'].values()
+    )
+
+
+@calcfunction
+def prune(
+    tb_model,
+    threshold=None,
+    relative_threshold=None,
+    cutoff=None,
+    kpoints=None,
+    sparse=None
+):
+    """
+    Remove the hoppings of a tight-binding model which are below the absolute ``threshold`` or the ``relative_threshold`` (relative to the largest hopping), or which connect orbitals further apart than the ``cutoff`` distance (all Float). The R-vectors which no longer contain any hopping are removed. The on-site energies are always kept.
+
+    The hopping matrices are read and written one R-vector at a time, so that only the hoppings of a single R-vector are held in memory. If ``sparse`` (Bool) is True, the pruned hopping matrices are stored in CSR format (like ``sparse=True`` in TBmodels), otherwise as dense matrices. By default, the format of the input model is kept.
+
+    If ``kpoints`` are given, the maximum absolute difference between the eigenvalues of the original and the pruned model at these k-points is returned as ``band_error`` output.
+
+    In contrast to the other calculations, this does not run a TBmodels command, but edits the HDF5 file directly. It does not require the ``tbmodels`` package.
+    """
+    threshold, relative_threshold, cutoff = [
+        None if value is None else value.value
+        for value in [threshold, relative_threshold, cutoff]
+    ]
+    with tb_model.open(mode='rb') as in_handle:
+        with h5py.File(in_handle, 'r') as in_file:
+            in_model = in_file.get('tb_model', in_file)
+            min_abs = 0. if threshold is None else threshold
+            if relative_threshold is not None:
+                min_abs = max(
+                    min_abs, relative_threshold * get_max_hopping(in_model)
+                )
+            with temporary_directory() as dirpath:
+                out_path = os.path.join(dirpath, MODEL_FILENAME)
+                with h5py.File(out_path, 'w') as out_file:
+                    _write_pruned_model(
+                        in_file,
+                        out_file,
+                        sparse=_is_sparse(in_model)
+                        if sparse is None else sparse.value,
+                        min_abs=min_abs,
+                        cutoff=cutoff
+                    )
+                    if kpoints is not None:
+                        kpoints_explicit = get_explicit_kpoints(kpoints)
+                        band_error = np.max(
+                            np.abs(
+                                get_eigenvals(in_model, kpoints_explicit) -
+                                get_eigenvals(
+                                    out_file.get('tb_model', out_file),
+                                    kpoints_explicit
+                                )
+                            )
+                        )
+                result = {'tb_model': TbModelData(file=out_path)}
+
+    if kpoints is not None:
+        result['band_error'] = Float(float(band_error))
+    return result
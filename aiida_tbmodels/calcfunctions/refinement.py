@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines calcfunctions to adaptively refine a k-point mesh in the regions where the band structure has features, such as near-degeneracies or crossings of the Fermi level.
+
+The k-points are tracked as integer coordinates on the finest grid which can be reached, with ``denominators`` points along each reciprocal lattice vector. The regions which can be refined are cubic cells given by the integer coordinates of their origin and their size.
+"""
+
+import itertools
+
+import numpy as np
+
+from aiida.engine import calcfunction
+from aiida.plugins import DataFactory
+
+_ITERATION_PREFIX = 'iteration_'
+
+
+def get_iteration_label(index):
+    """
+    Return the label used for the band structure computed in the refinement iteration with the given index.
+    """
+    return '{}{}'.format(_ITERATION_PREFIX, index)
+
+
+def _get_iteration_index(label):
+    return int(label[len(_ITERATION_PREFIX):])
+
+
+@calcfunction
+def get_initial_cells(kpoints, refinement_factor, num_iterations):
+    """
+    Create the cells of a Gamma-centered k-point mesh, for a refinement with the given factor and maximum number of iterations (both Int). Returns an ArrayData with the 'origins' and 'sizes' of the cells, and the 'denominators' of the finest grid.
+    """
+    mesh, offset = kpoints.get_kpoints_mesh()
+    if np.any(offset):
+        raise ValueError('The k-point mesh must be Gamma-centered.')
+    mesh = np.array(mesh)
+    size = refinement_factor.value**num_iterations.value
+    cells = DataFactory('array')()
+    cells.set_array(
+        'origins',
+        np.mgrid[0:mesh[0], 0:mesh[1], 0:mesh[2]].reshape(3, -1).T * size
+    )
+    cells.set_array('sizes', np.full(int(np.prod(mesh)), size, dtype=int))
+    cells.set_array('denominators', mesh * size)
+    return cells
+
+
+def _get_cell_flags(
+    corner_eigenvals, gap_threshold, fermi_energy, energy_variation
+):
+    """
+    Check if a cell needs to be refined, given the eigenvalues at its corners.
+    """
+    band_min = corner_eigenvals.min(axis=0)
+    band_max = corner_eigenvals.max(axis=0)
+    if gap_threshold is not None and corner_eigenvals.shape[1] > 1:
+        gaps = np.diff(corner_eigenvals, axis=1)
+        if np.min(gaps) < gap_threshold:
+            return True
+    if fermi_energy is not None:
+        if np.any((band_min < fermi_energy) & (band_max > fermi_energy)):
+            return True
+    if energy_variation is not None:
+        if np.any(band_max - band_min > energy_variation):
+            return True
+    return False
+
+
+@calcfunction
+def refine_kpoints(
+    cells,
+    refinement_factor,
+    gap_threshold=None,
+    fermi_energy=None,
+    energy_variation=None,
+    **bands
+):
+    """
+    Select the cells which contain a feature of the band structure, and split them into ``refinement_factor**3`` smaller cells. A cell is selected if the gap between two adjacent bands at its corners is smaller than ``gap_threshold``, if a band crosses the ``fermi_energy``, or if a band varies by more than ``energy_variation`` within the cell.
+
+    The ``bands`` are the band structures computed in the previous iterations, passed as keyword arguments with the labels of :func:`get_iteration_label`.
+
+    Returns the ``cells`` which are refined in the next iteration, and the new ``kpoints`` at their corners which have not been computed before. The ``kpoints`` output is missing if no cell is refined.
+    """
+    factor = refinement_factor.value
+    gap_threshold = None if gap_threshold is None else gap_threshold.value
+    fermi_energy = None if fermi_energy is None else fermi_energy.value
+    energy_variation = None if energy_variation is None else energy_variation.value
+
+    denominators = cells.get_array('denominators')
+    labels = sorted(bands, key=_get_iteration_index)
+    eigenvals = np.concatenate([bands[label].get_bands() for label in labels])
+    known = {
+        tuple(key): i
+        for i, key in enumerate(
+            np.mod(
+                np.round(
+                    np.concatenate([
+                        bands[label].get_kpoints() for label in labels
+                    ]) * denominators
+                ).astype(int), denominators
+            )
+        )
+    }
+    corners = np.array(list(itertools.product([0, 1], repeat=3)))
+
+    new_origins = []
+    new_sizes = []
+    new_points = {}
+    for origin, size in zip(
+        cells.get_array('origins'), cells.get_array('sizes')
+    ):
+        if size < factor:
+            continue
+        corner_keys = [
+            tuple(np.mod(origin + size * corner, denominators))
+            for corner in corners
+        ]
+        corner_eigenvals = eigenvals[[known[key] for key in corner_keys]]
+        if not _get_cell_flags(
+            corner_eigenvals, gap_threshold, fermi_energy, energy_variation
+        ):
+            continue
+        sub_size = size // factor
+        for offset in itertools.product(range(factor), repeat=3):
+            new_origins.append(origin + sub_size * np.array(offset))
+            new_sizes.append(sub_size)
+        for offset in itertools.product(range(factor + 1), repeat=3):
+            key = tuple(
+                np.mod(origin + sub_size * np.array(offset), denominators)
+            )
+            if key not in known:
+                new_points[key] = None
+
+    new_cells = DataFactory('array')()
+    new_cells.set_array(
+        'origins',
+        np.array(new_origins, dtype=int).reshape(-1, 3)
+    )
+    new_cells.set_array('sizes', np.array(new_sizes, dtype=int))
+    new_cells.set_array('denominators', denominators)
+    result = {'cells': new_cells}
+    if new_points:
+        kpoints = DataFactory('array.kpoints')()
+        first = bands[labels[0]]
+        if 'cell' in first.attributes:
+            kpoints.set_cell(first.cell, pbc=first.pbc)
+        kpoints.set_kpoints(np.array(list(new_points)) / denominators)
+        result['kpoints'] = kpoints
+    return result
+
+
+@calcfunction
+def concatenate_bands(**bands):
+    """
+    Concatenate the k-points and eigenvalues of the band structures computed in the refinement iterations, in the order of the iterations.
+    """
+    labels = sorted(bands, key=_get_iteration_index)
+    result = DataFactory('array.bands')()
+    first = bands[labels[0]]
+    if 'cell' in first.attributes:
+        result.set_cell(first.cell, pbc=first.pbc)
+    result.set_kpoints(
+        np.concatenate([bands[label].get_kpoints() for label in labels])
+    )
+    result.set_bands(
+        np.concatenate([bands[label].get_bands() for label in labels])
+    )
+    return result
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines a calcfunction to expand symmetries into the full symmetry group, such that the group does not need to be generated each time a model is symmetrized.
+"""
+
+import os
+
+import numpy as np
+
+from aiida.engine import calcfunction
+from aiida.plugins import DataFactory
+
+from .inline import load_symmetries
+from ._utils import temporary_directory
+
+_MAX_GROUP_ORDER = 10000
+
+
+def flatten_symmetry_operations(sym):
+    """
+    Return the list of symmetry operations contained in the given (nested lists of) symmetry groups or operations of the ``symmetry_representation`` package.
+    """
+    import symmetry_representation as sr
+    if isinstance(sym, sr.SymmetryGroup):
+        return [
+            op for sub_sym in sym.symmetries
+            for op in flatten_symmetry_operations(sub_sym)
+        ]
+    if isinstance(sym, sr.SymmetryOperation):
+        return [sym]
+    try:
+        return [
+            op for sub_sym in sym
+            for op in flatten_symmetry_operations(sub_sym)
+        ]
+    except TypeError:
+        raise ValueError(
+            "Invalid type '{}' for the symmetries.".format(type(sym))
+        )
+
+
+def _compose(first, second):
+    # Equivalent to 'first @ second', written out such that the module can
+    # still be imported on Python 2.
+    return first.__matmul__(second)
+
+
+def _get_key(op):
+    """
+    Return a hashable key of the rotation and time reversal of a symmetry operation. Operations with different keys are never equal.
+    """
+    return (
+        tuple(np.round(op.rotation_matrix).astype(int).flatten()),
+        bool(op.repr.has_cc)
+    )
+
+
+def _is_equal(first, second, tolerance):
+    """
+    Check if two symmetry operations with the same key are equal, including their translation and representation.
+    """
+    translations = [
+        getattr(op, 'translation_vector', None) for op in (first, second)
+    ]
+    if all(translation is not None for translation in translations):
+        difference = np.array(translations[0]) - np.array(translations[1])
+        if not np.allclose(difference, np.round(difference), atol=tolerance):
+            return False
+    return np.allclose(first.repr.matrix, second.repr.matrix, atol=tolerance)
+
+
+def get_group_closure(operations, tolerance=1e-6):
+    """
+    Return all symmetry operations of the group generated by the given operations, by composing the operations until no new ones are found.
+    """
+    group = []
+    group_by_key = {}
+
+    def _add(op):
+        candidates = group_by_key.setdefault(_get_key(op), [])
+        if any(_is_equal(op, existing, tolerance) for existing in candidates):
+            return False
+        candidates.append(op)
+        group.append(op)
+        if len(group) > _MAX_GROUP_ORDER:
+            raise ValueError(
+                'The symmetry operations do not generate a finite group.'
+            )
+        return True
+
+    new_operations = [op for op in operations if _add(op)]
+    generators = list(new_operations)
+    while new_operations:
+        new_operations = [
+            product for product in (
+                _compose(op, generator) for op in new_operations
+                for generator in generators
+            ) if _add(product)
+        ]
+    return group
+
+
+@calcfunction
+def expand_symmetries(symmetries):
+    """
+    Expand the symmetries (in symmetry_representation HDF5 format) into the full symmetry group which they generate, with all its operations and representation matrices. The result is a single symmetry group with ``full_group`` set, and the number of operations in the ``num_operations`` attribute.
+
+    Symmetrizing a model with the expanded symmetries averages over the full group directly, instead of generating it from the given operations. When passed to the tbmodels.symmetrize calculation, the ``--full-group`` flag is set. This requires the ``symmetry_representation`` package.
+    """
+    import symmetry_representation as sr
+    group = get_group_closure(
+        flatten_symmetry_operations(load_symmetries(symmetries))
+    )
+    with temporary_directory() as dirpath:
+        filepath = os.path.join(dirpath, 'symmetries.hdf5')
+        sr.io.save(
+            sr.SymmetryGroup(symmetries=group, full_group=True), filepath
+        )
+        result = DataFactory('singlefile')(file=filepath)
+    result.set_attribute('full_group', True)
+    result.set_attribute('num_operations', len(group))
+    return {'symmetries': result}
@@ -6,31 +6,42 @@
 Defines the base classes for tbmodels calculations.
 """
 
+import os
+
 import six
 
-from aiida.orm import SinglefileData
+from aiida.orm import SinglefileData, RemoteData
 from aiida.engine import CalcJob
-from aiida.common import CalcInfo, CodeInfo
+from aiida.common import CalcInfo, CodeInfo, InputValidationError
+
+from ..data.model import TbModelData
 
 
 class TbmodelsBase(CalcJob):
     """
     General base class for calculations which run the tbmodels code.
     """
+
+    # Calculations which do not write a single output file set this to
+    # None, and have no 'output_filename' option.
+    _DEFAULT_OUTPUT_FILE = None
+
     @classmethod
     def define(cls, spec):
         super(TbmodelsBase, cls).define(spec)
 
-        spec.input(
-            'metadata.options.output_filename',
-            valid_type=six.string_types,
-            default=cls._DEFAULT_OUTPUT_FILE
-        )
+        if cls._DEFAULT_OUTPUT_FILE is not None:
+            spec.input(
+                'metadata.options.output_filename',
+                valid_type=six.string_types,
+                default=cls._DEFAULT_OUTPUT_FILE
+            )
 
     def prepare_for_submission(self, tempfolder):  # pylint: disable=unused-argument,arguments-differ
         calcinfo = CalcInfo()
         calcinfo.uuid = self.uuid
         calcinfo.remote_copy_list = []
+        calcinfo.remote_symlink_list = []
 
         codeinfo = CodeInfo()
         codeinfo.code_uuid = self.inputs.code.uuid
@@ -38,6 +49,21 @@ class TbmodelsBase(CalcJob):
 
         return calcinfo, codeinfo
 
+    def _get_num_cores(self):
+        """
+        Return the number of cores provided by the scheduler resources, or None if it cannot be determined from the resources.
+        """
+        resources = self.inputs.metadata.options.resources
+        if 'tot_num_mpiprocs' in resources:
+            num_cores = resources['tot_num_mpiprocs']
+        elif 'num_mpiprocs_per_machine' in resources:
+            num_cores = resources['num_mpiprocs_per_machine'] * resources.get(
+                'num_machines', 1
+            )
+        else:
+            return None
+        return num_cores * resources.get('num_cores_per_mpiproc', 1)
+
 
 class ModelOutputBase(TbmodelsBase):
     """
@@ -45,6 +71,8 @@ class ModelOutputBase(TbmodelsBase):
     """
 
     _DEFAULT_OUTPUT_FILE = 'model_out.hdf5'
+    _MODEL_INFO_FILE = 'model_info.txt'
+    _MODEL_STORAGE_MODES = ('repository', 'remote')
 
     @classmethod
     def define(cls, spec):
@@ -55,17 +83,90 @@ class ModelOutputBase(TbmodelsBase):
             valid_type=six.string_types,
             default='tbmodels.model'
         )
+        spec.input(
+            'metadata.options.model_storage',
+            valid_type=six.string_types,
+            default='repository',
+            help=
+            "Where the output model is stored: 'repository' stores it once in the AiiDA repository, 'remote' keeps it on the remote computer and only retrieves its checksum and size."
+        )
+        spec.input(
+            'metadata.options.model_compression',
+            valid_type=six.string_types,
+            required=False,
+            help=
+            "HDF5 compression filter ('gzip' or 'lzf') applied to the hopping matrices of the output model before it is stored in the repository. Matrices smaller than 64 KiB are not compressed, since the filter overhead would make the file larger."
+        )
+        spec.input(
+            'metadata.options.model_compression_opts',
+            valid_type=int,
+            required=False,
+            help=
+            "Options of the compression filter, for example the gzip compression level."
+        )
+        spec.input(
+            'metadata.options.model_chunks',
+            valid_type=(list, tuple),
+            required=False,
+            help="Chunk shape of the hopping matrices in the output model."
+        )
+        spec.input(
+            'metadata.options.model_float32',
+            valid_type=bool,
+            default=False,
+            help=
+            "Store the hopping matrices of the output model in single precision."
+        )
 
         spec.output(
             'tb_model',
-            valid_type=SinglefileData,
-            help="Output model in TBmodels HDF5 format."
+            valid_type=(TbModelData, RemoteData),
+            help=
+            "Output model in TBmodels HDF5 format. If the model is kept on the remote computer, this is a RemoteData pointing to the calculation folder, with 'filename', 'sha256' and 'size' attributes."
         )
 
     def prepare_for_submission(self, tempfolder):
         calcinfo, codeinfo = super(ModelOutputBase,
                                    self).prepare_for_submission(tempfolder)
-        calcinfo.retrieve_list = [self.inputs.metadata.options.output_filename]
+        options = self.inputs.metadata.options
+        output_filename = options.output_filename
+        model_storage = options.model_storage
+        model_compression = options.get('model_compression', None)
+        if model_compression not in (None, 'gzip', 'lzf'):
+            raise InputValidationError(
+                "Invalid 'model_compression' option '{}', must be 'gzip' or 'lzf'."
+                .format(model_compression)
+            )
+        if model_storage == 'repository':
+            # The model is retrieved to a temporary folder, to avoid
+            # storing it both in the retrieved folder and the output.
+            calcinfo.retrieve_list = []
+            calcinfo.retrieve_temporary_list = [output_filename]
+        elif model_storage == 'remote':
+            # The layout is applied by the parser, after retrieval.
+            layout_options = [
+                name for name in [
+                    'model_compression', 'model_compression_opts',
+                    'model_chunks'
+                ] if options.get(name, None) is not None
+            ]
+            if options.model_float32:
+                layout_options.append('model_float32')
+            if layout_options:
+                raise InputValidationError(
+                    "The options {} cannot be used for a model kept on the remote computer."
+                    .format(layout_options)
+                )
+            calcinfo.append_text = (
+                "echo \"$(sha256sum '{0}' | cut -d ' ' -f 1) $(wc -c < '{0}')\" > {1}"
+                .format(output_filename, self._MODEL_INFO_FILE)
+            )
+            calcinfo.retrieve_list = [self._MODEL_INFO_FILE]
+        else:
+            raise InputValidationError(
+                "Invalid 'model_storage' option '{}', must be one of {}.".
+                format(model_storage, self._MODEL_STORAGE_MODES)
+            )
         return calcinfo, codeinfo
 
 
@@ -79,19 +180,55 @@ class ModelInputBase(TbmodelsBase):
 
         spec.input(
             'tb_model',
-            valid_type=SinglefileData,
-            help="Input model in TBmodels HDF5 format."
+            valid_type=(SinglefileData, RemoteData),
+            help=
+            "Input model in TBmodels HDF5 format. If a RemoteData is given, the model is copied or symlinked on the remote computer instead of being uploaded."
+        )
+        spec.input(
+            'metadata.options.remote_model_filename',
+            valid_type=six.string_types,
+            default=ModelOutputBase._DEFAULT_OUTPUT_FILE,  # pylint: disable=protected-access
+            help=
+            "Name of the model file inside the 'tb_model' folder, if it is given as RemoteData."
+        )
+        spec.input(
+            'metadata.options.symlink_remote_model',
+            valid_type=bool,
+            default=False,
+            help=
+            "Symlink the model instead of copying it, if 'tb_model' is given as RemoteData."
         )
 
     def prepare_for_submission(self, tempfolder):
-        super(ModelInputBase, self).prepare_for_submission(tempfolder)
-
         model_file = self.inputs.tb_model
 
         calcinfo, codeinfo = super(ModelInputBase,
                                    self).prepare_for_submission(tempfolder)
-        calcinfo.local_copy_list = [
-            (model_file.uuid, model_file.filename, 'model.hdf5')
-        ]
+        if isinstance(model_file, RemoteData):
+            computer = self.inputs.code.computer
+            if model_file.computer.uuid != computer.uuid:
+                raise InputValidationError(
+                    "The 'tb_model' RemoteData is on computer '{}', but the code runs on computer '{}'."
+                    .format(model_file.computer.name, computer.name)
+                )
+            # Models kept on the remote by a previous calculation
+            # carry their filename as an attribute.
+            filename = model_file.get_attribute(
+                'filename', self.inputs.metadata.options.remote_model_filename
+            )
+            remote_model = (
+                computer.uuid,
+                os.path.join(model_file.get_remote_path(),
+                             filename), 'model.hdf5'
+            )
+            calcinfo.local_copy_list = []
+            if self.inputs.metadata.options.symlink_remote_model:
+                calcinfo.remote_symlink_list = [remote_model]
+            else:
+                calcinfo.remote_copy_list = [remote_model]
+        else:
+            calcinfo.local_copy_list = [
+                (model_file.uuid, model_file.filename, 'model.hdf5')
+            ]
 
         return calcinfo, codeinfo
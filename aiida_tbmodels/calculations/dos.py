@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.dos calculation.
+"""
+
+import six
+
+from aiida.plugins import DataFactory
+from aiida.common import InputValidationError
+
+from ..dos import DEFAULT_NUM_ENERGIES
+from .eigenvals import EigenvalsBase
+
+
+class DosCalculation(EigenvalsBase):
+    """
+    Calculation class which computes the density of states of a tight-binding model, from the eigenvalues calculated by 'tbmodels eigenvals'. The eigenvalues are only retrieved temporarily, and accumulated into a histogram one chunk of k-points at a time, such that only the density of states is stored.
+
+    The k-points, symmetries, and chunk options are the same as for the tbmodels.eigenvals calculation. For a density of states, the ``kpoints`` should be a mesh.
+
+    By default, the eigenvalues of all k-points are written on the remote computer and retrieved, so the disk space and transfer volume scale with the number of k-points. If the ``accumulate_remote`` option is set, the histogram is instead accumulated in the job by the driver script, which is run with the ``python_code``. Only the histogram of each chunk is then written and retrieved. This requires the ``energy_range`` option, and cannot be combined with the ``energy_window`` option.
+    """
+    @classmethod
+    def define(cls, spec):
+        super(DosCalculation, cls).define(spec)
+
+        spec.input(
+            'metadata.options.parser_name',
+            valid_type=six.string_types,
+            default='tbmodels.dos'
+        )
+        spec.input(
+            'metadata.options.energy_range',
+            valid_type=(list, tuple),
+            required=False,
+            help=
+            "Energy range [min, max] of the density of states. By default, the range covers all the (selected) bands."
+        )
+        spec.input(
+            'metadata.options.num_energies',
+            valid_type=int,
+            default=DEFAULT_NUM_ENERGIES,
+            help="Number of energy bins of the density of states."
+        )
+        spec.input(
+            'metadata.options.smearing',
+            valid_type=float,
+            required=False,
+            help=
+            "Width of the Gaussian with which the histogram of the eigenvalues is smeared. By default, the histogram is not smeared."
+        )
+        spec.input(
+            'metadata.options.accumulate_remote',
+            valid_type=bool,
+            default=False,
+            help=
+            "Accumulate the histogram in the job with the driver script, such that only the histogram of each chunk is retrieved instead of all eigenvalues. Requires the 'python_code' input and the 'energy_range' option."
+        )
+        spec.output(
+            'dos',
+            valid_type=DataFactory('array.xy'),
+            help="The density of states per unit cell."
+        )
+
+    def prepare_for_submission(self, tempfolder):
+        options = self.inputs.metadata.options
+        energy_range = options.get('energy_range', None)
+        if energy_range is not None and (
+            len(energy_range) != 2 or not energy_range[0] < energy_range[1]
+        ):
+            raise InputValidationError(
+                "Invalid 'energy_range' option '{}', must be [min, max] with min < max."
+                .format(energy_range)
+            )
+        if options.num_energies < 1:
+            raise InputValidationError(
+                "The 'num_energies' option must be positive."
+            )
+        smearing = options.get('smearing', None)
+        if smearing is not None and smearing <= 0:
+            raise InputValidationError(
+                "The 'smearing' option must be positive."
+            )
+        if options.accumulate_remote:
+            if energy_range is None:
+                raise InputValidationError(
+                    "The 'accumulate_remote' option requires the 'energy_range' option."
+                )
+            if options.get('energy_window', None) is not None:
+                raise InputValidationError(
+                    "The 'accumulate_remote' option cannot be combined with the 'energy_window' option."
+                )
+        return super(DosCalculation, self).prepare_for_submission(tempfolder)
+
+    def _get_driver_args(self):
+        """
+        Return the command line arguments of the driver script. If the histogram is accumulated in the job, the driver script is also used in the dense mode.
+        """
+        driver_args = super(DosCalculation, self)._get_driver_args()
+        options = self.inputs.metadata.options
+        if not options.accumulate_remote:
+            return driver_args
+        driver_args = (driver_args or []) + ['--histogram-range'] + [
+            repr(float(energy)) for energy in options.energy_range
+        ] + ['--histogram-num-energies',
+             str(options.num_energies)]
+        band_window = options.get('band_window', None)
+        if band_window is not None:
+            driver_args += ['--band-window'] + [str(i) for i in band_window]
+        return driver_args
+
+    def _needs_weights(self):
+        return self.inputs.metadata.options.accumulate_remote
+
+    def _get_restart_options(self):
+        names = super(DosCalculation, self)._get_restart_options()
+        names.append('accumulate_remote')
+        if self.inputs.metadata.options.accumulate_remote:
+            names += ['energy_range', 'num_energies', 'band_window']
+        return names
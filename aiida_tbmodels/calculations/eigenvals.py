@@ -6,53 +6,479 @@
 Defines the tbmodels.eigenvals calculation.
 """
 
+import os
+import copy
+
 import six
+import numpy as np
 
+from aiida.orm import Code, List, RemoteData
 from aiida.plugins import DataFactory
-from aiida_bands_inspect.io import write_kpoints
+from aiida.common import CodeRunMode, InputValidationError
 
+from ..io import write_kpoints, write_kpoints_explicit, write_kpoints_chunk, get_chunk_bounds, get_chunk_filename
+from ..calcfunctions.kpoints import get_num_kpoints, reduce_kpoints_mesh
+from ..scripts import eigenvals_driver
+from ..data.eigenvectors import EigenvectorsData
 from ._base import ModelInputBase
 
+_THREAD_ENVIRONMENT_VARIABLES = (
+    'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'
+)
+_DRIVER_FILENAME = 'eigenvals_driver.py'
+
+
+def _get_input_uuid(inputs, label):
+    return inputs[label].uuid if label in inputs else None
 
-class EigenvalsCalculation(ModelInputBase):
+
+class EigenvalsBase(ModelInputBase):
     """
-    Calculation class for the 'tbmodels eigenvals' command, which computes the eigenvalues from a given tight-binding model.
+    Base class for calculations which run the 'tbmodels eigenvals' command to compute the eigenvalues of a given tight-binding model.
+
+    If the ``symmetries`` of the model are given, only the irreducible k-points of the mesh are computed. With the ``num_processes`` option, the k-points are split into chunks which are computed by separate processes running in parallel within the same job. With the ``num_checkpoints`` option, the chunks are instead computed one after the other, such that an interrupted calculation can be restarted with the ``parent_folder`` input. The scheduler resources must provide at least ``num_processes * num_threads`` cores.
+
+    If the ``num_eigenvals`` option is given, only the eigenvalues closest to ``target_energy`` are computed with a shift-invert sparse solver, for models which are too large to be diagonalized as dense matrices. Since this is not available in the 'tbmodels' command line interface, a driver script is copied to the calculation folder and run with the ``python_code``.
+
+    The ``band_window`` and ``energy_window`` options only restrict the bands of the output: since 'tbmodels eigenvals' has no option to select bands, all eigenvalues are written on the remote computer and retrieved, and the windows are applied while parsing. To compute only some of the eigenvalues, use the sparse mode.
     """
 
     _DEFAULT_OUTPUT_FILE = 'eigenvals.hdf5'
 
     @classmethod
     def define(cls, spec):
-        super(EigenvalsCalculation, cls).define(spec)
+        super(EigenvalsBase, cls).define(spec)
 
         spec.input(
-            'metadata.options.parser_name',
-            valid_type=six.string_types,
-            default='bands_inspect.bands'
+            'metadata.options.num_processes',
+            valid_type=int,
+            default=1,
+            help=
+            "Number of 'tbmodels eigenvals' processes which run in parallel, each on a chunk of the k-points."
+        )
+        spec.input(
+            'metadata.options.num_threads',
+            valid_type=int,
+            required=False,
+            help=
+            "Number of threads used by the linear algebra (BLAS / OpenMP) libraries in each process. If given, the OMP_NUM_THREADS, MKL_NUM_THREADS and OPENBLAS_NUM_THREADS environment variables are set. By default, the environment of the job is not changed."
+        )
+        spec.input(
+            'metadata.options.num_checkpoints',
+            valid_type=int,
+            default=1,
+            help=
+            "Number of chunks of k-points which are computed one after the other, each writing its own output file. If the calculation is interrupted, the completed chunks can be re-used by passing its remote folder as 'parent_folder' to a new calculation."
+        )
+        spec.input(
+            'metadata.options.band_window',
+            valid_type=(list, tuple),
+            required=False,
+            help=
+            "Indices [start, stop) of the bands which are kept in the output. By default, all bands are kept. The window is applied by the parser: all bands are still computed, written and retrieved, so it reduces the size of the output but not the disk space and transfer of the calculation."
+        )
+        spec.input(
+            'metadata.options.energy_window',
+            valid_type=(list, tuple),
+            required=False,
+            help=
+            "Energy range [min, max]. Only the bands with at least one eigenvalue in this range are kept in the output. Can be combined with 'band_window'. Like the 'band_window', it is applied by the parser after the full eigenvalues file is retrieved."
+        )
+        spec.input(
+            'metadata.options.num_eigenvals',
+            valid_type=int,
+            required=False,
+            help=
+            "Number of eigenvalues closest to 'target_energy' which are computed at each k-point with a shift-invert sparse solver. Requires the 'python_code' input. By default, all eigenvalues are computed with a dense solver."
+        )
+        spec.input(
+            'metadata.options.target_energy',
+            valid_type=float,
+            default=0.,
+            help=
+            "Energy around which the eigenvalues are computed if 'num_eigenvals' is given."
+        )
+        spec.input(
+            'python_code',
+            valid_type=Code,
+            required=False,
+            help=
+            "Python interpreter with tbmodels and scipy installed, on the same computer as 'code'. It runs the driver script which is used instead of 'tbmodels eigenvals' in the sparse mode, to compute the eigenvectors, or to accumulate a density of states in the job."
         )
         spec.input(
             'kpoints',
             valid_type=DataFactory('array.kpoints'),
             help="Kpoints for which the eigenvalues are calculated."
         )
-        # spec.exit_code(
-        #     300,
-        #     'ERROR_OUTPUT_FILE',
-        #     message='The output HDF5 file was not found.'
-        # )
+        spec.input(
+            'symmetries',
+            valid_type=DataFactory('singlefile'),
+            required=False,
+            help=
+            "Symmetries of the model, in symmetry_representation HDF5 format. If given, the eigenvalues are computed only on the irreducible k-points of the mesh, and unfolded to the full mesh in the output. Requires the k-points to be a mesh."
+        )
+        spec.input(
+            'parent_folder',
+            valid_type=RemoteData,
+            required=False,
+            help=
+            "Remote folder of an interrupted calculation with the same inputs and number of chunks. Only the chunks which it did not complete are computed."
+        )
+        spec.exit_code(
+            300,
+            'ERROR_OUTPUT_FILE',
+            message='The output HDF5 file was not found.'
+        )
+        spec.exit_code(
+            301,
+            'ERROR_INVALID_BAND_WINDOW',
+            message=
+            'The band or energy window does not contain any of the calculated bands.'
+        )
+        spec.exit_code(
+            302,
+            'ERROR_INCOMPLETE_CHUNKS',
+            message=
+            'Not all chunks of k-points were computed. The calculation can be restarted from its remote folder.'
+        )
         spec.output(
-            'bands',
-            valid_type=DataFactory('array.bands'),
-            help="The calculated eigenvalues of the model at given k-points."
+            'completed_chunks',
+            valid_type=List,
+            required=False,
+            help=
+            "Indices of the completed chunks, if the calculation was interrupted."
         )
 
     def prepare_for_submission(self, tempfolder):
-        with tempfolder.open('kpoints.hdf5', 'w+b') as kpoints_file:
-            write_kpoints(self.inputs.kpoints, kpoints_file)
+        options = self.inputs.metadata.options
+        num_processes = options.num_processes
+        num_threads = options.get('num_threads', None)
+        if num_processes < 1 or (num_threads is not None and num_threads < 1):
+            raise InputValidationError(
+                "The 'num_processes' and 'num_threads' options must be positive."
+            )
+        num_checkpoints = options.num_checkpoints
+        if num_checkpoints < 1:
+            raise InputValidationError(
+                "The 'num_checkpoints' option must be positive."
+            )
+        if num_processes > 1 and num_checkpoints > 1:
+            raise InputValidationError(
+                "The 'num_processes' and 'num_checkpoints' options cannot both be larger than one."
+            )
+        self._check_resources(num_processes * (num_threads or 1))
+        band_window = options.get('band_window', None)
+        if band_window is not None and (
+            len(band_window) != 2 or not 0 <= band_window[0] < band_window[1]
+        ):
+            raise InputValidationError(
+                "Invalid 'band_window' option '{}', must be [start, stop) with 0 <= start < stop."
+                .format(band_window)
+            )
+        energy_window = options.get('energy_window', None)
+        if energy_window is not None and (
+            len(energy_window) != 2 or not energy_window[0] <= energy_window[1]
+        ):
+            raise InputValidationError(
+                "Invalid 'energy_window' option '{}', must be [min, max] with min <= max."
+                .format(energy_window)
+            )
+        num_eigenvals = options.get('num_eigenvals', None)
+        if num_eigenvals is not None and num_eigenvals < 1:
+            raise InputValidationError(
+                "The 'num_eigenvals' option must be positive."
+            )
+        driver_args = self._get_driver_args()
+        if driver_args is not None:
+            self._check_python_code()
 
-        calcinfo, codeinfo = super(EigenvalsCalculation,
+        calcinfo, codeinfo = super(EigenvalsBase,
                                    self).prepare_for_submission(tempfolder)
-        calcinfo.retrieve_list = [self.inputs.metadata.options.output_filename]
+        # The eigenvalues are retrieved to a temporary folder, to avoid
+        # storing them both in the retrieved folder and the output.
+        calcinfo.retrieve_list = []
+        if num_threads is not None:
+            calcinfo.prepend_text = '\n'.join(
+                'export {}={}'.format(name, num_threads)
+                for name in _THREAD_ENVIRONMENT_VARIABLES
+            )
+
+        if 'symmetries' in self.inputs:
+            try:
+                kpoints_explicit, mapping = reduce_kpoints_mesh(
+                    self.inputs.kpoints, self.inputs.symmetries
+                )
+            except ValueError as exc:
+                raise InputValidationError(str(exc))
+            weights = np.bincount(mapping) if self._needs_weights() else None
+        else:
+            kpoints_explicit = None
+            weights = None
+
+        num_chunks = max(num_processes, num_checkpoints)
+        if 'parent_folder' in self.inputs:
+            completed_chunks = self._get_completed_chunks(num_chunks)
+        else:
+            completed_chunks = []
+
+        if driver_args is not None:
+            self._write_driver(tempfolder)
 
-        codeinfo.cmdline_params = ['eigenvals', '-k', 'kpoints.hdf5']
+        if num_chunks == 1:
+            with tempfolder.open('kpoints.hdf5', 'w+b') as kpoints_file:
+                if kpoints_explicit is None:
+                    write_kpoints(self.inputs.kpoints, kpoints_file)
+                else:
+                    write_kpoints_explicit(
+                        kpoints_explicit, kpoints_file, weights=weights
+                    )
+            calcinfo.retrieve_temporary_list = [options.output_filename]
+            self._set_cmdline(
+                codeinfo, 'kpoints.hdf5', options.output_filename
+            )
+            return calcinfo
+
+        calcinfo.retrieve_temporary_list = []
+        calcinfo.codes_info = []
+        if num_processes > 1:
+            calcinfo.codes_run_mode = CodeRunMode.PARALLEL
+        else:
+            calcinfo.codes_run_mode = CodeRunMode.SERIAL
+        if kpoints_explicit is None:
+            num_kpoints = get_num_kpoints(self.inputs.kpoints)
+        else:
+            num_kpoints = len(kpoints_explicit)
+        if num_chunks > num_kpoints:
+            raise InputValidationError(
+                "The number of chunks ({}) is larger than the number of k-points ({})."
+                .format(num_chunks, num_kpoints)
+            )
+        for i, (start,
+                stop) in enumerate(get_chunk_bounds(num_kpoints, num_chunks)):
+            output_filename = get_chunk_filename(options.output_filename, i)
+            calcinfo.retrieve_temporary_list.append(output_filename)
+            if i in completed_chunks:
+                calcinfo.remote_copy_list.append((
+                    self.inputs.code.computer.uuid,
+                    os.path.join(
+                        self.inputs.parent_folder.get_remote_path(),
+                        output_filename
+                    ), output_filename
+                ))
+                continue
+            kpoints_filename = get_chunk_filename('kpoints.hdf5', i)
+            with tempfolder.open(kpoints_filename, 'w+b') as kpoints_file:
+                if kpoints_explicit is None:
+                    write_kpoints_chunk(
+                        self.inputs.kpoints, start, stop, kpoints_file
+                    )
+                else:
+                    write_kpoints_explicit(
+                        kpoints_explicit[start:stop],
+                        kpoints_file,
+                        weights=None
+                        if weights is None else weights[start:stop]
+                    )
+            chunk_codeinfo = copy.deepcopy(codeinfo)
+            self._set_cmdline(
+                chunk_codeinfo, kpoints_filename, output_filename
+            )
+            calcinfo.codes_info.append(chunk_codeinfo)
         return calcinfo
+
+    def _get_driver_args(self):
+        """
+        Return the command line arguments of the driver script, or None if the eigenvalues are computed with the 'tbmodels eigenvals' command.
+        """
+        options = self.inputs.metadata.options
+        num_eigenvals = options.get('num_eigenvals', None)
+        if num_eigenvals is None:
+            return None
+        return [
+            '--num-eigenvals',
+            str(num_eigenvals), '--target-energy',
+            repr(float(options.target_energy))
+        ]
+
+    def _needs_weights(self):  # pylint: disable=no-self-use
+        """
+        Return whether the weights of the irreducible k-points are written to the k-points files, for the driver script.
+        """
+        return False
+
+    def _check_python_code(self):
+        """
+        Check that the 'python_code' which runs the driver script is given, and on the same computer as the code.
+        """
+        if 'python_code' not in self.inputs:
+            raise InputValidationError(
+                "The 'python_code' input is required to run the driver script."
+            )
+        python_computer = self.inputs.python_code.computer
+        if python_computer.uuid != self.inputs.code.computer.uuid:
+            raise InputValidationError(
+                "The 'python_code' is on computer '{}', but the code runs on computer '{}'."
+                .format(python_computer.name, self.inputs.code.computer.name)
+            )
+
+    @staticmethod
+    def _write_driver(tempfolder):
+        """
+        Copy the driver script to the calculation folder.
+        """
+        tempfolder.insert_path(
+            os.path.splitext(eigenvals_driver.__file__)[0] + '.py',
+            dest_name=_DRIVER_FILENAME
+        )
+
+    def _set_cmdline(self, codeinfo, kpoints_filename, output_filename):
+        """
+        Set the command line of the code which computes the eigenvalues at the k-points in the given file. If the driver script is needed, it is run with the 'python_code' instead of the 'tbmodels eigenvals' command.
+        """
+        driver_args = self._get_driver_args()
+        if driver_args is None:
+            codeinfo.cmdline_params = [
+                'eigenvals', '-k', kpoints_filename, '-o', output_filename
+            ]
+        else:
+            codeinfo.code_uuid = self.inputs.python_code.uuid
+            codeinfo.cmdline_params = [
+                _DRIVER_FILENAME, '-k', kpoints_filename, '-o', output_filename
+            ] + driver_args
+
+    def _get_completed_chunks(self, num_chunks):
+        """
+        Get the indices of the chunks which were completed by the calculation that created the 'parent_folder', and check that it computed the same eigenvalues.
+        """
+        parent_folder = self.inputs.parent_folder
+        if parent_folder.computer.uuid != self.inputs.code.computer.uuid:
+            raise InputValidationError(
+                "The 'parent_folder' is on computer '{}', but the code runs on computer '{}'."
+                .format(
+                    parent_folder.computer.name, self.inputs.code.computer.name
+                )
+            )
+        parent_calc = parent_folder.creator
+        if (
+            parent_calc is None
+            or parent_calc.process_type != self.node.process_type
+        ):
+            raise InputValidationError(
+                "The 'parent_folder' was not created by a calculation of the same type."
+            )
+        for label in ['tb_model', 'kpoints', 'symmetries']:
+            parent_uuid = _get_input_uuid(parent_calc.inputs, label)
+            if parent_uuid != _get_input_uuid(self.inputs, label):
+                raise InputValidationError(
+                    "The '{}' input does not match the calculation of the 'parent_folder'."
+                    .format(label)
+                )
+        parent_num_chunks = max(
+            parent_calc.get_option('num_processes'),
+            parent_calc.get_option('num_checkpoints') or 1
+        )
+        parent_output_filename = parent_calc.get_option('output_filename')
+        if (
+            parent_num_chunks != num_chunks or parent_output_filename !=
+            self.inputs.metadata.options.output_filename
+        ):
+            raise InputValidationError(
+                "The number of chunks and the 'output_filename' must be the same as for the calculation of the 'parent_folder'."
+            )
+        options = self.inputs.metadata.options
+        for name in self._get_restart_options():
+            if parent_calc.get_option(name) != options.get(name, None):
+                raise InputValidationError(
+                    "The '{}' option must be the same as for the calculation of the 'parent_folder'."
+                    .format(name)
+                )
+        if 'completed_chunks' not in parent_calc.outputs:
+            raise InputValidationError(
+                "The calculation of the 'parent_folder' did not record any completed chunks."
+            )
+        completed_chunks = parent_calc.outputs.completed_chunks.get_list()
+        if len(completed_chunks) == num_chunks:
+            raise InputValidationError(
+                "The calculation of the 'parent_folder' already completed all chunks."
+            )
+        return completed_chunks
+
+    def _get_restart_options(self):
+        """
+        Return the names of the options which must be the same as for the calculation of the 'parent_folder'.
+        """
+        names = ['num_eigenvals', 'eigenvectors']
+        if self.inputs.metadata.options.get('num_eigenvals', None) is not None:
+            names.append('target_energy')
+        return names
+
+    def _check_resources(self, num_cores):
+        """
+        Check that the scheduler resources provide the given number of cores, for the processes which run in parallel.
+        """
+        options = self.inputs.metadata.options
+        num_available = self._get_num_cores()
+        if num_available is None:
+            self.logger.warning(
+                'Cannot determine the number of cores from the scheduler resources, {} processes with {} threads each are started at once.'
+                .format(options.num_processes, options.get('num_threads', 1))
+            )
+        elif num_available < num_cores:
+            raise InputValidationError(
+                "The scheduler resources provide {} cores, but {} processes with {} threads each are requested. Increase the resources, or reduce the 'num_processes' or 'num_threads' options."
+                .format(
+                    num_available, options.num_processes,
+                    options.get('num_threads', 1)
+                )
+            )
+
+
+class EigenvalsCalculation(EigenvalsBase):
+    """
+    Calculation class for the 'tbmodels eigenvals' command, which computes the eigenvalues from a given tight-binding model.
+
+    If the ``eigenvectors`` option is set, the eigenvectors are computed by the driver script and returned in the ``eigenvectors`` output, restricted to the same bands as the ``bands`` output.
+    """
+    @classmethod
+    def define(cls, spec):
+        super(EigenvalsCalculation, cls).define(spec)
+
+        spec.input(
+            'metadata.options.parser_name',
+            valid_type=six.string_types,
+            default='tbmodels.eigenvals'
+        )
+        spec.input(
+            'metadata.options.eigenvectors',
+            valid_type=bool,
+            default=False,
+            help=
+            "Also compute the eigenvectors, which are returned in the 'eigenvectors' output. Requires the 'python_code' input, and cannot be combined with the 'symmetries' input."
+        )
+        spec.output(
+            'bands',
+            valid_type=DataFactory('array.bands'),
+            help="The calculated eigenvalues of the model at given k-points."
+        )
+        spec.output(
+            'eigenvectors',
+            valid_type=EigenvectorsData,
+            required=False,
+            help=
+            "The eigenvectors of the bands in the 'bands' output, if the 'eigenvectors' option is set."
+        )
+
+    def prepare_for_submission(self, tempfolder):
+        eigenvectors = self.inputs.metadata.options.eigenvectors
+        if eigenvectors and 'symmetries' in self.inputs:
+            raise InputValidationError(
+                "The 'eigenvectors' option cannot be combined with the 'symmetries' input."
+            )
+        return super(EigenvalsCalculation,
+                     self).prepare_for_submission(tempfolder)
+
+    def _get_driver_args(self):
+        driver_args = super(EigenvalsCalculation, self)._get_driver_args()
+        if self.inputs.metadata.options.eigenvectors:
+            driver_args = (driver_args or []) + ['--eigenvectors']
+        return driver_args
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.packed calculation.
+"""
+
+import copy
+
+import six
+
+from aiida.orm import List, SinglefileData
+from aiida.common import CodeRunMode, InputValidationError
+from aiida.plugins import DataFactory
+
+from ..io import write_kpoints
+from ._base import TbmodelsBase
+
+_TASK_COMMANDS = ('slice', 'eigenvals')
+
+
+def get_task_filename(index):
+    """
+    Return the name of the output file of the task with the given index.
+    """
+    return 'task_{}.hdf5'.format(index)
+
+
+def get_task_label(index):
+    """
+    Return the output label of the task with the given index.
+    """
+    return 'task_{}'.format(index)
+
+
+class PackedCalculation(TbmodelsBase):
+    """
+    Calculation plugin which runs many independent 'tbmodels slice' and 'tbmodels eigenvals' tasks in a single scheduler job, to avoid queueing each of them separately. The tasks are executed one after the other, or in parallel if the ``run_parallel`` option is set. Since all tasks are then started at once, the scheduler resources must provide at least one core per task.
+
+    The models and k-points are given in the ``tb_models`` and ``kpoints`` namespaces. Each task is a dictionary with the keys ``command``, ``tb_model`` (the label of the model in ``tb_models``), and ``slice_idx`` for ``slice`` or ``kpoints`` (the label of the k-points in ``kpoints``) for ``eigenvals``. The result of each task is returned as output labelled ``task_<index>``, created by the packed calculation from all its inputs. Use the tbmodels.packed workflow to obtain results which are linked to the inputs of their own task.
+    """
+
+    # The tasks write to the files given by 'get_task_filename'.
+    _DEFAULT_OUTPUT_FILE = None
+
+    @classmethod
+    def define(cls, spec):
+        super(PackedCalculation, cls).define(spec)
+
+        spec.input(
+            'metadata.options.parser_name',
+            valid_type=six.string_types,
+            default='tbmodels.packed'
+        )
+        spec.input(
+            'metadata.options.run_parallel',
+            valid_type=bool,
+            default=False,
+            help=
+            "Run all tasks in parallel instead of one after the other. The scheduler resources must provide at least one core per task."
+        )
+        spec.input(
+            'tasks',
+            valid_type=List,
+            help="List of the tasks which are executed, with their parameters."
+        )
+        spec.input_namespace(
+            'tb_models',
+            valid_type=SinglefileData,
+            dynamic=True,
+            help="Input models in TBmodels HDF5 format, used by the tasks."
+        )
+        spec.input_namespace(
+            'kpoints',
+            valid_type=DataFactory('array.kpoints'),
+            dynamic=True,
+            required=False,
+            help="Kpoints used by the 'eigenvals' tasks."
+        )
+        # The results of the tasks are dynamic outputs
+        spec.outputs.dynamic = True
+        spec.outputs.valid_type = (SinglefileData, DataFactory('array.bands'))
+        spec.output(
+            'failed_tasks',
+            valid_type=List,
+            required=False,
+            help="Indices of the tasks whose output could not be parsed."
+        )
+        spec.exit_code(
+            300,
+            'ERROR_FAILED_TASKS',
+            message='The output file of at least one task was not found.'
+        )
+
+    def _validate_tasks(self, tasks):
+        """
+        Check that the tasks have a known command, and that the models and k-points they refer to are given.
+        """
+        if not tasks:
+            raise InputValidationError("'tasks' must not be empty.")
+        kpoints = self.inputs.get('kpoints', {})
+        for i, task in enumerate(tasks):
+            command = task.get('command')
+            if command not in _TASK_COMMANDS:
+                raise InputValidationError(
+                    "Unknown command '{}' in task {}.".format(command, i)
+                )
+            if task.get('tb_model') not in self.inputs.tb_models:
+                raise InputValidationError(
+                    "The model '{}' of task {} is not in 'tb_models'.".format(
+                        task.get('tb_model'), i
+                    )
+                )
+            if command == 'slice' and 'slice_idx' not in task:
+                raise InputValidationError(
+                    "The 'slice' task {} has no 'slice_idx'.".format(i)
+                )
+            if command == 'eigenvals' and task.get('kpoints') not in kpoints:
+                raise InputValidationError(
+                    "The k-points '{}' of task {} are not in 'kpoints'.".
+                    format(task.get('kpoints'), i)
+                )
+
+    def _check_parallel_resources(self, num_tasks):
+        """
+        Check that the scheduler resources provide a core for each of the tasks which run in parallel.
+        """
+        num_cores = self._get_num_cores()
+        if num_cores is None:
+            self.logger.warning(
+                "Cannot determine the number of cores from the scheduler resources, all {} tasks are started at once."
+                .format(num_tasks)
+            )
+        elif num_cores < num_tasks:
+            raise InputValidationError(
+                "The scheduler resources provide {} cores, but {} tasks are run in parallel. Split the tasks into several calculations, or unset the 'run_parallel' option."
+                .format(num_cores, num_tasks)
+            )
+
+    def prepare_for_submission(self, tempfolder):
+        tasks = self.inputs.tasks.get_list()
+        self._validate_tasks(tasks)
+
+        calcinfo, codeinfo = super(PackedCalculation,
+                                   self).prepare_for_submission(tempfolder)
+        calcinfo.local_copy_list = []
+        calcinfo.codes_info = []
+        # The outputs are retrieved to a temporary folder, to avoid
+        # storing them both in the retrieved folder and the outputs.
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = []
+        if self.inputs.metadata.options.run_parallel:
+            self._check_parallel_resources(len(tasks))
+            calcinfo.codes_run_mode = CodeRunMode.PARALLEL
+        else:
+            calcinfo.codes_run_mode = CodeRunMode.SERIAL
+
+        for label, model_file in self.inputs.tb_models.items():
+            calcinfo.local_copy_list.append((
+                model_file.uuid, model_file.filename,
+                'model_{}.hdf5'.format(label)
+            ))
+        for label, kpoints in self.inputs.get('kpoints', {}).items():
+            with tempfolder.open(
+                'kpoints_{}.hdf5'.format(label), 'w+b'
+            ) as kpoints_file:
+                write_kpoints(kpoints, kpoints_file)
+
+        for i, task in enumerate(tasks):
+            input_filename = 'model_{}.hdf5'.format(task['tb_model'])
+            if task['command'] == 'slice':
+                cmdline_params = ['slice', '-i', input_filename
+                                  ] + [str(x) for x in task['slice_idx']]
+            else:
+                cmdline_params = [
+                    'eigenvals', '-i', input_filename, '-k',
+                    'kpoints_{}.hdf5'.format(task['kpoints'])
+                ]
+            task_codeinfo = copy.deepcopy(codeinfo)
+            task_codeinfo.cmdline_params = cmdline_params + [
+                '-o', get_task_filename(i)
+            ]
+            calcinfo.codes_info.append(task_codeinfo)
+            calcinfo.retrieve_temporary_list.append(get_task_filename(i))
+
+        return calcinfo
@@ -6,13 +6,60 @@
 Defines the tbmodels.parse calculation.
 """
 
-from aiida.orm import Str
+import os
+
+from aiida.orm import Str, RemoteData
 from aiida.orm.nodes.data.folder import FolderData
 from aiida.common import InputValidationError
 
 from ._base import ModelOutputBase
 
 
+def get_wannier_prefix(wannier_folder):
+    """
+    Get the Wannier90 prefix from the name of the *_hr.dat file in the given folder.
+    """
+    for filename in wannier_folder.list_object_names():
+        if filename.endswith('_hr.dat'):
+            return filename.rsplit('_hr.dat', 1)[0]
+    raise InputValidationError(
+        "'wannier_folder' does not contain a *_hr.dat file."
+    )
+
+
+def get_wannier_input_filenames(filenames, prefix, pos_kind='wannier'):
+    """
+    Select the Wannier90 output files which are read by 'tbmodels parse' from the given list of file names.
+    """
+    input_filenames = [
+        prefix + suffix
+        for suffix in ['_hr.dat', '.win', '_wsvec.dat', '_centres.xyz']
+        if prefix + suffix in filenames
+    ]
+    if pos_kind == 'nearest_atom' and prefix + '_centres.xyz' not in filenames:
+        raise InputValidationError(
+            "The 'nearest_atom' positions require a {}_centres.xyz file.".
+            format(prefix)
+        )
+    return input_filenames
+
+
+def get_wannier_remote_patterns(prefix, pos_kind='wannier'):
+    """
+    Get the (source, destination) pairs of the Wannier90 output files which are read by 'tbmodels parse', for staging them from a remote folder. Since the content of a remote folder is not known before submission, the optional files are given as patterns which match only the exact file name, such that missing files are skipped instead of failing the copy.
+    """
+    patterns = [(prefix + '_hr.dat', prefix + '_hr.dat')]
+    for suffix in ['.win', '_wsvec.dat', '_centres.xyz']:
+        filename = prefix + suffix
+        if suffix == '_centres.xyz' and pos_kind == 'nearest_atom':
+            patterns.append((filename, filename))
+        else:
+            patterns.append(
+                ('{}[{}]'.format(filename[:-1], filename[-1]), '.')
+            )
+    return patterns
+
+
 class ParseCalculation(ModelOutputBase):
     """
     Calculation plugin for the 'tbmodels parse' command, which creates a TBmodels tight-binding model from the Wannier90 output.
@@ -23,15 +70,36 @@ class ParseCalculation(ModelOutputBase):
 
         spec.input(
             'wannier_folder',
-            valid_type=FolderData,
+            valid_type=(FolderData, RemoteData),
+            help=
+            "Folder containing the Wannier90 output data. If a RemoteData is given, the files are copied or symlinked on the remote computer instead of being uploaded."
+        )
+        spec.input(
+            'wannier_prefix',
+            valid_type=Str,
+            required=False,
             help=
-            "Folder containing the Wannier90 output data, with prefix 'wannier90'."
+            "Prefix of the Wannier90 output files. Required if 'wannier_folder' is a RemoteData, otherwise it is determined from the name of the *_hr.dat file."
         )
         spec.exit_code(
             300,
             'ERROR_OUTPUT_MODEL_FILE',
             message='The output model HDF5 file was not found.'
         )
+        spec.input(
+            'metadata.options.copy_all_wannier_files',
+            valid_type=bool,
+            default=False,
+            help=
+            "Copy all files of 'wannier_folder', instead of only those which are read by 'tbmodels parse'."
+        )
+        spec.input(
+            'metadata.options.symlink_wannier_files',
+            valid_type=bool,
+            default=False,
+            help=
+            "Symlink the Wannier90 output files instead of copying them, if 'wannier_folder' is given as RemoteData."
+        )
         spec.input(
             'pos_kind',
             valid_type=Str,
@@ -43,24 +111,11 @@ class ParseCalculation(ModelOutputBase):
         wannier_folder = self.inputs.wannier_folder
         pos_kind = self.inputs.pos_kind.value
 
-        # get the prefix from the *_hr.dat file
-        for filename in wannier_folder.list_object_names():
-            if filename.endswith('_hr.dat'):
-                prefix = filename.rsplit('_hr.dat', 1)[0]
-                break
+        if isinstance(wannier_folder, RemoteData):
+            calcinfo, codeinfo, prefix = self._prepare_remote(tempfolder)
         else:
-            raise InputValidationError(
-                "'wannier_folder' does not contain a *_hr.dat file."
-            )
-
-        calcinfo, codeinfo = super(ParseCalculation,
-                                   self).prepare_for_submission(tempfolder)
+            calcinfo, codeinfo, prefix = self._prepare_local(tempfolder)
 
-        # add Wannier90 output files to local_copy_list
-        calcinfo.local_copy_list = [
-            (wannier_folder.uuid, filename, filename)
-            for filename in wannier_folder.list_object_names()
-        ]
         codeinfo.cmdline_params = [
             'parse', '-p', prefix, '-o',
             self.inputs.metadata.options.output_filename, '--pos-kind',
@@ -68,3 +123,71 @@ class ParseCalculation(ModelOutputBase):
         ]
 
         return calcinfo
+
+    def _prepare_local(self, tempfolder):
+        """
+        Add the Wannier90 output files of a FolderData input to the local_copy_list.
+        """
+        wannier_folder = self.inputs.wannier_folder
+        pos_kind = self.inputs.pos_kind.value
+
+        if 'wannier_prefix' in self.inputs:
+            prefix = self.inputs.wannier_prefix.value
+        else:
+            prefix = get_wannier_prefix(wannier_folder)
+        filenames = wannier_folder.list_object_names()
+        if prefix + '_hr.dat' not in filenames:
+            raise InputValidationError(
+                "'wannier_folder' does not contain a {}_hr.dat file.".
+                format(prefix)
+            )
+        input_filenames = get_wannier_input_filenames(
+            filenames, prefix, pos_kind
+        )
+        if self.inputs.metadata.options.copy_all_wannier_files:
+            input_filenames = filenames
+
+        calcinfo, codeinfo = super(ParseCalculation,
+                                   self).prepare_for_submission(tempfolder)
+
+        # add Wannier90 output files to local_copy_list
+        calcinfo.local_copy_list = [(wannier_folder.uuid, filename, filename)
+                                    for filename in input_filenames]
+        return calcinfo, codeinfo, prefix
+
+    def _prepare_remote(self, tempfolder):
+        """
+        Add the Wannier90 output files of a RemoteData input to the remote_copy_list or remote_symlink_list.
+        """
+        wannier_folder = self.inputs.wannier_folder
+        pos_kind = self.inputs.pos_kind.value
+
+        if 'wannier_prefix' not in self.inputs:
+            raise InputValidationError(
+                "The 'wannier_prefix' input is required if 'wannier_folder' is a RemoteData."
+            )
+        prefix = self.inputs.wannier_prefix.value
+        computer = self.inputs.code.computer
+        if wannier_folder.computer.uuid != computer.uuid:
+            raise InputValidationError(
+                "The 'wannier_folder' RemoteData is on computer '{}', but the code runs on computer '{}'."
+                .format(wannier_folder.computer.name, computer.name)
+            )
+
+        calcinfo, codeinfo = super(ParseCalculation,
+                                   self).prepare_for_submission(tempfolder)
+
+        remote_path = wannier_folder.get_remote_path()
+        if self.inputs.metadata.options.copy_all_wannier_files:
+            patterns = [(os.path.join(remote_path, '*'), '.')]
+        else:
+            patterns = [(os.path.join(remote_path, source), destination)
+                        for source, destination in
+                        get_wannier_remote_patterns(prefix, pos_kind)]
+        remote_list = [(computer.uuid, source, destination)
+                       for source, destination in patterns]
+        if self.inputs.metadata.options.symlink_wannier_files:
+            calcinfo.remote_symlink_list = remote_list
+        else:
+            calcinfo.remote_copy_list = remote_list
+        return calcinfo, codeinfo, prefix
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.pipeline calculation.
+"""
+
+import copy
+
+import six
+
+from aiida.orm import List, SinglefileData
+from aiida.orm.nodes.data.folder import FolderData
+from aiida.common import InputValidationError
+from aiida.plugins import DataFactory
+
+from ..io import write_kpoints
+from ._base import TbmodelsBase
+from .parse import get_wannier_prefix, get_wannier_input_filenames
+
+_MODEL_COMMANDS = ('parse', 'symmetrize', 'slice')
+
+
+def get_step_filename(index):
+    """
+    Return the name of the file which is written by the intermediate step with the given index.
+    """
+    return 'step_{}.hdf5'.format(index)
+
+
+def get_step_label(index):
+    """
+    Return the output label of the model which is written by the intermediate step with the given index.
+    """
+    return 'tb_model_step_{}'.format(index)
+
+
+class PipelineCalculation(TbmodelsBase):
+    """
+    Calculation plugin which runs a sequence of tbmodels commands in a single job. The intermediate models are passed between the steps on the local disk of the job, and are returned as outputs labelled ``tb_model_step_<index>``.
+
+    Each step is given as a dictionary with the key ``command``, and the command-specific parameters: ``pos_kind`` for ``parse``, and ``slice_idx`` for ``slice``. The ``parse`` command can only be the first step, and ``eigenvals`` only the last step.
+    """
+
+    _DEFAULT_OUTPUT_FILE = 'pipeline_out.hdf5'
+
+    @classmethod
+    def define(cls, spec):
+        super(PipelineCalculation, cls).define(spec)
+
+        spec.input(
+            'metadata.options.parser_name',
+            valid_type=six.string_types,
+            default='tbmodels.pipeline'
+        )
+        spec.input(
+            'steps',
+            valid_type=List,
+            help=
+            "List of the tbmodels commands which are executed, with their parameters."
+        )
+        spec.input(
+            'tb_model',
+            valid_type=SinglefileData,
+            required=False,
+            help=
+            "Input model in TBmodels HDF5 format. Required unless the first step is 'parse'."
+        )
+        spec.input(
+            'wannier_folder',
+            valid_type=FolderData,
+            required=False,
+            help=
+            "Folder containing the Wannier90 output data, used by the 'parse' step."
+        )
+        spec.input(
+            'symmetries',
+            valid_type=SinglefileData,
+            required=False,
+            help=
+            "File containing the symmetries in HDF5 format, used by the 'symmetrize' steps."
+        )
+        spec.input(
+            'kpoints',
+            valid_type=DataFactory('array.kpoints'),
+            required=False,
+            help=
+            "Kpoints for which the eigenvalues are calculated in the 'eigenvals' step."
+        )
+        # The models of the intermediate steps are dynamic outputs
+        spec.outputs.dynamic = True
+        spec.outputs.valid_type = SinglefileData
+        spec.output(
+            'tb_model',
+            valid_type=SinglefileData,
+            required=False,
+            help="Output model of the last step, if it creates a model."
+        )
+        spec.output(
+            'bands',
+            valid_type=DataFactory('array.bands'),
+            required=False,
+            help="The calculated eigenvalues, if the last step is 'eigenvals'."
+        )
+        spec.exit_code(
+            300,
+            'ERROR_OUTPUT_MODEL_FILE',
+            message='The output model HDF5 file of a step was not found.'
+        )
+        spec.exit_code(
+            301,
+            'ERROR_OUTPUT_BANDS_FILE',
+            message='The output eigenvalues HDF5 file was not found.'
+        )
+
+    def _validate_steps(self, steps):
+        """
+        Check that the steps form a valid sequence, and that the inputs they need are given.
+        """
+        if not steps:
+            raise InputValidationError("'steps' must not be empty.")
+        for i, step in enumerate(steps):
+            command = step.get('command')
+            if command not in _MODEL_COMMANDS + ('eigenvals', ):
+                raise InputValidationError(
+                    "Unknown command '{}' in step {}.".format(command, i)
+                )
+            if command == 'parse' and i != 0:
+                raise InputValidationError(
+                    "The 'parse' command can only be the first step."
+                )
+            if command == 'eigenvals' and i != len(steps) - 1:
+                raise InputValidationError(
+                    "The 'eigenvals' command can only be the last step."
+                )
+            if command == 'slice' and 'slice_idx' not in step:
+                raise InputValidationError(
+                    "The 'slice' step {} has no 'slice_idx'.".format(i)
+                )
+        required_inputs = {
+            'parse': 'wannier_folder',
+            'symmetrize': 'symmetries',
+            'eigenvals': 'kpoints'
+        }
+        for step in steps:
+            input_name = required_inputs.get(step['command'])
+            if input_name is not None and input_name not in self.inputs:
+                raise InputValidationError(
+                    "The '{}' step requires the '{}' input.".format(
+                        step['command'], input_name
+                    )
+                )
+        if steps[0]['command'] != 'parse' and 'tb_model' not in self.inputs:
+            raise InputValidationError(
+                "The 'tb_model' input is required unless the first step is 'parse'."
+            )
+
+    def prepare_for_submission(self, tempfolder):
+        steps = self.inputs.steps.get_list()
+        self._validate_steps(steps)
+
+        calcinfo, codeinfo = super(PipelineCalculation,
+                                   self).prepare_for_submission(tempfolder)
+        calcinfo.local_copy_list = []
+        calcinfo.codes_info = []
+        # The output files are retrieved to a temporary folder, since
+        # the parser stores their content in the output nodes.
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = []
+
+        input_filename = 'model.hdf5'
+        if 'tb_model' in self.inputs and steps[0]['command'] != 'parse':
+            model_file = self.inputs.tb_model
+            calcinfo.local_copy_list.append(
+                (model_file.uuid, model_file.filename, input_filename)
+            )
+        if 'symmetries' in self.inputs:
+            symmetries_file = self.inputs.symmetries
+            calcinfo.local_copy_list.append((
+                symmetries_file.uuid, symmetries_file.filename,
+                'symmetries.hdf5'
+            ))
+
+        for i, step in enumerate(steps):
+            command = step['command']
+            if i == len(steps) - 1:
+                output_filename = self.inputs.metadata.options.output_filename
+            else:
+                output_filename = get_step_filename(i)
+            if command == 'parse':
+                wannier_folder = self.inputs.wannier_folder
+                prefix = get_wannier_prefix(wannier_folder)
+                pos_kind = step.get('pos_kind', 'wannier')
+                calcinfo.local_copy_list += [
+                    (wannier_folder.uuid, filename, filename)
+                    for filename in get_wannier_input_filenames(
+                        wannier_folder.list_object_names(), prefix, pos_kind
+                    )
+                ]
+                cmdline_params = [
+                    'parse', '-p', prefix, '--pos-kind', pos_kind
+                ]
+            elif command == 'symmetrize':
+                cmdline_params = [
+                    'symmetrize', '-i', input_filename, '-s', 'symmetries.hdf5'
+                ]
+            elif command == 'slice':
+                cmdline_params = ['slice', '-i', input_filename
+                                  ] + [str(x) for x in step['slice_idx']]
+            else:
+                with tempfolder.open('kpoints.hdf5', 'w+b') as kpoints_file:
+                    write_kpoints(self.inputs.kpoints, kpoints_file)
+                cmdline_params = [
+                    'eigenvals', '-i', input_filename, '-k', 'kpoints.hdf5'
+                ]
+            step_codeinfo = copy.deepcopy(codeinfo)
+            step_codeinfo.cmdline_params = cmdline_params + [
+                '-o', output_filename
+            ]
+            calcinfo.codes_info.append(step_codeinfo)
+            calcinfo.retrieve_temporary_list.append(output_filename)
+            input_filename = output_filename
+
+        return calcinfo
@@ -22,7 +22,8 @@ class SymmetrizeCalculation(ModelInputBase, ModelOutputBase):
         spec.input(
             'symmetries',
             valid_type=SinglefileData,
-            help="File containing the symmetries in HDF5 format."
+            help=
+            "File containing the symmetries in HDF5 format. Symmetries created by the tbmodels.expand_symmetries calcfunction are used as full group."
         )
         spec.exit_code(
             300,
@@ -47,5 +48,9 @@ class SymmetrizeCalculation(ModelInputBase, ModelOutputBase):
             'symmetrize', '-o',
             self.node.get_option('output_filename')
         ]
+        # Symmetries expanded with 'expand_symmetries' contain the full
+        # group, which then does not need to be generated.
+        if symmetries_file.get_attribute('full_group', False):
+            codeinfo.cmdline_params.append('--full-group')
 
         return calcinfo
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the data class for eigenvectors of tight-binding models, stored as chunked HDF5 file.
+"""
+
+import contextlib
+
+import h5py
+import numpy as np
+
+from aiida.orm import SinglefileData
+
+from ..scripts.eigenvals_driver import create_eigenvectors_file
+
+
+def copy_eigenvectors(in_paths, out_path, band_slice=slice(None)):
+    """
+    Write the bands selected by ``band_slice`` of one or more eigenvectors files to a single file, with the k-points of the input files in the given order. The eigenvectors are copied one k-point at a time.
+    """
+    kpoints = []
+    eigenvals = []
+    for in_path in in_paths:
+        with h5py.File(in_path, 'r') as in_file:
+            kpoints.append(in_file['kpoints'][()])
+            eigenvals.append(in_file['eigenvals'][:, band_slice])
+            num_orbitals = in_file['eigenvectors'].shape[1]
+    eigenvals = np.concatenate(eigenvals)
+    with h5py.File(out_path, 'w') as out_file:
+        eigenvals_dset, eigenvectors_dset = create_eigenvectors_file(
+            out_file, np.concatenate(kpoints), num_orbitals, eigenvals.shape[1]
+        )
+        eigenvals_dset[()] = eigenvals
+        offset = 0
+        for in_path in in_paths:
+            with h5py.File(in_path, 'r') as in_file:
+                in_eigenvectors = in_file['eigenvectors']
+                for i in range(in_eigenvectors.shape[0]):
+                    eigenvectors_dset[offset +
+                                      i] = in_eigenvectors[i, :, band_slice]
+                offset += in_eigenvectors.shape[0]
+
+
+class EigenvectorsData(SinglefileData):
+    """
+    Eigenvalues and eigenvectors of a tight-binding model at a list of k-points, in a HDF5 file with the datasets 'kpoints', 'eigenvals' and 'eigenvectors'. The eigenvector of band ``j`` at k-point ``i`` is ``eigenvectors[i, :, j]``.
+
+    The eigenvectors are never loaded as a whole: use :meth:`get_eigenvectors` to read the eigenvectors of a single k-point (or slice of k-points), or :meth:`open_hdf5` to access the datasets lazily.
+    """
+    def set_file(self, file):  # pylint: disable=redefined-builtin
+        super(EigenvectorsData, self).set_file(file)
+        with self.open_hdf5() as hdf5_handle:
+            shape = hdf5_handle['eigenvectors'].shape
+        num_kpoints, num_orbitals, num_bands = shape
+        self.set_attribute('num_kpoints', num_kpoints)
+        self.set_attribute('num_orbitals', num_orbitals)
+        self.set_attribute('num_bands', num_bands)
+
+    @contextlib.contextmanager
+    def open_hdf5(self):
+        """
+        Context manager which opens the file as read-only :class:`h5py.File`. The datasets are read only when they are indexed.
+        """
+        with self.open(mode='rb') as in_file:
+            with h5py.File(in_file, 'r') as hdf5_handle:
+                yield hdf5_handle
+
+    @property
+    def num_kpoints(self):
+        """
+        Number of k-points.
+        """
+        return self.get_attribute('num_kpoints')
+
+    @property
+    def num_orbitals(self):
+        """
+        Number of orbitals, which is the length of each eigenvector.
+        """
+        return self.get_attribute('num_orbitals')
+
+    @property
+    def num_bands(self):
+        """
+        Number of eigenvectors at each k-point.
+        """
+        return self.get_attribute('num_bands')
+
+    def get_kpoints(self):
+        """
+        Return the k-points, in reduced coordinates.
+        """
+        with self.open_hdf5() as hdf5_handle:
+            return hdf5_handle['kpoints'][()]
+
+    def get_eigenvals(self):
+        """
+        Return the eigenvalues, with shape (number of k-points, number of bands).
+        """
+        with self.open_hdf5() as hdf5_handle:
+            return hdf5_handle['eigenvals'][()]
+
+    def get_eigenvectors(self, kpoint_index):
+        """
+        Return the eigenvectors at the given k-point index or slice of k-point indices. Only the requested k-points are read from the file.
+        """
+        with self.open_hdf5() as hdf5_handle:
+            return hdf5_handle['eigenvectors'][kpoint_index]
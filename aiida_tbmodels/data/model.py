@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the data class for tight-binding models in TBmodels HDF5 format.
+"""
+
+import os
+import hashlib
+import importlib
+import contextlib
+import collections
+
+import h5py
+import numpy as np
+
+from aiida.orm import SinglefileData
+
+_MODEL_CACHE_SIZE = 16
+_MODEL_CACHE = collections.OrderedDict()
+
+
+def get_model_content_hash(*args, **kwargs):
+    """
+    Compute a hash of a tight-binding model in TBmodels HDF5 format from its datasets, independent of the HDF5 file layout, metadata and the order in which the hoppings are stored. Positional and keyword arguments are passed to :class:`h5py.File`.
+    """
+    hasher = hashlib.sha256()
+    with h5py.File(*args, **kwargs) as hdf5_handle:
+        # Models written by a development version of TBmodels are
+        # stored in a 'tb_model' group.
+        model_group = hdf5_handle.get('tb_model', hdf5_handle)
+        _update_hash_group(hasher, model_group)
+    return hasher.hexdigest()
+
+
+def _update_hash_group(hasher, group):
+    """
+    Update the hash with the (sorted) content of a HDF5 group.
+    """
+    for key in sorted(group.keys()):
+        hasher.update(key.encode('utf-8'))
+        item = group[key]
+        if isinstance(item, h5py.Group):
+            if key == 'hop':
+                _update_hash_hop(hasher, item)
+            else:
+                _update_hash_group(hasher, item)
+        else:
+            _update_hash_dataset(hasher, item)
+
+
+def _update_hash_hop(hasher, hop_group):
+    """
+    Update the hash with the hopping matrices, ordered by their R-vector instead of the (arbitrary) group name.
+    """
+    hop_entries = sorted(
+        hop_group.values(), key=lambda entry: tuple(entry['R'][()])
+    )
+    for entry in hop_entries:
+        _update_hash_group(hasher, entry)
+
+
+def _update_hash_dataset(hasher, dataset):
+    """
+    Update the hash with the shape, type and values of a dataset, in little-endian byte order.
+    """
+    value = np.asarray(dataset[()])
+    if value.dtype.kind in 'OSU':
+        hasher.update(repr(value.tolist()).encode('utf-8'))
+        return
+    value = np.ascontiguousarray(value, dtype=value.dtype.newbyteorder('<'))
+    hasher.update(repr((value.dtype.str, value.shape)).encode('utf-8'))
+    hasher.update(value.tobytes())
+
+
+def get_model_attributes(hdf5_handle):
+    """
+    Return the properties of the tight-binding model in an open HDF5 file in TBmodels format, which are stored as attributes of a :class:`TbModelData`. The hopping matrices are read one at a time. Raises ValueError if the file does not contain a model.
+    """
+    model_group = hdf5_handle.get('tb_model', hdf5_handle)
+    missing = [
+        key for key in ['size', 'dim', 'pos', 'hop'] if key not in model_group
+    ]
+    if missing:
+        raise ValueError(
+            "The file is not a model in TBmodels HDF5 format, the datasets {} are missing."
+            .format(missing)
+        )
+    hop_group = model_group['hop']
+    num_hoppings = 0
+    for key, entry in hop_group.items():
+        # Sparse matrices are stored in CSR format, either directly in the
+        # entry (TBmodels with sparse=True) or in its 'mat' group.
+        mat = entry.get('mat', entry)
+        if 'R' not in entry or (
+            isinstance(mat, h5py.Group) and 'data' not in mat
+        ):
+            raise ValueError(
+                "Invalid hopping entry '{}' in the model file.".format(key)
+            )
+        if isinstance(mat, h5py.Group):
+            num_hoppings += int(np.count_nonzero(mat['data'][()]))
+        else:
+            num_hoppings += int(np.count_nonzero(mat[()]))
+    attributes = {
+        'num_orbitals': int(model_group['size'][()]),
+        'dim': int(model_group['dim'][()]),
+        'num_R': len(hop_group),
+        'num_hoppings': num_hoppings,
+        'cell': None,
+        'occ': None,
+    }
+    if 'uc' in model_group:
+        attributes['cell'] = model_group['uc'][()].tolist()
+    if 'occ' in model_group:
+        occ = model_group['occ'][()]
+        if np.ndim(occ) == 0 and not isinstance(occ, bytes):
+            attributes['occ'] = int(occ)
+    return attributes
+
+
+class TbModelData(SinglefileData):
+    """
+    Tight-binding model in TBmodels HDF5 format.
+
+    In contrast to a plain SinglefileData, the node hash is computed from the ``content_hash`` attribute, which depends only on the model datasets. As a result, equivalent models stored in different files hit the same entries in the AiiDA calculation cache.
+
+    The number of orbitals, R-vectors and (non-zero) hopping elements, the unit cell, the occupation and the file size are stored as attributes, such that models can be selected with a QueryBuilder without opening their files. For example, the filter ``{'attributes.num_orbitals': 64}`` selects all models with 64 orbitals. The ``cell`` and ``occ`` attributes are ``None`` if the file does not contain them.
+    """
+
+    _hash_ignored_attributes = ('filename', 'file_size')
+
+    def set_file(self, file):  # pylint: disable=redefined-builtin
+        super(TbModelData, self).set_file(file)
+        with self.open(mode='rb') as in_file:
+            self.set_attribute(
+                'content_hash', get_model_content_hash(in_file, 'r')
+            )
+            in_file.seek(0, os.SEEK_END)
+            self.set_attribute('file_size', in_file.tell())
+        with self.open_hdf5() as hdf5_handle:
+            for key, value in get_model_attributes(hdf5_handle).items():
+                self.set_attribute(key, value)
+
+    @contextlib.contextmanager
+    def open_hdf5(self):
+        """
+        Context manager which opens the file as read-only :class:`h5py.File`. The datasets are read only when they are indexed, such that a single dataset can be accessed without reading the whole model.
+        """
+        with self.open(mode='rb') as in_file:
+            with h5py.File(in_file, 'r') as hdf5_handle:
+                yield hdf5_handle.get('tb_model', hdf5_handle)
+
+    def get_dataset(self, name):
+        """
+        Read a single dataset of the model, for example ``'pos'`` or ``'hop/0/mat'``.
+        """
+        with self.open_hdf5() as hdf5_handle:
+            return hdf5_handle[name][()]
+
+    def to_model(self):
+        """
+        Load the model as :class:`tbmodels.Model`. This requires the ``tbmodels`` package.
+
+        The most recently loaded models are cached by their ``content_hash``, such that loading the same (or an equivalent) model again does not read the file. The cached model is shared, and must not be modified in place.
+        """
+        content_hash = self.content_hash
+        try:
+            model = _MODEL_CACHE.pop(content_hash)
+        except KeyError:
+            import tbmodels
+            with self.open_hdf5() as hdf5_handle:
+                model = tbmodels.Model.from_hdf5(hdf5_handle.file)
+            if len(_MODEL_CACHE) >= _MODEL_CACHE_SIZE:
+                _MODEL_CACHE.popitem(last=False)
+        _MODEL_CACHE[content_hash] = model
+        return model
+
+    @property
+    def content_hash(self):
+        """
+        Hash of the model datasets, see :func:`get_model_content_hash`.
+        """
+        return self.get_attribute('content_hash')
+
+    @property
+    def num_orbitals(self):
+        """
+        Number of orbitals of the model.
+        """
+        return self.get_attribute('num_orbitals')
+
+    @property
+    def num_R(self):  # pylint: disable=invalid-name
+        """
+        Number of R-vectors for which hopping matrices are stored.
+        """
+        return self.get_attribute('num_R')
+
+    @property
+    def num_hoppings(self):
+        """
+        Number of non-zero hopping elements stored in the file.
+        """
+        return self.get_attribute('num_hoppings')
+
+    @property
+    def cell(self):
+        """
+        Unit cell of the model, or ``None`` if it is not contained in the file.
+        """
+        return self.get_attribute('cell')
+
+    @property
+    def occ(self):
+        """
+        Number of occupied states, or ``None`` if it is not contained in the file.
+        """
+        return self.get_attribute('occ')
+
+    @property
+    def file_size(self):
+        """
+        Size of the model file, in bytes.
+        """
+        return self.get_attribute('file_size')
+
+    def _get_objects_to_hash(self):
+        # The repository content is replaced by the 'content_hash' attribute.
+        return [
+            importlib.import_module(self.__module__.split('.',
+                                                          1)[0]).__version__,
+            {
+                key: val
+                for key, val in self.attributes_items()
+                if key not in self._hash_ignored_attributes
+                and key not in self._updatable_attributes  # pylint: disable=unsupported-membership-test
+            },
+            self.computer.uuid if self.computer is not None else None
+        ]
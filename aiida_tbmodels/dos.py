@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines functions to accumulate a density of states from chunks of eigenvalues, such that the eigenvalues of all k-points never need to be held in memory at once.
+"""
+
+import numpy as np
+
+from aiida.plugins import DataFactory
+
+DEFAULT_NUM_ENERGIES = 1000
+
+
+def get_bin_edges(energy_range, num_energies=DEFAULT_NUM_ENERGIES):
+    """
+    Return the edges of the ``num_energies`` equally spaced energy bins covering the ``energy_range`` [min, max].
+    """
+    energy_min, energy_max = energy_range
+    return np.linspace(energy_min, energy_max, num_energies + 1)
+
+
+def get_default_energy_range(band_min, band_max, smearing=None):
+    """
+    Return the energy range covering all the bands with the given minima and maxima, extended by five times the ``smearing`` width on both sides.
+    """
+    margin = 5 * smearing if smearing else 0.
+    energy_min = np.min(band_min) - margin
+    energy_max = np.max(band_max) + margin
+    if energy_min == energy_max:
+        energy_min -= 0.5
+        energy_max += 0.5
+    return energy_min, energy_max
+
+
+def add_histogram(histogram, eigenvals, bin_edges, weights=None):
+    """
+    Add the eigenvalues with shape (number of k-points, number of bands) to the ``histogram`` array, in place. The optional ``weights`` are the weights of the k-points.
+    """
+    if weights is not None:
+        weights = np.repeat(weights, eigenvals.shape[1])
+    histogram += np.histogram(
+        eigenvals.ravel(), bins=bin_edges, weights=weights
+    )[0]
+
+
+def create_dos_data(histogram, bin_edges, num_kpoints, smearing=None):
+    """
+    Create the XyData containing the density of states per unit cell, from the histogram of the eigenvalues at ``num_kpoints`` k-points. If ``smearing`` is given, the histogram is convolved with a Gaussian of this width.
+    """
+    bin_width = bin_edges[1] - bin_edges[0]
+    dos = histogram / (num_kpoints * bin_width)
+    if smearing:
+        half_width = int(np.ceil(5 * smearing / bin_width))
+        offsets = np.arange(-half_width, half_width + 1) * bin_width
+        kernel = np.exp(-offsets**2 / (2 * smearing**2))
+        kernel /= kernel.sum()
+        dos = np.convolve(dos, kernel)[half_width:half_width + len(dos)]
+    dos_data = DataFactory('array.xy')()
+    dos_data.set_x((bin_edges[:-1] + bin_edges[1:]) / 2, 'energy', 'eV')
+    dos_data.set_y(dos, 'dos', 'states/eV')
+    if smearing:
+        dos_data.set_attribute('smearing', smearing)
+    return dos_data
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines functions to write AiiDA data to files in bands_inspect HDF5 format, and to read the calculated eigenvalues, without loading large arrays into memory at once.
+"""
+
+import os
+
+import h5py
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 2**16
+
+# Compressing smaller datasets makes the file larger, because the
+# per-chunk overhead of the filter outweighs the saved space.
+MIN_COMPRESSED_SIZE = 2**16
+
+
+def write_kpoints(kpoints_data, *args, **kwargs):
+    """
+    Write a 'KpointsData' instance to a file or file-like object in bands_inspect HDF5 format.
+
+    A k-point mesh is written as its size and offset only, and the explicit k-points are created by the code reading the file. Explicit k-points are streamed from the repository in chunks of ``chunk_size`` k-points, into a chunked and compressed HDF5 dataset.
+
+    Except for ``kpoints_data`` and the ``chunk_size`` keyword argument, all positional and keyword arguments are passed to :class:`h5py.File`.
+    """
+    chunk_size = kwargs.pop('chunk_size', DEFAULT_CHUNK_SIZE)
+    attrs = kpoints_data.attributes
+    with h5py.File(*args, **kwargs) as hdf5_handle:
+        if 'mesh' in attrs:
+            hdf5_handle['type_tag'] = 'kpoints_mesh'
+            hdf5_handle['mesh'] = np.array(attrs['mesh'])
+            hdf5_handle['offset'] = np.array(attrs['offset'])
+        elif 'array|kpoints' in attrs:
+            hdf5_handle['type_tag'] = 'kpoints_explicit'
+            with kpoints_data.open('kpoints.npy', mode='rb') as npy_handle:
+                write_npy_chunked(
+                    npy_handle, hdf5_handle, 'kpoints', chunk_size=chunk_size
+                )
+        else:
+            raise NotImplementedError(
+                "Unrecognized KpointsData form, has attrs '{}'".format(attrs)
+            )
+
+
+def write_npy_chunked(
+    npy_handle, hdf5_handle, name, chunk_size, start=0, stop=None
+):
+    """
+    Copy the rows [start, stop) of the array in the given binary ``.npy`` file handle to a chunked and compressed HDF5 dataset, reading at most ``chunk_size`` rows at a time.
+    """
+    version = np.lib.format.read_magic(npy_handle)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(
+            npy_handle
+        )
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(
+            npy_handle
+        )
+    if not shape:
+        hdf5_handle[name] = np.frombuffer(npy_handle.read(), dtype=dtype)
+        return
+    stop = shape[0] if stop is None else min(stop, shape[0])
+    if fortran_order or stop <= start:
+        # The rows are not contiguous (or there are none), fall back
+        # to reading the whole array.
+        hdf5_handle[name] = np.frombuffer(
+            npy_handle.read(), dtype=dtype
+        ).reshape(shape, order='F' if fortran_order else 'C')[start:stop]
+        return
+
+    num_rows = stop - start
+    row_shape = shape[1:]
+    row_size = dtype.itemsize * int(np.prod(row_shape))
+    dataset = hdf5_handle.create_dataset(
+        name,
+        shape=(num_rows, ) + row_shape,
+        dtype=dtype,
+        chunks=(max(1, min(chunk_size, num_rows)), ) + row_shape,
+        compression='gzip'
+    )
+    npy_handle.seek(start * row_size, os.SEEK_CUR)
+    for offset in range(0, num_rows, chunk_size):
+        count = min(chunk_size, num_rows - offset)
+        buffer = npy_handle.read(count * row_size)
+        dataset[offset:offset +
+                count] = np.frombuffer(buffer, dtype=dtype).reshape((count, ) +
+                                                                    row_shape)
+
+
+def get_chunk_bounds(num_kpoints, num_chunks):
+    """
+    Return the [start, stop) bounds of ``num_chunks`` chunks of approximately equal size, like :func:`numpy.array_split`.
+    """
+    size, remainder = divmod(num_kpoints, num_chunks)
+    stops = np.cumsum([size + 1] * remainder + [size] *
+                      (num_chunks - remainder))
+    starts = np.concatenate([[0], stops[:-1]])
+    return [(int(start), int(stop)) for start, stop in zip(starts, stops)]
+
+
+def write_kpoints_chunk(kpoints_data, start, stop, *args, **kwargs):
+    """
+    Write the k-points [start, stop) of a 'KpointsData' instance as explicit k-points to a file or file-like object in bands_inspect HDF5 format, without creating the full list of k-points.
+
+    For a mesh, only the k-points of the chunk are created. Explicit k-points are streamed from the repository in chunks of ``chunk_size`` k-points. Except for the ``chunk_size`` keyword argument, the remaining positional and keyword arguments are passed to :class:`h5py.File`.
+    """
+    chunk_size = kwargs.pop('chunk_size', DEFAULT_CHUNK_SIZE)
+    attrs = kpoints_data.attributes
+    if 'mesh' in attrs:
+        mesh = np.array(attrs['mesh'])
+        offset = np.array(attrs['offset'], dtype=float)
+        indices = np.array(np.unravel_index(np.arange(start, stop), mesh)).T
+        write_kpoints_explicit((indices + offset) / mesh, *args, **kwargs)
+    elif 'array|kpoints' in attrs:
+        with h5py.File(*args, **kwargs) as hdf5_handle:
+            hdf5_handle['type_tag'] = 'kpoints_explicit'
+            with kpoints_data.open('kpoints.npy', mode='rb') as npy_handle:
+                write_npy_chunked(
+                    npy_handle,
+                    hdf5_handle,
+                    'kpoints',
+                    chunk_size=chunk_size,
+                    start=start,
+                    stop=stop
+                )
+    else:
+        raise NotImplementedError(
+            "Unrecognized KpointsData form, has attrs '{}'".format(attrs)
+        )
+
+
+def repack_model(
+    in_path,
+    out_path,
+    compression=None,
+    compression_opts=None,
+    chunks=None,
+    float32=False,
+    min_compressed_size=MIN_COMPRESSED_SIZE
+):
+    """
+    Copy a tight-binding model in TBmodels HDF5 format, changing the storage layout of the hopping datasets.
+
+    :param compression: HDF5 compression filter ('gzip' or 'lzf') for the hopping datasets. Compression only pays off for large hopping matrices, as in models with many orbitals.
+    :param compression_opts: Options for the compression filter, e.g. the gzip level.
+    :param chunks: Chunk shape of the hopping datasets. If ``None``, the chunks are determined automatically when compression is enabled.
+    :param float32: Store the hopping values in single precision (float32 or complex64).
+    :param min_compressed_size: Hopping datasets smaller than this size (in bytes) are stored uncompressed.
+    """
+    with h5py.File(in_path, 'r') as in_file:
+        with h5py.File(out_path, 'w') as out_file:
+            _copy_group(
+                in_file,
+                out_file,
+                is_hop=False,
+                dataset_kwargs=dict(
+                    compression=compression,
+                    compression_opts=compression_opts,
+                    chunks=chunks
+                ),
+                float32=float32,
+                min_compressed_size=min_compressed_size
+            )
+
+
+def _copy_group(
+    in_group, out_group, is_hop, dataset_kwargs, float32, min_compressed_size
+):
+    """
+    Recursively copy a HDF5 group, applying the storage layout to the hopping value datasets.
+    """
+    for key, item in in_group.items():
+        if isinstance(item, h5py.Group):
+            _copy_group(
+                item,
+                out_group.create_group(key),
+                is_hop=is_hop or key == 'hop',
+                dataset_kwargs=dataset_kwargs,
+                float32=float32,
+                min_compressed_size=min_compressed_size
+            )
+            continue
+        value = item[()]
+        if is_hop and key in ('mat', 'data') and np.ndim(value) > 0:
+            if float32:
+                value = value.astype(
+                    np.complex64 if np.iscomplexobj(value) else np.float32
+                )
+            kwargs = {
+                name: val
+                for name, val in dataset_kwargs.items() if val is not None
+            }
+            if value.nbytes < min_compressed_size:
+                kwargs.pop('compression', None)
+                kwargs.pop('compression_opts', None)
+            if 'chunks' in kwargs:
+                kwargs['chunks'] = tuple(
+                    min(chunk, dim)
+                    for chunk, dim in zip(kwargs['chunks'], np.shape(value))
+                )
+            out_group.create_dataset(key, data=value, **kwargs)
+        else:
+            out_group[key] = value
+
+
+def write_kpoints_explicit(kpoints_array, *args, **kwargs):
+    """
+    Write an array of explicit k-points to a file or file-like object in bands_inspect HDF5 format. If the ``weights`` keyword argument is given, the weights of the k-points are written to an additional 'weights' dataset, which is read only by the driver script.
+
+    Except for ``kpoints_array`` and ``weights``, all positional and keyword arguments are passed to :class:`h5py.File`.
+    """
+    weights = kwargs.pop('weights', None)
+    with h5py.File(*args, **kwargs) as hdf5_handle:
+        hdf5_handle['type_tag'] = 'kpoints_explicit'
+        hdf5_handle['kpoints'] = np.array(kpoints_array)
+        if weights is not None:
+            hdf5_handle['weights'] = np.array(weights)
+
+
+def get_eigenvals_shape(hdf5_handle):
+    """
+    Return the shape (number of k-points, number of bands) of the eigenvalues in an open bands_inspect HDF5 file, without reading them.
+    """
+    return hdf5_handle['eigenvals'].shape
+
+
+def read_eigenvals_chunked(
+    hdf5_handle, out, band_slice=slice(None), chunk_size=DEFAULT_CHUNK_SIZE
+):
+    """
+    Read the eigenvalues of an open bands_inspect HDF5 file directly into the pre-allocated array ``out``, ``chunk_size`` k-points at a time. Only the bands selected by ``band_slice`` are read.
+    """
+    dataset = hdf5_handle['eigenvals']
+    num_kpoints = dataset.shape[0]
+    if out.shape[0] != num_kpoints:
+        raise ValueError(
+            "The output array has {} rows, but the file contains eigenvalues for {} k-points."
+            .format(out.shape[0], num_kpoints)
+        )
+    for start in range(0, num_kpoints, chunk_size):
+        stop = min(start + chunk_size, num_kpoints)
+        dataset.read_direct(
+            out,
+            source_sel=np.s_[start:stop, band_slice],
+            dest_sel=np.s_[start:stop]
+        )
+
+
+def iter_eigenvals_chunks(
+    hdf5_handle, band_slice=slice(None), chunk_size=DEFAULT_CHUNK_SIZE
+):
+    """
+    Iterate over the eigenvalues of an open bands_inspect HDF5 file, ``chunk_size`` k-points at a time. Yields the index of the first k-point and the eigenvalues of the chunk, for the bands selected by ``band_slice``.
+    """
+    dataset = hdf5_handle['eigenvals']
+    num_kpoints = dataset.shape[0]
+    for start in range(0, num_kpoints, chunk_size):
+        yield start, dataset[start:min(start +
+                                       chunk_size, num_kpoints), band_slice]
+
+
+def get_band_extrema(hdf5_handle, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return the minimum and maximum of each band in an open bands_inspect HDF5 file, reading ``chunk_size`` k-points at a time.
+    """
+    dataset = hdf5_handle['eigenvals']
+    num_kpoints, num_bands = dataset.shape
+    band_min = np.full(num_bands, np.inf)
+    band_max = np.full(num_bands, -np.inf)
+    for start in range(0, num_kpoints, chunk_size):
+        chunk = dataset[start:min(start + chunk_size, num_kpoints)]
+        band_min = np.minimum(band_min, chunk.min(axis=0))
+        band_max = np.maximum(band_max, chunk.max(axis=0))
+    return band_min, band_max
+
+
+def get_band_slice(
+    num_bands, band_window=None, energy_window=None, band_extrema=None
+):
+    """
+    Return the slice of band indices selected by the band window [start, stop) and the energy window [min, max]. A band is inside the energy window if any of its eigenvalues is, which requires the ``band_extrema`` (minimum and maximum of each band). Since the bands are sorted by energy, the selected bands are contiguous.
+    """
+    start, stop = band_window if band_window is not None else (0, num_bands)
+    stop = min(stop, num_bands)
+    if energy_window is not None:
+        energy_min, energy_max = energy_window
+        band_min, band_max = band_extrema
+        selected = [
+            i for i in range(start, stop)
+            if band_max[i] >= energy_min and band_min[i] <= energy_max
+        ]
+        if not selected:
+            return slice(0, 0)
+        start, stop = selected[0], selected[-1] + 1
+    return slice(start, stop)
+
+
+def get_chunk_filename(filename, index):
+    """
+    Return the name of the file for the chunk with the given index, by inserting the index before the file extension.
+    """
+    base, ext = os.path.splitext(filename)
+    return '{}_{}{}'.format(base, index, ext)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines helper functions to submit many tbmodels calculations at once, for example all combinations of a list of models and k-point sets.
+"""
+
+import os
+import json
+import hashlib
+import itertools
+import collections
+
+from aiida.orm import Group, List, Node, ProcessNode, QueryBuilder
+from aiida.engine import submit
+
+from .data.model import TbModelData, get_model_content_hash
+
+
+def get_model_nodes(paths):
+    """
+    Return a stored TbModelData for each of the given model files. Files with the same content are mapped to the same node, and existing nodes with the same ``content_hash`` are re-used. The existing nodes are looked up with a single query.
+    """
+    if not paths:
+        return []
+    content_hashes = {
+        path: get_model_content_hash(path, 'r')
+        for path in set(paths)
+    }
+    query_builder = QueryBuilder()
+    query_builder.append(
+        TbModelData,
+        filters={
+            'attributes.content_hash': {
+                'in': list(set(content_hashes.values()))
+            }
+        },
+        project=['attributes.content_hash', '*']
+    )
+    nodes = {}
+    for content_hash, node in query_builder.iterall():
+        nodes.setdefault(content_hash, node)
+
+    result = []
+    for path in paths:
+        content_hash = content_hashes[path]
+        if content_hash not in nodes:
+            nodes[content_hash] = TbModelData(file=os.path.abspath(path))
+            nodes[content_hash].store()
+        result.append(nodes[content_hash])
+    return result
+
+
+def get_inputs_product(base_inputs=None, **input_lists):
+    """
+    Create the inputs for all combinations of the given lists of input values, each combined with the (possibly nested) ``base_inputs``.
+
+    Example: ``get_inputs_product({'code': code}, tb_model=models, kpoints=kpoints_list)``.
+    """
+    base_inputs = base_inputs or {}
+    labels = sorted(input_lists)
+    return [
+        dict(base_inputs, **dict(zip(labels, values))) for values in
+        itertools.product(*[input_lists[label] for label in labels])
+    ]
+
+
+def _get_inputs_key(inputs):
+    """
+    Return a hashable key which identifies the given (nested) inputs. Nodes are identified by their UUID.
+    """
+    if isinstance(inputs, Node):
+        return ('node', inputs.uuid)
+    if isinstance(inputs, dict):
+        return tuple(
+            sorted((key, _get_inputs_key(value))
+                   for key, value in inputs.items())
+        )
+    if isinstance(inputs, (list, tuple)):
+        return tuple(_get_inputs_key(value) for value in inputs)
+    return repr(inputs)
+
+
+_BATCH_KEY_EXTRA = 'tbmodels_batch_key'
+
+
+def _get_batch_processes(group, process_class):
+    """
+    Return the processes of the given class in the group, by the hash of their inputs key, and the number of these processes which are still active.
+    """
+    query_builder = QueryBuilder()
+    query_builder.append(Group, filters={'id': group.pk}, tag='group')
+    query_builder.append(
+        ProcessNode,
+        with_group='group',
+        filters={
+            'attributes.process_label': process_class.__name__,
+            'extras': {
+                'has_key': _BATCH_KEY_EXTRA
+            }
+        },
+        project=['*']
+    )
+    process_nodes = {}
+    num_active = 0
+    for process_node, in query_builder.iterall():
+        process_nodes[process_node.get_extra(_BATCH_KEY_EXTRA)] = process_node
+        if not process_node.is_terminated:
+            num_active += 1
+    return process_nodes, num_active
+
+
+def submit_batch(process_class, inputs_list, group=None, max_active=None):
+    """
+    Submit the process for each of the given inputs to the daemon, and return the list of process nodes. The function does not wait for the processes to finish. Identical inputs are submitted only once, and map to the same process node.
+
+    If a ``group`` is given, the submitted processes are added to it, and processes with the same inputs which are already in the group are re-used instead of being submitted again. The number of active (created, waiting or running) processes in the group is then limited to ``max_active``: inputs which would exceed it are not submitted, and their entry in the returned list is ``None``. The function does not block, and should be called again (for example periodically) with the same arguments until no entry is ``None``. Since input nodes are identified by their UUID, the same (stored) nodes must be passed in each call.
+    """
+    if max_active is not None and group is None:
+        raise ValueError("A 'group' is needed to limit the active processes.")
+    keys = []
+    unique_inputs = collections.OrderedDict()
+    for inputs in inputs_list:
+        key = hashlib.sha256(
+            json.dumps(_get_inputs_key(inputs)).encode('utf-8')
+        ).hexdigest()
+        keys.append(key)
+        unique_inputs.setdefault(key, inputs)
+
+    if group is None:
+        process_nodes, num_active = {}, 0
+    else:
+        process_nodes, num_active = _get_batch_processes(group, process_class)
+    for key, inputs in unique_inputs.items():
+        if key in process_nodes:
+            continue
+        if max_active is not None and num_active >= max_active:
+            break
+        process_node = submit(process_class, **inputs)
+        if group is not None:
+            process_node.set_extra(_BATCH_KEY_EXTRA, key)
+            group.add_nodes(process_node)
+        process_nodes[key] = process_node
+        num_active += 1
+    return [process_nodes.get(key) for key in keys]
+
+
+def get_packed_inputs(tasks, base_inputs=None):
+    """
+    Create the inputs of a tbmodels.packed calculation which runs the given tasks in one job. Each task is a dictionary with the ``command`` ('slice' or 'eigenvals'), the ``tb_model`` node, and the ``slice_idx`` list or ``kpoints`` node. Nodes which are used by several tasks are passed only once.
+
+    The result of the task with index ``i`` is the output labelled ``task_<i>`` of the packed calculation. The same inputs can be passed in the ``packed`` namespace of the tbmodels.packed workflow, which links the result of each task to the inputs of that task.
+    """
+    inputs = dict(base_inputs or {})
+    tb_models = collections.OrderedDict()
+    kpoints = collections.OrderedDict()
+    labels = {}
+    packed_tasks = []
+    for task in tasks:
+        packed_task = {'command': task['command']}
+        packed_task['tb_model'] = _get_node_label(
+            tb_models, labels, task['tb_model'], 'model'
+        )
+        if task['command'] == 'slice':
+            packed_task['slice_idx'] = list(task['slice_idx'])
+        else:
+            packed_task['kpoints'] = _get_node_label(
+                kpoints, labels, task['kpoints'], 'kpoints'
+            )
+        packed_tasks.append(packed_task)
+    inputs['tasks'] = List(list=packed_tasks)
+    inputs['tb_models'] = dict(tb_models)
+    if kpoints:
+        inputs['kpoints'] = dict(kpoints)
+    return inputs
+
+
+def _get_node_label(nodes, labels, node, prefix):
+    """
+    Return the label of the node in the given (ordered) dictionary of labels and nodes, adding it if it is not yet contained. The ``labels`` dictionary maps the keys of the contained nodes to their label.
+    """
+    key = _get_inputs_key(node)
+    if key not in labels:
+        labels[key] = '{}_{}'.format(prefix, len(nodes))
+        nodes[labels[key]] = node
+    return labels[key]
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the parser for the output of the tbmodels.dos calculation.
+"""
+
+import h5py
+import numpy as np
+
+from aiida.engine import ExitCode
+
+from ..io import iter_eigenvals_chunks
+from ..dos import get_bin_edges, get_default_energy_range, add_histogram, create_dos_data
+from ..calcfunctions.kpoints import get_num_kpoints, reduce_kpoints_mesh
+from .eigenvals import EigenvalsParserBase
+
+
+class DosParser(EigenvalsParserBase):
+    """
+    Parse the eigenvalues calculated by 'tbmodels eigenvals' to a density of states. The eigenvalues of each chunk of k-points are read in turn and added to a histogram, such that they are never held in memory for all k-points. If only the irreducible k-points were computed, each of them is weighted by the number of k-points of the mesh it represents. If the histogram was accumulated in the job, the histograms of all chunks are added instead.
+    """
+    def parse(self, **kwargs):  # pylint: disable=inconsistent-return-statements
+        paths = self._get_output_paths(**kwargs)
+        if isinstance(paths, ExitCode):
+            return paths
+        if self.node.get_option('accumulate_remote'):
+            return self._parse_histograms(paths)
+        energy_range = self.node.get_option('energy_range')
+        smearing = self.node.get_option('smearing')
+
+        try:
+            shapes, band_slice, (band_min, band_max) = self._read_band_slice(
+                paths, band_extrema=energy_range is None
+            )
+            if len(range(shapes[0][1])[band_slice]) == 0:
+                return self.exit_codes.ERROR_INVALID_BAND_WINDOW
+
+            num_computed = sum(shape[0] for shape in shapes)
+            if 'symmetries' in self.node.inputs:
+                _, mapping = reduce_kpoints_mesh(
+                    self.node.inputs.kpoints, self.node.inputs.symmetries
+                )
+                weights = np.bincount(mapping)
+                num_kpoints = len(mapping)
+                num_expected = len(weights)
+            else:
+                weights = None
+                num_kpoints = get_num_kpoints(self.node.inputs.kpoints)
+                num_expected = num_kpoints
+            if num_expected != num_computed:
+                return self.exit_codes.ERROR_OUTPUT_FILE
+
+            if energy_range is None:
+                energy_range = get_default_energy_range(
+                    band_min[band_slice], band_max[band_slice], smearing
+                )
+            bin_edges = get_bin_edges(
+                energy_range, self.node.get_option('num_energies')
+            )
+            histogram = np.zeros(len(bin_edges) - 1)
+            offset = 0
+            for path, shape in zip(paths, shapes):
+                with h5py.File(path, 'r') as hdf5_handle:
+                    for start, eigenvals in iter_eigenvals_chunks(
+                        hdf5_handle, band_slice=band_slice
+                    ):
+                        if weights is None:
+                            chunk_weights = None
+                        else:
+                            chunk_start = offset + start
+                            chunk_weights = weights[chunk_start:chunk_start +
+                                                    len(eigenvals)]
+                        add_histogram(
+                            histogram,
+                            eigenvals,
+                            bin_edges,
+                            weights=chunk_weights
+                        )
+                offset += shape[0]
+        except (IOError, KeyError):
+            return self.exit_codes.ERROR_OUTPUT_FILE
+
+        self.out(
+            'dos',
+            create_dos_data(histogram, bin_edges, num_kpoints, smearing)
+        )
+
+    def _parse_histograms(self, paths):
+        """
+        Add the histograms accumulated by the driver script for each chunk of k-points, and create the density of states.
+        """
+        bin_edges = get_bin_edges(
+            self.node.get_option('energy_range'),
+            self.node.get_option('num_energies')
+        )
+        histogram = np.zeros(len(bin_edges) - 1)
+        weight_sum = 0
+        try:
+            for path in paths:
+                with h5py.File(path, 'r') as hdf5_handle:
+                    if hdf5_handle['num_bands'][()] == 0:
+                        return self.exit_codes.ERROR_INVALID_BAND_WINDOW
+                    histogram += hdf5_handle['histogram'][()]
+                    weight_sum += hdf5_handle['weight_sum'][()]
+        except (IOError, KeyError):
+            return self.exit_codes.ERROR_OUTPUT_FILE
+        # With symmetries, the weights of the irreducible k-points add up
+        # to the number of k-points of the full mesh.
+        num_kpoints = get_num_kpoints(self.node.inputs.kpoints)
+        if not np.isclose(weight_sum, num_kpoints):
+            return self.exit_codes.ERROR_OUTPUT_FILE
+        self.out(
+            'dos',
+            create_dos_data(
+                histogram, bin_edges, num_kpoints,
+                self.node.get_option('smearing')
+            )
+        )
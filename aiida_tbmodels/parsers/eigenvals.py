@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the parser for the output of the tbmodels.eigenvals calculation.
+"""
+
+import os
+
+import h5py
+import numpy as np
+
+from aiida.orm import List
+from aiida.engine import ExitCode
+from aiida.parsers.parser import Parser
+
+from ..io import get_chunk_filename, get_eigenvals_shape, read_eigenvals_chunked, get_band_extrema, get_band_slice
+from ..calcfunctions.kpoints import get_bands_data, reduce_kpoints_mesh
+from ..data.eigenvectors import EigenvectorsData, copy_eigenvectors
+
+
+def _is_complete(path):
+    """
+    Check if the given eigenvalues file exists and can be read. A file which was interrupted while being written is incomplete.
+    """
+    try:
+        with h5py.File(path, 'r') as hdf5_handle:
+            get_eigenvals_shape(hdf5_handle)
+    except (IOError, OSError, KeyError):
+        return False
+    return True
+
+
+class EigenvalsParserBase(Parser):
+    """
+    Base class for parsers which read the eigenvalues calculated by 'tbmodels eigenvals', possibly split into several chunks of k-points.
+    """
+    def _get_output_paths(self, **kwargs):
+        """
+        Return the paths of the eigenvalues files of all chunks, in the order of the input k-points. If some of the chunks are missing, their indices are returned in the ``completed_chunks`` output, for restarting the calculation, and the exit code is returned instead.
+        """
+        try:
+            retrieved_temporary_folder = kwargs['retrieved_temporary_folder']
+        except KeyError:
+            return self.exit_codes.ERROR_OUTPUT_FILE
+
+        output_filename = self.node.get_option('output_filename')
+        num_chunks = max(
+            self.node.get_option('num_processes'),
+            self.node.get_option('num_checkpoints') or 1
+        )
+        if num_chunks == 1:
+            filenames = [output_filename]
+        else:
+            filenames = [
+                get_chunk_filename(output_filename, i)
+                for i in range(num_chunks)
+            ]
+        paths = [
+            os.path.join(retrieved_temporary_folder, filename)
+            for filename in filenames
+        ]
+        if num_chunks > 1:
+            completed_chunks = [
+                i for i, path in enumerate(paths) if _is_complete(path)
+            ]
+            if len(completed_chunks) < num_chunks:
+                self.out('completed_chunks', List(list=completed_chunks))
+                return self.exit_codes.ERROR_INCOMPLETE_CHUNKS
+        return paths
+
+    def _read_band_slice(self, paths, band_extrema=False):
+        """
+        Read the shapes of the eigenvalues files, and determine the slice of bands selected by the ``band_window`` and ``energy_window`` options. Returns the shapes, the band slice, and the minimum and maximum of each band, which are only read if needed for the energy window or if ``band_extrema`` is set.
+        """
+        band_window = self.node.get_option('band_window')
+        energy_window = self.node.get_option('energy_window')
+        shapes = []
+        band_min = band_max = None
+        for path in paths:
+            with h5py.File(path, 'r') as hdf5_handle:
+                shapes.append(get_eigenvals_shape(hdf5_handle))
+                if energy_window is not None or band_extrema:
+                    chunk_min, chunk_max = get_band_extrema(hdf5_handle)
+                    if band_min is None:
+                        band_min, band_max = chunk_min, chunk_max
+                    else:
+                        band_min = np.minimum(band_min, chunk_min)
+                        band_max = np.maximum(band_max, chunk_max)
+        band_slice = get_band_slice(
+            shapes[0][1],
+            band_window=band_window,
+            energy_window=energy_window,
+            band_extrema=(band_min, band_max)
+        )
+        return shapes, band_slice, (band_min, band_max)
+
+
+class EigenvalsParser(EigenvalsParserBase):
+    """
+    Parse the eigenvalues calculated by 'tbmodels eigenvals' to a BandsData. The eigenvalues are read in chunks directly into the output array, keeping only the bands selected by the ``band_window`` and ``energy_window`` options. If the k-points were split between several processes, the eigenvalues of all chunks are merged in the order of the input k-points. If some of the chunks are missing, their indices are returned in the ``completed_chunks`` output, for restarting the calculation. If only the irreducible k-points were computed, the eigenvalues are unfolded to the full k-point mesh. If the ``eigenvectors`` option is set, the eigenvectors of the selected bands are merged into the ``eigenvectors`` output, one k-point at a time.
+    """
+    def parse(self, **kwargs):  # pylint: disable=inconsistent-return-statements
+        paths = self._get_output_paths(**kwargs)
+        if isinstance(paths, ExitCode):
+            return paths
+
+        try:
+            shapes, band_slice, _ = self._read_band_slice(paths)
+            num_bands = len(range(shapes[0][1])[band_slice])
+            if num_bands == 0:
+                return self.exit_codes.ERROR_INVALID_BAND_WINDOW
+
+            eigenvals = np.empty(
+                (sum(shape[0] for shape in shapes), num_bands)
+            )
+            offset = 0
+            for path, shape in zip(paths, shapes):
+                with h5py.File(path, 'r') as hdf5_handle:
+                    read_eigenvals_chunked(
+                        hdf5_handle,
+                        eigenvals[offset:offset + shape[0]],
+                        band_slice=band_slice
+                    )
+                offset += shape[0]
+        except (IOError, KeyError):
+            return self.exit_codes.ERROR_OUTPUT_FILE
+
+        kpoints = self.node.inputs.kpoints
+        if 'symmetries' in self.node.inputs:
+            kpoints_irreducible, mapping = reduce_kpoints_mesh(
+                kpoints, self.node.inputs.symmetries
+            )
+            if len(kpoints_irreducible) != len(eigenvals):
+                return self.exit_codes.ERROR_OUTPUT_FILE
+            eigenvals = eigenvals[mapping]
+        try:
+            bands = get_bands_data(kpoints, eigenvals)
+        except ValueError:
+            # The number of eigenvalues does not match the k-points
+            return self.exit_codes.ERROR_OUTPUT_FILE
+        has_window = any(
+            self.node.get_option(name) is not None
+            for name in ['band_window', 'energy_window']
+        )
+        if has_window:
+            bands.set_attribute('first_band_index', band_slice.start)
+        if 'symmetries' in self.node.inputs:
+            bands.set_attribute(
+                'num_irreducible_kpoints', len(kpoints_irreducible)
+            )
+        self.out('bands', bands)
+
+        if self.node.get_option('eigenvectors'):
+            eigenvectors_path = os.path.join(
+                kwargs['retrieved_temporary_folder'], 'eigenvectors.hdf5'
+            )
+            try:
+                copy_eigenvectors(paths, eigenvectors_path, band_slice)
+            except (IOError, KeyError):
+                return self.exit_codes.ERROR_OUTPUT_FILE
+            self.out('eigenvectors', EigenvectorsData(file=eigenvectors_path))
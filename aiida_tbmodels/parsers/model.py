@@ -6,13 +6,19 @@
 Defines the parser for tight-binding models in TBmodels HDF5 format.
 """
 
-from aiida.plugins import DataFactory
+import os
+
+from aiida.orm import RemoteData
 from aiida.parsers.parser import Parser
 
+from ..calculations._base import ModelOutputBase
+from ..data.model import TbModelData
+from ..io import repack_model
+
 
 class ModelParser(Parser):
     """
-    Parse TBmodels output to a SinglefileData containing the model file.
+    Parse TBmodels output to a TbModelData containing the model file, or to a RemoteData referencing the model if it is kept on the remote computer.
     """
     def parse(self, **kwargs):  # pylint: disable=inconsistent-return-statements
         try:
@@ -21,12 +27,68 @@ class ModelParser(Parser):
             self.logger.error("No retrieved folder found")
             raise err
 
-        try:
-            with out_folder.open(
-                self.node.get_option('output_filename'), 'rb'
-            ) as output_file:
-                model_node = DataFactory('singlefile')(file=output_file)
-        except IOError:
-            return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
+        output_filename = self.node.get_option('output_filename')
+        if self.node.get_option('model_storage') == 'remote':
+            try:
+                with out_folder.open(
+                    ModelOutputBase._MODEL_INFO_FILE,  # pylint: disable=protected-access
+                    'r'
+                ) as info_file:
+                    sha256, size = info_file.read().split()
+                    size = int(size)
+            except (IOError, ValueError):
+                return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
+            model_node = RemoteData(
+                remote_path=self.node.get_remote_workdir(),
+                computer=self.node.computer
+            )
+            model_node.set_attribute('filename', output_filename)
+            model_node.set_attribute('sha256', sha256)
+            model_node.set_attribute('size', size)
+        else:
+            try:
+                retrieved_temporary_folder = kwargs[
+                    'retrieved_temporary_folder']
+            except KeyError:
+                return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
+            model_path = os.path.join(
+                retrieved_temporary_folder, output_filename
+            )
+            if not os.path.isfile(model_path):
+                return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
+            try:
+                if self._needs_repack():
+                    model_path = self._repack(
+                        model_path, retrieved_temporary_folder
+                    )
+                model_node = TbModelData(file=model_path)
+            except (IOError, OSError, KeyError, ValueError):
+                # The output file is not a valid model
+                return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
 
         self.out('tb_model', model_node)
+
+    def _needs_repack(self):
+        return self.node.get_option('model_float32') or any(
+            self.node.get_option(name) is not None
+            for name in ['model_compression', 'model_chunks']
+        )
+
+    def _repack(self, model_path, folder):
+        """
+        Write the model with the storage layout given in the calculation options to a sub-folder of ``folder``, and return its path.
+        """
+        repack_folder = os.path.join(folder, 'repacked')
+        os.mkdir(repack_folder)
+        repacked_path = os.path.join(
+            repack_folder, os.path.basename(model_path)
+        )
+        repack_model(
+            model_path,
+            repacked_path,
+            compression=self.node.get_option('model_compression'),
+            compression_opts=self.node.get_option('model_compression_opts'),
+            chunks=self.node.get_option('model_chunks'),
+            float32=self.node.get_option('model_float32')
+        )
+        return repacked_path
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the parser for the output of the tbmodels.packed calculation.
+"""
+
+import os
+
+import h5py
+import numpy as np
+
+from aiida.orm import List
+from aiida.parsers.parser import Parser
+
+from ..calculations.packed import get_task_filename, get_task_label
+from ..calcfunctions.kpoints import get_bands_data
+from ..data.model import TbModelData
+from ..io import get_eigenvals_shape, read_eigenvals_chunked
+
+
+class PackedParser(Parser):
+    """
+    Parse the result of each task of a tbmodels.packed calculation to a TbModelData or BandsData output. The results of the successful tasks are returned also if some of the tasks failed.
+    """
+    def parse(self, **kwargs):  # pylint: disable=inconsistent-return-statements
+        try:
+            retrieved_temporary_folder = kwargs['retrieved_temporary_folder']
+        except KeyError:
+            return self.exit_codes.ERROR_FAILED_TASKS
+
+        failed_tasks = []
+        for i, task in enumerate(self.node.inputs.tasks.get_list()):
+            path = os.path.join(
+                retrieved_temporary_folder, get_task_filename(i)
+            )
+            if not os.path.isfile(path):
+                failed_tasks.append(i)
+                continue
+            try:
+                if task['command'] == 'eigenvals':
+                    output = self._parse_bands(path, task['kpoints'])
+                else:
+                    output = TbModelData(file=path)
+            except (IOError, OSError, KeyError, ValueError):
+                failed_tasks.append(i)
+                continue
+            self.out(get_task_label(i), output)
+
+        if failed_tasks:
+            self.out('failed_tasks', List(list=failed_tasks))
+            return self.exit_codes.ERROR_FAILED_TASKS
+
+    def _parse_bands(self, path, kpoints_label):
+        """
+        Read the eigenvalues file of an 'eigenvals' task to a BandsData.
+        """
+        with h5py.File(path, 'r') as hdf5_handle:
+            eigenvals = np.empty(get_eigenvals_shape(hdf5_handle))
+            read_eigenvals_chunked(hdf5_handle, eigenvals)
+        # Raises a ValueError if the number of eigenvalues does not match.
+        return get_bands_data(
+            self.node.inputs['kpoints__{}'.format(kpoints_label)], eigenvals
+        )
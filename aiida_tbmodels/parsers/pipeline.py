@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the parser for the output of the tbmodels.pipeline calculation.
+"""
+
+import os
+
+from aiida.parsers.parser import Parser
+from aiida_bands_inspect.io import read_bands
+
+from ..calculations.pipeline import get_step_filename, get_step_label
+from ..data.model import TbModelData
+
+
+class PipelineParser(Parser):
+    """
+    Parse the models created by each step of a tbmodels.pipeline calculation to TbModelData, and the eigenvalues (if any) to BandsData.
+    """
+    def parse(self, **kwargs):  # pylint: disable=inconsistent-return-statements
+        try:
+            retrieved_temporary_folder = kwargs['retrieved_temporary_folder']
+        except KeyError:
+            self.logger.error("No retrieved temporary folder found")
+            return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
+
+        steps = self.node.inputs.steps.get_list()
+        for i, step in enumerate(steps):
+            if i == len(steps) - 1:
+                filename = self.node.get_option('output_filename')
+            else:
+                filename = get_step_filename(i)
+            output_path = os.path.join(retrieved_temporary_folder, filename)
+            if step['command'] == 'eigenvals':
+                try:
+                    with open(output_path, 'rb') as output_file:
+                        self.out('bands', read_bands(output_file))
+                except (IOError, OSError):
+                    return self.exit_codes.ERROR_OUTPUT_BANDS_FILE
+            else:
+                try:
+                    model_node = TbModelData(file=output_path)
+                except (IOError, OSError, ValueError):
+                    return self.exit_codes.ERROR_OUTPUT_MODEL_FILE
+                if i == len(steps) - 1:
+                    self.out('tb_model', model_node)
+                else:
+                    self.out(get_step_label(i), model_node)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Standalone scripts which are copied to the remote computer and run by the calculations, for the tasks which are not available in the 'tbmodels' command line interface.
+"""
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Script which computes the eigenvalues of a TBmodels model, for the features which are not available in 'tbmodels eigenvals': computing only the eigenvalues closest to a target energy with a shift-invert sparse solver, where the Hamiltonian is never created as a dense matrix, writing the eigenvectors, and accumulating a histogram of the eigenvalues instead of writing them.
+
+The k-points and eigenvalues are read and written in the same bands_inspect HDF5 format as used by 'tbmodels eigenvals'. The script is copied to the remote computer by the tbmodels.eigenvals calculation, and only depends on numpy, scipy, h5py and tbmodels.
+"""
+
+import argparse
+
+import h5py
+import numpy as np
+
+
+def sparse_hamilton(model, k):
+    """
+    Build the Hamiltonian of a TBmodels Model at the k-point ``k`` as a sparse matrix, without creating the dense matrix. Like :meth:`tbmodels.Model.hamilton`, the stored hoppings are summed with their phase factor and the hermitian conjugate is added.
+    """
+    import scipy.sparse
+    k = np.array(k)
+    ham = scipy.sparse.csr_matrix((model.size, model.size), dtype=complex)
+    for R, hop in model.hop.items():
+        ham = ham + scipy.sparse.csr_matrix(hop) * np.exp(
+            2j * np.pi * np.dot(R, k)
+        )
+    return ham + ham.conjugate().transpose()
+
+
+def sparse_eigenval(model, k, num_eigenvals, target_energy):
+    """
+    Compute the ``num_eigenvals`` eigenvalues closest to ``target_energy`` at the k-point ``k``, with a shift-invert sparse solver. The eigenvalues are returned in ascending order.
+    """
+    import scipy.sparse.linalg
+    eigenvals = scipy.sparse.linalg.eigsh(
+        sparse_hamilton(model, k),
+        k=num_eigenvals,
+        sigma=target_energy,
+        which='LM',
+        return_eigenvectors=False
+    )
+    return np.sort(eigenvals)
+
+
+def sparse_eigh(model, k, num_eigenvals, target_energy):
+    """
+    Like :func:`sparse_eigenval`, but also return the eigenvectors as columns of a matrix, in the order of the eigenvalues.
+    """
+    import scipy.sparse.linalg
+    eigenvals, eigenvectors = scipy.sparse.linalg.eigsh(
+        sparse_hamilton(model, k),
+        k=num_eigenvals,
+        sigma=target_energy,
+        which='LM'
+    )
+    order = np.argsort(eigenvals)
+    return eigenvals[order], eigenvectors[:, order]
+
+
+def read_kpoints(hdf5_handle):
+    """
+    Read the explicit k-points from an open bands_inspect HDF5 k-points file. The k-points of a mesh are created in the same order as by AiiDA.
+    """
+    type_tag = hdf5_handle['type_tag'][()]
+    if isinstance(type_tag, bytes):
+        type_tag = type_tag.decode('utf-8')
+    if 'kpoints_mesh' in type_tag:
+        mesh = np.array(hdf5_handle['mesh'][()])
+        offset = np.array(hdf5_handle['offset'][()], dtype=float)
+        indices = np.array(np.unravel_index(np.arange(np.prod(mesh)), mesh)).T
+        return (indices + offset) / mesh
+    return hdf5_handle['kpoints'][()]
+
+
+def read_weights(hdf5_handle):
+    """
+    Read the weights of the k-points from an open k-points file, or return None if the file contains no weights.
+    """
+    if 'weights' in hdf5_handle:
+        return hdf5_handle['weights'][()]
+    return None
+
+
+def create_eigenvectors_file(hdf5_handle, kpoints, num_orbitals, num_bands):
+    """
+    Create the datasets of an eigenvectors file in the given open HDF5 file, and return the (empty) 'eigenvals' and 'eigenvectors' datasets. The eigenvectors are stored with one chunk per k-point, such that they can be read one k-point at a time.
+    """
+    num_kpoints = len(kpoints)
+    hdf5_handle['kpoints'] = kpoints
+    eigenvals = hdf5_handle.create_dataset(
+        'eigenvals', shape=(num_kpoints, num_bands), dtype=float
+    )
+    eigenvectors = hdf5_handle.create_dataset(
+        'eigenvectors',
+        shape=(num_kpoints, num_orbitals, num_bands),
+        dtype=complex,
+        chunks=(1, num_orbitals, num_bands)
+    )
+    return eigenvals, eigenvectors
+
+
+def get_eigenval_functions(model, num_eigenvals=None, target_energy=0.):
+    """
+    Return the number of bands, and the functions which compute the eigenvalues, and the eigenvalues and eigenvectors at a k-point. If ``num_eigenvals`` is given, only the eigenvalues closest to ``target_energy`` are computed with the sparse solver.
+    """
+    if num_eigenvals is None:
+
+        def eigh(k):
+            return np.linalg.eigh(model.hamilton(k))
+
+        return model.size, model.eigenval, eigh
+
+    def sparse_eigh_k(k):
+        return sparse_eigh(model, k, num_eigenvals, target_energy)
+
+    def sparse_eigenval_k(k):
+        return sparse_eigenval(model, k, num_eigenvals, target_energy)
+
+    return num_eigenvals, sparse_eigenval_k, sparse_eigh_k
+
+
+def write_eigenvals(
+    model,
+    kpoints,
+    output_filename,
+    num_eigenvals=None,
+    target_energy=0.,
+    eigenvectors=False
+):
+    """
+    Compute the eigenvalues at the given k-points, and write them to a file in bands_inspect HDF5 format. The eigenvalues are written one k-point at a time.
+
+    If ``num_eigenvals`` is given, only the eigenvalues closest to ``target_energy`` are computed with the sparse solver. If ``eigenvectors`` is set, the eigenvectors are also written, in the format of the :class:`.EigenvectorsData` (which also contains the 'eigenvals' dataset).
+    """
+    num_bands, eigenval, eigh = get_eigenval_functions(
+        model, num_eigenvals=num_eigenvals, target_energy=target_energy
+    )
+
+    with h5py.File(output_filename, 'w') as hdf5_handle:
+        if eigenvectors:
+            eigenvals_dset, eigenvectors_dset = create_eigenvectors_file(
+                hdf5_handle, kpoints, model.size, num_bands
+            )
+            for i, k in enumerate(kpoints):
+                eigenvals_dset[i], eigenvectors_dset[i] = eigh(k)
+        else:
+            hdf5_handle['type_tag'] = 'bands_inspect.eigenvals_data'
+            kpoints_obj = hdf5_handle.create_group('kpoints_obj')
+            kpoints_obj['type_tag'] = 'bands_inspect.kpoints_explicit'
+            kpoints_obj['kpoints'] = kpoints
+            eigenvals_dset = hdf5_handle.create_dataset(
+                'eigenvals', shape=(len(kpoints), num_bands), dtype=float
+            )
+            for i, k in enumerate(kpoints):
+                eigenvals_dset[i] = eigenval(k)
+
+
+def write_histogram(
+    model,
+    kpoints,
+    output_filename,
+    energy_range,
+    num_energies,
+    weights=None,
+    band_window=None,
+    num_eigenvals=None,
+    target_energy=0.
+):
+    """
+    Compute the eigenvalues at the given k-points, and write their histogram in ``num_energies`` equally spaced bins of the ``energy_range`` to a HDF5 file. Only the histogram is kept in memory, one k-point at a time. The optional ``weights`` are the weights of the k-points, and the ``band_window`` [start, stop) selects the bands which are counted.
+
+    The file contains the 'histogram', the number of counted bands 'num_bands', and the sum of the k-point weights 'weight_sum'.
+    """
+    num_bands, eigenval, _ = get_eigenval_functions(
+        model, num_eigenvals=num_eigenvals, target_energy=target_energy
+    )
+    band_slice = slice(*band_window) if band_window else slice(None)
+    if weights is None:
+        weights = np.ones(len(kpoints))
+    bin_edges = np.linspace(energy_range[0], energy_range[1], num_energies + 1)
+    histogram = np.zeros(num_energies)
+    for k, weight in zip(kpoints, weights):
+        eigenvals = np.asarray(eigenval(k))[band_slice]
+        histogram += np.histogram(
+            eigenvals,
+            bins=bin_edges,
+            weights=np.full(len(eigenvals), weight, dtype=float)
+        )[0]
+    with h5py.File(output_filename, 'w') as hdf5_handle:
+        hdf5_handle['histogram'] = histogram
+        hdf5_handle['num_bands'] = len(range(num_bands)[band_slice])
+        hdf5_handle['weight_sum'] = np.sum(weights)
+
+
+def main():
+    """
+    Run the script with the command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-i', '--input', default='model.hdf5')
+    parser.add_argument('-k', '--kpoints', default='kpoints.hdf5')
+    parser.add_argument('-o', '--output', default='eigenvals.hdf5')
+    parser.add_argument('--num-eigenvals', type=int)
+    parser.add_argument('--target-energy', type=float, default=0.)
+    parser.add_argument('--eigenvectors', action='store_true')
+    parser.add_argument('--histogram-range', type=float, nargs=2)
+    parser.add_argument('--histogram-num-energies', type=int, default=1000)
+    parser.add_argument('--band-window', type=int, nargs=2)
+    args = parser.parse_args()
+
+    import tbmodels
+    model = tbmodels.Model.from_hdf5_file(args.input)
+    with h5py.File(args.kpoints, 'r') as hdf5_handle:
+        kpoints = read_kpoints(hdf5_handle)
+        weights = read_weights(hdf5_handle)
+    if args.histogram_range is not None:
+        write_histogram(
+            model,
+            kpoints,
+            args.output,
+            energy_range=args.histogram_range,
+            num_energies=args.histogram_num_energies,
+            weights=weights,
+            band_window=args.band_window,
+            num_eigenvals=args.num_eigenvals,
+            target_energy=args.target_energy
+        )
+        return
+    write_eigenvals(
+        model,
+        kpoints,
+        args.output,
+        num_eigenvals=args.num_eigenvals,
+        target_energy=args.target_energy,
+        eigenvectors=args.eigenvectors
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.eigenvals_refinement workflow.
+"""
+
+import numpy as np
+
+from aiida.orm import Int, Float
+from aiida.engine import WorkChain, ToContext, while_, if_
+from aiida.plugins import DataFactory
+
+from ..calculations.eigenvals import EigenvalsCalculation
+from ..calcfunctions.refinement import get_initial_cells, get_iteration_label, refine_kpoints, concatenate_bands
+
+
+class EigenvalsRefinementWorkChain(WorkChain):
+    """
+    Workflow which computes the eigenvalues on a coarse k-point mesh, and then iteratively refines the mesh only in the cells which contain a near-degeneracy, a crossing of the Fermi energy, or a large variation of the bands. Each iteration runs a 'tbmodels eigenvals' calculation on the new k-points only, and the eigenvalues at all k-points are returned as a single band structure.
+
+    The ``symmetries`` and ``parent_folder`` inputs of the calculation are not exposed, since the refined k-points are not a mesh and differ in each iteration. The ``band_window`` and ``energy_window`` options are rejected, because the bands of all iterations must match to be compared and concatenated.
+    """
+    @classmethod
+    def define(cls, spec):
+        super(EigenvalsRefinementWorkChain, cls).define(spec)
+
+        spec.expose_inputs(
+            EigenvalsCalculation,
+            namespace='eigenvals',
+            exclude=('kpoints', 'symmetries', 'parent_folder')
+        )
+        spec.input(
+            'kpoints',
+            valid_type=DataFactory('array.kpoints'),
+            help="Gamma-centered k-point mesh on which the refinement starts."
+        )
+        spec.input(
+            'num_iterations',
+            valid_type=Int,
+            default=Int(2),
+            help="Maximum number of refinement iterations."
+        )
+        spec.input(
+            'refinement_factor',
+            valid_type=Int,
+            default=Int(2),
+            help=
+            "Factor by which the k-point spacing is reduced in each refined cell, per iteration."
+        )
+        spec.input(
+            'gap_threshold',
+            valid_type=Float,
+            required=False,
+            help=
+            "Refine the cells where the gap between two adjacent bands is smaller than this value."
+        )
+        spec.input(
+            'fermi_energy',
+            valid_type=Float,
+            required=False,
+            help="Refine the cells where a band crosses this energy."
+        )
+        spec.input(
+            'energy_variation',
+            valid_type=Float,
+            required=False,
+            help="Refine the cells where a band varies by more than this value."
+        )
+        spec.output(
+            'bands',
+            valid_type=DataFactory('array.bands'),
+            help=
+            "The eigenvalues at the k-points of the initial mesh and of all refinement iterations."
+        )
+        spec.exit_code(
+            400,
+            'ERROR_CALCULATION_FAILED',
+            message='At least one of the eigenvals calculations failed.'
+        )
+        spec.exit_code(
+            401,
+            'ERROR_INVALID_KPOINTS',
+            message=
+            'The k-points must be a Gamma-centered mesh, and the refinement factor at least two.'
+        )
+        spec.exit_code(
+            402,
+            'ERROR_INVALID_OPTIONS',
+            message=
+            "The 'band_window' and 'energy_window' options cannot be used, since the bands of all iterations must match."
+        )
+
+        spec.outline(
+            cls.setup, cls.run_eigenvals, cls.inspect_eigenvals,
+            while_(cls.should_refine)(
+                cls.refine, if_(cls.has_new_kpoints
+                                )(cls.run_eigenvals, cls.inspect_eigenvals)
+            ), cls.finalize
+        )
+
+    def setup(self):
+        """
+        Check the inputs, and create the cells of the initial mesh.
+        """
+        kpoints = self.inputs.kpoints
+        if 'mesh' not in kpoints.attributes or self.inputs.refinement_factor.value < 2:
+            return self.exit_codes.ERROR_INVALID_KPOINTS
+        _, offset = kpoints.get_kpoints_mesh()
+        if np.any(offset):
+            return self.exit_codes.ERROR_INVALID_KPOINTS
+        inputs = self.exposed_inputs(EigenvalsCalculation, 'eigenvals')
+        options = inputs.get('metadata', {}).get('options', {})
+        if any(
+            options.get(name, None) is not None
+            for name in ['band_window', 'energy_window']
+        ):
+            return self.exit_codes.ERROR_INVALID_OPTIONS
+        self.ctx.iteration = 0
+        self.ctx.kpoints = kpoints
+        self.ctx.cells = get_initial_cells(
+            kpoints=kpoints,
+            refinement_factor=self.inputs.refinement_factor,
+            num_iterations=self.inputs.num_iterations
+        )
+        self.ctx.bands = {}
+
+    def run_eigenvals(self):
+        """
+        Submit the eigenvals calculation for the k-points of the current iteration.
+        """
+        inputs = self.exposed_inputs(EigenvalsCalculation, 'eigenvals')
+        calc = self.submit(
+            EigenvalsCalculation, kpoints=self.ctx.kpoints, **inputs
+        )
+        return ToContext(calc=calc)
+
+    def inspect_eigenvals(self):
+        """
+        Check that the eigenvals calculation finished ok, and keep its result together with the previous iterations.
+        """
+        calc = self.ctx.calc
+        if not calc.is_finished_ok:
+            self.report(
+                'Calculation of iteration {} (pk {}) did not finish ok.'.
+                format(self.ctx.iteration, calc.pk)
+            )
+            return self.exit_codes.ERROR_CALCULATION_FAILED
+        self.ctx.bands[get_iteration_label(self.ctx.iteration)
+                       ] = calc.outputs.bands
+
+    def should_refine(self):
+        return (
+            self.ctx.iteration < self.inputs.num_iterations.value
+            and len(self.ctx.cells.get_array('sizes')) > 0
+        )
+
+    def refine(self):
+        """
+        Select and split the cells which need to be refined, and create the new k-points.
+        """
+        refine_inputs = {
+            key: self.inputs[key]
+            for key in ['gap_threshold', 'fermi_energy', 'energy_variation']
+            if key in self.inputs
+        }
+        refine_inputs.update(self.ctx.bands)
+        result = refine_kpoints(
+            cells=self.ctx.cells,
+            refinement_factor=self.inputs.refinement_factor,
+            **refine_inputs
+        )
+        self.ctx.iteration += 1
+        self.ctx.cells = result['cells']
+        self.ctx.kpoints = result.get('kpoints', None)
+        self.report(
+            'Iteration {}: refining {} cells.'.format(
+                self.ctx.iteration, len(self.ctx.cells.get_array('sizes'))
+            )
+        )
+
+    def has_new_kpoints(self):
+        return self.ctx.kpoints is not None
+
+    def finalize(self):
+        """
+        Merge the band structures of all iterations, and return the result.
+        """
+        self.out('bands', concatenate_bands(**self.ctx.bands))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.eigenvals_sharded workflow.
+"""
+
+from aiida.orm import Int
+from aiida.engine import WorkChain, ToContext
+from aiida.plugins import DataFactory
+
+from ..calculations.eigenvals import EigenvalsCalculation
+from ..calcfunctions.kpoints import split_kpoints, merge_bands
+
+
+class EigenvalsShardedWorkChain(WorkChain):
+    """
+    Workflow which splits the k-points into shards, runs a 'tbmodels eigenvals' calculation for each shard concurrently, and merges the results into a single band structure.
+
+    The ``symmetries`` and ``parent_folder`` inputs of the calculation are not exposed, since the shards are not k-point meshes and do not match the chunks of a previous calculation. The ``energy_window`` option is rejected, because it would select different bands in each shard.
+    """
+    @classmethod
+    def define(cls, spec):
+        super(EigenvalsShardedWorkChain, cls).define(spec)
+
+        spec.expose_inputs(
+            EigenvalsCalculation,
+            namespace='eigenvals',
+            exclude=('kpoints', 'symmetries', 'parent_folder')
+        )
+        spec.input(
+            'kpoints',
+            valid_type=DataFactory('array.kpoints'),
+            help="Kpoints for which the eigenvalues are calculated."
+        )
+        spec.input(
+            'num_shards',
+            valid_type=Int,
+            help=
+            "Number of shards into which the k-points are split. Each shard is run as a separate calculation."
+        )
+        spec.output(
+            'bands',
+            valid_type=DataFactory('array.bands'),
+            help=
+            "The calculated eigenvalues of the model at the given k-points, in the original k-point order."
+        )
+        spec.exit_code(
+            400,
+            'ERROR_SHARD_FAILED',
+            message='At least one of the eigenvals calculations failed.'
+        )
+        spec.exit_code(
+            401,
+            'ERROR_INVALID_OPTIONS',
+            message=
+            "The 'energy_window' option cannot be used, since it selects the bands of each shard separately."
+        )
+
+        spec.outline(cls.split, cls.run_shards, cls.merge)
+
+    def split(self):
+        """
+        Check the options, and split the input k-points into shards.
+        """
+        inputs = self.exposed_inputs(EigenvalsCalculation, 'eigenvals')
+        options = inputs.get('metadata', {}).get('options', {})
+        if options.get('energy_window', None) is not None:
+            return self.exit_codes.ERROR_INVALID_OPTIONS
+        self.ctx.kpoints_shards = split_kpoints(
+            self.inputs.kpoints, self.inputs.num_shards
+        )
+
+    def run_shards(self):
+        """
+        Submit one eigenvals calculation per k-point shard.
+        """
+        inputs = self.exposed_inputs(EigenvalsCalculation, 'eigenvals')
+        calcs = {}
+        for label, kpoints in self.ctx.kpoints_shards.items():
+            calcs[label] = self.submit(
+                EigenvalsCalculation, kpoints=kpoints, **inputs
+            )
+        return ToContext(**calcs)
+
+    def merge(self):
+        """
+        Merge the band structures of all shards.
+        """
+        bands = {}
+        for label in self.ctx.kpoints_shards:
+            calc = self.ctx[label]
+            if not calc.is_finished_ok:
+                self.report(
+                    "Calculation for '{}' (pk {}) did not finish ok.".format(
+                        label, calc.pk
+                    )
+                )
+                return self.exit_codes.ERROR_SHARD_FAILED
+            bands[label] = calc.outputs.bands
+        self.out('bands', merge_bands(self.inputs.kpoints, **bands))
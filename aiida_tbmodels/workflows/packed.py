@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Defines the tbmodels.packed workflow.
+"""
+
+from aiida.orm import List, SinglefileData
+from aiida.engine import WorkChain, ToContext
+from aiida.plugins import DataFactory
+
+from ..calculations.packed import PackedCalculation, get_task_label
+from ..calcfunctions.packed import unpack_task
+
+
+class PackedWorkChain(WorkChain):
+    """
+    Workflow which runs many 'tbmodels slice' and 'tbmodels eigenvals' tasks in a single tbmodels.packed calculation, and returns the result of each task as a separate node. The result of the task with index ``i`` is the output ``task_<i>``, created by an :func:`.unpack_task` calcfunction whose inputs are the model and the k-points or slice indices of that task only.
+    """
+    @classmethod
+    def define(cls, spec):
+        super(PackedWorkChain, cls).define(spec)
+
+        spec.expose_inputs(PackedCalculation, namespace='packed')
+        spec.outputs.dynamic = True
+        spec.outputs.valid_type = (SinglefileData, DataFactory('array.bands'))
+        spec.output(
+            'failed_tasks',
+            valid_type=List,
+            required=False,
+            help="Indices of the tasks whose output could not be parsed."
+        )
+        spec.exit_code(
+            400,
+            'ERROR_CALCULATION_FAILED',
+            message='The packed calculation failed.'
+        )
+        spec.exit_code(
+            401,
+            'ERROR_FAILED_TASKS',
+            message='At least one of the tasks failed.'
+        )
+
+        spec.outline(cls.run_packed, cls.unpack)
+
+    def run_packed(self):
+        """
+        Submit the packed calculation which runs all tasks.
+        """
+        calc = self.submit(
+            PackedCalculation,
+            **self.exposed_inputs(PackedCalculation, 'packed')
+        )
+        return ToContext(packed=calc)
+
+    def unpack(self):
+        """
+        Create the result node of each successful task, linked to the inputs of the task.
+        """
+        calc = self.ctx.packed
+        failed_tasks = calc.process_class.exit_codes.ERROR_FAILED_TASKS.status
+        if not calc.is_finished_ok and calc.exit_status != failed_tasks:
+            self.report(
+                'Packed calculation (pk {}) did not finish ok.'.format(
+                    calc.pk
+                )
+            )
+            return self.exit_codes.ERROR_CALCULATION_FAILED
+        for i, task in enumerate(calc.inputs.tasks.get_list()):
+            label = get_task_label(i)
+            if label not in calc.outputs:
+                continue
+            task_inputs = {
+                'tb_model':
+                calc.inputs['tb_models__{}'.format(task['tb_model'])],
+                'result': calc.outputs[label]
+            }
+            if task['command'] == 'eigenvals':
+                task_inputs['kpoints'] = calc.inputs['kpoints__{}'.format(
+                    task['kpoints']
+                )]
+            else:
+                task_inputs['slice_idx'] = List(list=task['slice_idx'])
+            self.out(label, unpack_task(**task_inputs))
+        if 'failed_tasks' in calc.outputs:
+            self.out('failed_tasks', calc.outputs.failed_tasks)
+            return self.exit_codes.ERROR_FAILED_TASKS
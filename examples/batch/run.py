@@ -0,0 +1,53 @@
+#!/usr/bin/env runaiida
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Submits 'tbmodels eigenvals' calculations for all combinations of a list of models and k-point meshes.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+from aiida.orm import Code
+from aiida.plugins import DataFactory
+
+from aiida_tbmodels.calculations.eigenvals import EigenvalsCalculation
+from aiida_tbmodels.launch import get_model_nodes, get_inputs_product, submit_batch
+
+
+def submit_eigenvals_batch():
+    """
+    Creates and submits the eigenvals calculations.
+    """
+    tb_models = get_model_nodes(['../eigenvals/reference_input/model.hdf5'])
+
+    kpoints_list = []
+    for mesh_size in [4, 6, 8]:
+        kpoints = DataFactory('array.kpoints')()
+        kpoints.set_kpoints_mesh([mesh_size] * 3, offset=[0, 0, 0])
+        kpoints_list.append(kpoints)
+
+    inputs_list = get_inputs_product(
+        {
+            'code': Code.get_from_string('tbmodels'),
+            # single-core on local machine
+            'metadata': {
+                'options': {
+                    'resources': {
+                        'num_machines': 1,
+                        'tot_num_mpiprocs': 1
+                    },
+                    'withmpi': False
+                }
+            }
+        },
+        tb_model=tb_models,
+        kpoints=kpoints_list
+    )
+    calcs = submit_batch(EigenvalsCalculation, inputs_list)
+    print('Submitted calculations with PKs', [calc.pk for calc in calcs])
+
+
+if __name__ == '__main__':
+    submit_eigenvals_batch()
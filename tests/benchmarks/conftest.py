@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Fixtures for the aiida-tbmodels benchmarks, which create synthetic models and mock calculation nodes.
+
+The benchmarks require pytest-benchmark. They are skipped in a regular test run, and are run with ``pytest benchmarks --benchmark-only`` from the ``tests`` directory. They can be compared between versions with the ``--benchmark-autosave`` and ``--benchmark-compare`` options.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import os
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Skip the benchmarks unless the ``--benchmark-only`` option is given.
+    """
+    if config.getoption('benchmark_only', default=False):
+        return
+    skip_benchmark = pytest.mark.skip(
+        reason='Benchmarks are only run with --benchmark-only.'
+    )
+    for item in items:
+        if 'benchmark' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip_benchmark)
+
+
+@pytest.fixture
+def synthetic_model(tmpdir):
+    """
+    Fixture which writes a random tight-binding model with the given number of orbitals and R-vectors in TBmodels HDF5 format, and returns its path.
+    """
+    def inner(num_orbitals, num_hoppings):
+        import h5py
+        import numpy as np
+
+        path = str(
+            tmpdir.join('model_{}_{}.hdf5'.format(num_orbitals, num_hoppings))
+        )
+        with h5py.File(path, 'w') as hdf5_handle:
+            hdf5_handle['uc'] = np.eye(3)
+            hdf5_handle['occ'] = num_orbitals // 2
+            hdf5_handle['size'] = num_orbitals
+            hdf5_handle['dim'] = 3
+            hdf5_handle['pos'] = np.random.uniform(size=(num_orbitals, 3))
+            hdf5_handle['sparse'] = False
+            hop = hdf5_handle.create_group('hop')
+            for i in range(num_hoppings):
+                group = hop.create_group(str(i))
+                group['R'] = [i, 0, 0]
+                group['mat'] = (
+                    np.random.uniform(size=(num_orbitals, num_orbitals)) +
+                    1j * np.random.uniform(size=(num_orbitals, num_orbitals))
+                )
+        return path
+
+    return inner
+
+
+@pytest.fixture
+def synthetic_eigenvals(tmpdir):
+    """
+    Fixture which writes random eigenvalues for the given k-points in bands_inspect HDF5 format, and returns the path of the folder containing the file.
+    """
+    def inner(kpoints_array, num_bands, filename):
+        import h5py
+        import numpy as np
+
+        dirpath = str(tmpdir.mkdir('eigenvals_{}'.format(len(kpoints_array))))
+        with h5py.File(os.path.join(dirpath, filename), 'w') as hdf5_handle:
+            hdf5_handle['type_tag'] = 'bands_inspect.eigenvals_data'
+            kpoints_obj = hdf5_handle.create_group('kpoints_obj')
+            kpoints_obj['type_tag'] = 'bands_inspect.kpoints_explicit'
+            kpoints_obj['kpoints'] = kpoints_array
+            hdf5_handle['eigenvals'] = np.sort(
+                np.random.uniform(size=(len(kpoints_array), num_bands))
+            )
+        return dirpath
+
+    return inner
+
+
+@pytest.fixture
+def generate_calc_job_node():
+    """
+    Fixture which creates a stored CalcJobNode of the given calculation, with the given inputs, options and retrieved files, as if the calculation had run.
+    """
+    def inner(entry_point_name, inputs, options, retrieved_path=None):
+        from aiida.orm import CalcJobNode, Computer, FolderData
+        from aiida.common import LinkType
+
+        node = CalcJobNode(
+            computer=Computer.objects.get(name='localhost'),
+            process_type='aiida.calculations:{}'.format(entry_point_name)
+        )
+        node.set_options(options)
+        for link_label, input_node in inputs.items():
+            input_node.store()
+            node.add_incoming(
+                input_node,
+                link_type=LinkType.INPUT_CALC,
+                link_label=link_label
+            )
+        node.store()
+
+        retrieved = FolderData()
+        if retrieved_path is not None:
+            retrieved.put_object_from_tree(retrieved_path)
+        retrieved.add_incoming(
+            node, link_type=LinkType.CREATE, link_label='retrieved'
+        )
+        retrieved.store()
+        return node
+
+    return inner
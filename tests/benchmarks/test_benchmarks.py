@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Benchmarks for the submission and parsing stages of the tbmodels calculations.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+MODEL_SIZES = [(4, 10), (32, 50), (128, 100)]
+KPOINT_MESHES = [10, 30, 60]
+
+
+def _dry_run(builder):
+    """
+    Prepare the calculation and stage its files through a local transport, without submitting it.
+    """
+    from aiida.engine import run_get_node
+
+    builder.metadata.dry_run = True
+    builder.metadata.store_provenance = False
+    _, node = run_get_node(builder)
+    shutil.rmtree(node.dry_run_info['folder'])
+
+
+@pytest.mark.parametrize('num_orbitals, num_hoppings', MODEL_SIZES)
+def test_prepare_slice(
+    configure,  # pylint: disable=unused-argument
+    benchmark,
+    monkeypatch,
+    tmpdir,
+    synthetic_model,
+    get_tbmodels_process_builder,
+    num_orbitals,
+    num_hoppings
+):
+    """
+    Benchmark the preparation and file staging of the slice calculation, as a function of the model size.
+    """
+    from aiida.orm import List
+    from aiida.plugins import DataFactory
+
+    monkeypatch.chdir(tmpdir)
+    tb_model = DataFactory('tbmodels.model')(
+        file=synthetic_model(num_orbitals, num_hoppings)
+    ).store()
+
+    def setup():
+        builder = get_tbmodels_process_builder('tbmodels.slice')
+        builder.tb_model = tb_model
+        builder.slice_idx = List(list=list(range(num_orbitals // 2)))
+        return (builder, ), {}
+
+    benchmark.pedantic(_dry_run, setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize('mesh_size', KPOINT_MESHES)
+@pytest.mark.parametrize('explicit', [True, False])
+def test_prepare_eigenvals(
+    configure,  # pylint: disable=unused-argument
+    benchmark,
+    monkeypatch,
+    tmpdir,
+    synthetic_model,
+    get_tbmodels_process_builder,
+    mesh_size,
+    explicit
+):
+    """
+    Benchmark the preparation and file staging of the eigenvals calculation, as a function of the number of k-points.
+    """
+    from aiida.plugins import DataFactory
+
+    monkeypatch.chdir(tmpdir)
+    tb_model = DataFactory('tbmodels.model')(file=synthetic_model(4, 10)
+                                             ).store()
+    kpoints = DataFactory('array.kpoints')()
+    kpoints.set_kpoints_mesh([mesh_size] * 3)
+    if explicit:
+        kpoints_explicit = DataFactory('array.kpoints')()
+        kpoints_explicit.set_kpoints(kpoints.get_kpoints_mesh(print_list=True))
+        kpoints = kpoints_explicit
+    kpoints.store()
+
+    def setup():
+        builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+        builder.tb_model = tb_model
+        builder.kpoints = kpoints
+        return (builder, ), {}
+
+    benchmark.pedantic(_dry_run, setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize('num_orbitals, num_hoppings', MODEL_SIZES)
+def test_parse_model(
+    configure,  # pylint: disable=unused-argument
+    benchmark,
+    synthetic_model,
+    generate_calc_job_node,
+    num_orbitals,
+    num_hoppings
+):
+    """
+    Benchmark the model parser, as a function of the model size.
+    """
+    from aiida.plugins import ParserFactory
+
+    model_path = synthetic_model(num_orbitals, num_hoppings)
+    node = generate_calc_job_node(
+        'tbmodels.slice',
+        inputs={},
+        options={
+            'output_filename': os.path.basename(model_path),
+            'model_storage': 'repository'
+        }
+    )
+    parser_class = ParserFactory('tbmodels.model')
+
+    results, _ = benchmark(
+        parser_class.parse_from_node,
+        node,
+        store_provenance=False,
+        retrieved_temporary_folder=os.path.dirname(model_path)
+    )
+    assert 'tb_model' in results
+
+
+@pytest.mark.parametrize('mesh_size', KPOINT_MESHES)
+def test_parse_eigenvals(
+    configure,  # pylint: disable=unused-argument
+    benchmark,
+    synthetic_eigenvals,
+    generate_calc_job_node,
+    mesh_size
+):
+    """
+    Benchmark the eigenvals parser, as a function of the number of k-points.
+    """
+    from aiida.plugins import DataFactory, ParserFactory
+
+    kpoints = DataFactory('array.kpoints')()
+    kpoints.set_kpoints_mesh([mesh_size] * 3)
+    retrieved_path = synthetic_eigenvals(
+        kpoints.get_kpoints_mesh(print_list=True),
+        num_bands=16,
+        filename='eigenvals.hdf5'
+    )
+    node = generate_calc_job_node(
+        'tbmodels.eigenvals',
+        inputs={'kpoints': kpoints},
+        options={
+            'output_filename': 'eigenvals.hdf5',
+            'num_processes': 1
+        },
+    )
+    parser_class = ParserFactory('tbmodels.eigenvals')
+
+    results, _ = benchmark(
+        parser_class.parse_from_node,
+        node,
+        store_provenance=False,
+        retrieved_temporary_folder=retrieved_path
+    )
+    assert 'bands' in results
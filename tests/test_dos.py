@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.dos calculation.
+"""
+
+import pytest
+
+
+def test_dos(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the dos calculation creates a density of states which integrates to the number of bands.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+
+    builder_bands = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder_bands.tb_model = tb_model
+    builder_bands.kpoints = k_mesh
+    num_bands = run_get_node(builder_bands)[0]['bands'].get_bands().shape[1]
+
+    builder = get_tbmodels_process_builder('tbmodels.dos')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    builder.metadata.options.num_energies = 200
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    assert 'bands' not in output
+
+    dos = output['dos']
+    assert isinstance(dos, DataFactory('array.xy'))
+    energies = dos.get_x()[1]
+    dos_values = dos.get_y()[0][1]
+    assert len(energies) == 200
+    assert np.sum(dos_values) * (energies[1] -
+                                 energies[0]) == pytest.approx(num_bands)
+
+
+def test_dos_parallel_inline(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the density of states accumulated from several chunks of k-points is the same as that of the inline function.
+    """
+    import numpy as np
+    from aiida.orm import Float, Int, List
+    from aiida.plugins import DataFactory, CalculationFactory
+    from aiida.engine import run_get_node
+
+    pytest.importorskip('tbmodels')
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    energy_range = [-5., 5.]
+
+    builder = get_tbmodels_process_builder('tbmodels.dos')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    builder.metadata.options.energy_range = energy_range
+    builder.metadata.options.smearing = 0.1
+    builder.metadata.options.num_processes = 2
+    builder.metadata.options.resources = dict(
+        num_machines=1, tot_num_mpiprocs=2
+    )
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+
+    reference = CalculationFactory('tbmodels.dos.inline')(
+        tb_model=tb_model,
+        kpoints=k_mesh,
+        energy_range=List(list=energy_range),
+        num_energies=Int(1000),
+        smearing=Float(0.1)
+    )['dos']
+    assert np.allclose(output['dos'].get_x()[1], reference.get_x()[1])
+    assert np.allclose(
+        output['dos'].get_y()[0][1], reference.get_y()[0][1], atol=1e-6
+    )
+
+
+@pytest.mark.parametrize('num_processes', [1, 2])
+def test_dos_accumulate_remote(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok,
+    num_processes
+):
+    """
+    Test that the density of states accumulated in the job from the irreducible k-points is the same as when the eigenvalues are retrieved.
+    """
+    import numpy as np
+    from aiida.orm import Code
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    energy_range = [-5., 5.]
+
+    builder = get_tbmodels_process_builder('tbmodels.dos')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    builder.metadata.options.energy_range = energy_range
+    builder.metadata.options.band_window = [1, 3]
+    builder.metadata.options.num_processes = num_processes
+    builder.metadata.options.resources = dict(
+        num_machines=1, tot_num_mpiprocs=num_processes
+    )
+    builder.symmetries = DataFactory('singlefile')(
+        file=sample('symmetries.hdf5')
+    )
+    reference = run_get_node(builder)[0]['dos']
+
+    builder.python_code = Code.get_from_string('python')
+    builder.metadata.options.accumulate_remote = True
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    assert np.allclose(output['dos'].get_x()[1], reference.get_x()[1])
+    assert np.allclose(output['dos'].get_y()[0][1], reference.get_y()[0][1])
@@ -7,6 +7,8 @@
 Tests for the tbmodels.eigenvals calculation.
 """
 
+import pytest
+
 
 def test_eigenvals(
     configure_with_daemon,  # pylint: disable=unused-argument
@@ -29,3 +31,451 @@ def test_eigenvals(
 
     output = run(builder)
     assert isinstance(output['bands'], DataFactory('array.bands'))
+
+
+def test_eigenvals_path_labels(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the bands output keeps the cell and labels of explicit k-points.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    kpoints = DataFactory('array.kpoints')()
+    kpoints.set_cell(np.eye(3))
+    kpoints.set_kpoints(
+        np.linspace([0, 0, 0], [0.5, 0, 0], 11), labels=[(0, 'G'), (10, 'X')]
+    )
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    builder.kpoints = kpoints
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+
+    bands = output['bands']
+    assert bands.labels == [(0, 'G'), (10, 'X')]
+    assert np.allclose(bands.cell, np.eye(3))
+
+
+@pytest.mark.parametrize('symlink', [True, False])
+def test_eigenvals_remote_model(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok,
+    symlink
+):
+    """
+    Test that the eigenvals calculation can use the model in the remote folder of a previous calculation.
+    """
+    from aiida.orm import List
+    from aiida.plugins import DataFactory
+    from aiida.engine import run, run_get_node
+
+    builder_slice = get_tbmodels_process_builder('tbmodels.slice')
+    builder_slice.tb_model = DataFactory('singlefile')(
+        file=sample('model.hdf5')
+    )
+    builder_slice.slice_idx = List(list=[0, 3, 2, 1])
+    _, calc_slice = run_get_node(builder_slice)
+    check_calc_ok(calc_slice)
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = calc_slice.outputs.remote_folder
+    builder.metadata.options.symlink_remote_model = symlink
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+    builder.kpoints = k_mesh
+
+    output = run(builder)
+    assert isinstance(output['bands'], DataFactory('array.bands'))
+
+
+def test_eigenvals_parallel(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that splitting the k-points between parallel processes gives the same result as a single process.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    results = []
+    for num_processes in [1, 3]:
+        builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+        builder.tb_model = tb_model
+        builder.kpoints = k_mesh
+        builder.metadata.options.num_processes = num_processes
+        builder.metadata.options.resources = dict(
+            num_machines=1, tot_num_mpiprocs=num_processes
+        )
+        builder.metadata.options.num_threads = 1
+        output, calc = run_get_node(builder)
+        check_calc_ok(calc)
+        results.append(output['bands'])
+
+    assert np.allclose(results[0].get_kpoints(), results[1].get_kpoints())
+    assert np.allclose(results[0].get_bands(), results[1].get_bands())
+
+
+def test_eigenvals_band_window(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the band window option keeps only the selected bands.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    results = []
+    for band_window in [None, [1, 3]]:
+        builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+        builder.tb_model = tb_model
+        builder.kpoints = k_mesh
+        if band_window is not None:
+            builder.metadata.options.band_window = band_window
+        output, calc = run_get_node(builder)
+        check_calc_ok(calc)
+        results.append(output['bands'].get_bands())
+
+    assert np.allclose(results[0][:, 1:3], results[1])
+
+
+def test_eigenvals_energy_window(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the energy window option keeps only the bands which have eigenvalues inside the window, and that the output file is not kept in the retrieved folder.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+    builder.kpoints = k_mesh
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    all_bands = output['bands'].get_bands()
+    assert 'eigenvals.hdf5' not in calc.outputs.retrieved.list_object_names()
+
+    energy_window = [np.median(all_bands) - 0.5, np.median(all_bands) + 0.5]
+    builder.metadata.options.energy_window = energy_window
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    bands = output['bands']
+    first = bands.get_attribute('first_band_index')
+    selected = all_bands[:, first:first + bands.get_bands().shape[1]]
+    assert np.allclose(bands.get_bands(), selected)
+    assert np.all(selected.max(axis=0) >= energy_window[0])
+    assert np.all(selected.min(axis=0) <= energy_window[1])
+
+
+def test_eigenvals_symmetries(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that computing only the irreducible k-points of a symmetrized model and unfolding them gives the same result as the full mesh.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    pytest.importorskip('symmetry_representation')
+    SinglefileData = DataFactory('singlefile')  # pylint: disable=invalid-name
+    symmetries = SinglefileData(file=sample('symmetries.hdf5'))
+
+    builder_sym = get_tbmodels_process_builder('tbmodels.symmetrize')
+    builder_sym.tb_model = SinglefileData(file=sample('model.hdf5'))
+    builder_sym.symmetries = symmetries
+    output_sym, calc_sym = run_get_node(builder_sym)
+    check_calc_ok(calc_sym)
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    results = []
+    for use_symmetries in [False, True]:
+        builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+        builder.tb_model = output_sym['tb_model']
+        builder.kpoints = k_mesh
+        if use_symmetries:
+            builder.symmetries = symmetries
+        output, calc = run_get_node(builder)
+        check_calc_ok(calc)
+        results.append(output['bands'])
+
+    assert results[1].get_attribute('num_irreducible_kpoints') < 64
+    assert np.allclose(results[0].get_kpoints(), results[1].get_kpoints())
+    assert np.allclose(
+        results[0].get_bands(), results[1].get_bands(), atol=1e-6
+    )
+
+
+def test_irreducible_mesh():
+    """
+    Test the reduction of a simple cubic k-point mesh by the cubic point group.
+    """
+    import numpy as np
+    from aiida_tbmodels.calcfunctions.kpoints import get_irreducible_mesh
+
+    generators = [
+        (np.array([[0, -1, 0], [1, 0, 0], [0, 0, 1]]), False),
+        (np.array([[0, 0, 1], [1, 0, 0], [0, 1, 0]]), False),
+        (-np.eye(3), False),
+    ]
+    irreducible, mapping = get_irreducible_mesh([4, 4, 4], [0, 0, 0],
+                                                generators)
+    assert len(irreducible) == 10
+    assert len(mapping) == 64
+    assert np.all(irreducible[mapping] <= np.arange(64))
+
+    irreducible, _ = get_irreducible_mesh([4, 4, 4], [0, 0, 0],
+                                          [(np.eye(3), True)])
+    assert len(irreducible) == 36
+
+
+def test_eigenvals_checkpoints(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok,
+    tmpdir
+):
+    """
+    Test that computing the k-points in consecutive chunks gives the same result as a single chunk, and that the parser records the completed chunks if some are missing.
+    """
+    import h5py
+    import numpy as np
+    from aiida.plugins import DataFactory, ParserFactory
+    from aiida.engine import run_get_node
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    results = []
+    for num_checkpoints in [1, 3]:
+        builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+        builder.tb_model = tb_model
+        builder.kpoints = k_mesh
+        builder.metadata.options.num_checkpoints = num_checkpoints
+        output, calc = run_get_node(builder)
+        check_calc_ok(calc)
+        results.append(output['bands'])
+    assert np.allclose(results[0].get_bands(), results[1].get_bands())
+
+    # Re-parse the chunked calculation with the second chunk missing.
+    for i in [0, 2]:
+        with h5py.File(
+            str(tmpdir.join('eigenvals_{}.hdf5'.format(i))), 'w'
+        ) as hdf5_handle:
+            hdf5_handle['eigenvals'] = np.zeros((21, 4))
+    results, parse_calc = ParserFactory('tbmodels.eigenvals').parse_from_node(
+        calc, store_provenance=False, retrieved_temporary_folder=str(tmpdir)
+    )
+    assert parse_calc.exit_status == calc.process_class.exit_codes.ERROR_INCOMPLETE_CHUNKS.status
+    assert results['completed_chunks'].get_list() == [0, 2]
+
+
+def test_eigenvals_restart_dry_run(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder
+):
+    """
+    Test that a calculation restarted from the remote folder of an interrupted calculation only computes the missing chunk, and copies the completed chunks from the remote folder.
+    """
+    import os
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    builder.metadata.options.num_checkpoints = 3
+    # Simulate an interruption during the second chunk.
+    builder.metadata.options.append_text = 'rm eigenvals_1.hdf5'
+    output, parent_calc = run_get_node(builder)
+    assert parent_calc.exit_status == parent_calc.process_class.exit_codes.ERROR_INCOMPLETE_CHUNKS.status
+    assert output['completed_chunks'].get_list() == [0, 2]
+
+    builder.metadata.options.append_text = ''
+    builder.parent_folder = parent_calc.outputs.remote_folder
+    builder.metadata.dry_run = True
+    _, calc = run_get_node(builder)
+    folder = calc.dry_run_info['folder']
+    with open(
+        os.path.join(folder, calc.dry_run_info['script_filename'])
+    ) as script_file:
+        script = script_file.read()
+    assert 'kpoints_1.hdf5' in script
+    assert 'kpoints_0.hdf5' not in script
+    assert 'kpoints_2.hdf5' not in script
+    assert sorted(
+        filename for filename in os.listdir(folder)
+        if filename.startswith('kpoints')
+    ) == ['kpoints_1.hdf5']
+    with open(
+        os.path.join(folder, '_aiida_remote_copy_list.txt')
+    ) as copy_list_file:
+        copy_list = copy_list_file.read()
+    remote_path = parent_calc.outputs.remote_folder.get_remote_path()
+    for i in [0, 2]:
+        assert os.path.join(
+            remote_path, 'eigenvals_{}.hdf5'.format(i)
+        ) in copy_list
+    assert 'eigenvals_1.hdf5' not in copy_list
+
+
+@pytest.mark.parametrize('num_processes', [1, 2])
+def test_eigenvals_sparse(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok,
+    num_processes
+):
+    """
+    Test that the sparse mode of the eigenvals calculation gives the eigenvalues of the dense diagonalization which are closest to the target energy.
+    """
+    import numpy as np
+    from aiida.orm import Code
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    dense = output['bands'].get_bands()
+    target_energy = float(np.median(dense))
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    builder.python_code = Code.get_from_string('python')
+    builder.metadata.options.num_eigenvals = 2
+    builder.metadata.options.target_energy = target_energy
+    builder.metadata.options.num_processes = num_processes
+    builder.metadata.options.resources = dict(
+        num_machines=1, tot_num_mpiprocs=num_processes
+    )
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    sparse = output['bands'].get_bands()
+
+    assert sparse.shape == (8, 2)
+    for dense_k, sparse_k in zip(dense, sparse):
+        closest = dense_k[np.argsort(abs(dense_k - target_energy))[:2]]
+        assert np.allclose(np.sort(closest), sparse_k)
+
+
+def test_eigenvals_eigenvectors(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the eigenvectors output of the eigenvals calculation is consistent with the band window, when the k-points are split between parallel processes.
+    """
+    import numpy as np
+    from aiida.orm import Code
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    builder.kpoints = k_mesh
+    builder.python_code = Code.get_from_string('python')
+    builder.metadata.options.eigenvectors = True
+    builder.metadata.options.band_window = [1, 3]
+    builder.metadata.options.num_processes = 2
+    builder.metadata.options.resources = dict(
+        num_machines=1, tot_num_mpiprocs=2
+    )
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+
+    eigenvectors = output['eigenvectors']
+    assert isinstance(eigenvectors, DataFactory('tbmodels.eigenvectors'))
+    assert eigenvectors.num_kpoints == 8
+    assert eigenvectors.num_bands == 2
+    assert np.allclose(
+        eigenvectors.get_eigenvals(), output['bands'].get_bands()
+    )
+    assert np.allclose(
+        eigenvectors.get_kpoints(), output['bands'].get_kpoints()
+    )
+
+
+def test_eigenvals_resources(
+    configure,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder
+):
+    """
+    Check that the calculation is rejected if the scheduler resources provide fewer cores than the processes and threads which run in parallel.
+    """
+    from aiida.plugins import DataFactory
+    from aiida.engine import run
+    from aiida.common.exceptions import InputValidationError
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    builder.kpoints = k_mesh
+    builder.metadata.options.num_processes = 2
+    builder.metadata.options.num_threads = 2
+    builder.metadata.options.resources = dict(
+        num_machines=1, tot_num_mpiprocs=2
+    )
+    builder.metadata.dry_run = True
+    with pytest.raises(InputValidationError):
+        run(builder)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.eigenvals_refinement workflow.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+
+def test_eigenvals_refinement(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder
+):
+    """
+    Test that the refinement workflow adds k-points only in a part of the Brillouin zone, that the eigenvalues at these k-points are correct, and that the band structures are merged only once.
+    """
+    import numpy as np
+    from aiida.orm import Code, Float, Int
+    from aiida.plugins import DataFactory, WorkflowFactory
+    from aiida.engine import run, run_get_node
+
+    SinglefileData = DataFactory('singlefile')  # pylint: disable=invalid-name
+    tb_model = SinglefileData(file=sample('model.hdf5'))
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    builder = WorkflowFactory('tbmodels.eigenvals_refinement').get_builder()
+    builder.eigenvals.code = Code.get_from_string('tbmodels')
+    builder.eigenvals.metadata.options = dict(
+        resources=dict(num_machines=1, tot_num_mpiprocs=1), withmpi=False
+    )
+    builder.eigenvals.tb_model = tb_model
+    builder.kpoints = k_mesh
+    builder.num_iterations = Int(2)
+    builder.gap_threshold = Float(0.5)
+    output, node = run_get_node(builder)
+    assert [called.process_label
+            for called in node.called].count('concatenate_bands') == 1
+
+    bands = output['bands']
+    assert isinstance(bands, DataFactory('array.bands'))
+    num_kpoints = len(bands.get_kpoints())
+    assert 4**3 < num_kpoints < 16**3
+
+    reference_kpoints = DataFactory('array.kpoints')()
+    reference_kpoints.set_kpoints(bands.get_kpoints())
+    reference_builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    reference_builder.tb_model = tb_model
+    reference_builder.kpoints = reference_kpoints
+    reference = run(reference_builder)['bands']
+    assert np.allclose(bands.get_bands(), reference.get_bands())
+
+
+def test_eigenvals_refinement_band_window(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the refinement workflow rejects the 'band_window' option, and does not expose the 'symmetries' input.
+    """
+    from aiida.orm import Code
+    from aiida.plugins import DataFactory, WorkflowFactory
+    from aiida.engine import run_get_node
+
+    workflow = WorkflowFactory('tbmodels.eigenvals_refinement')
+    assert 'symmetries' not in workflow.spec().inputs['eigenvals']
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    builder = workflow.get_builder()
+    builder.eigenvals.code = Code.get_from_string('tbmodels')
+    builder.eigenvals.metadata.options = dict(
+        resources=dict(num_machines=1, tot_num_mpiprocs=1),
+        withmpi=False,
+        band_window=[0, 2]
+    )
+    builder.eigenvals.tb_model = DataFactory('singlefile')(
+        file=sample('model.hdf5')
+    )
+    builder.kpoints = k_mesh
+    _, node = run_get_node(builder)
+    assert node.exit_status == workflow.exit_codes.ERROR_INVALID_OPTIONS.status
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.eigenvals_sharded workflow.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+
+def test_eigenvals_sharded(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder
+):
+    """
+    Test that the sharded eigenvals workflow gives the same result as a single eigenvals calculation.
+    """
+    import numpy as np
+    from aiida.orm import Code, Int
+    from aiida.plugins import DataFactory, WorkflowFactory
+    from aiida.engine import run
+
+    SinglefileData = DataFactory('singlefile')  # pylint: disable=invalid-name
+    tb_model = SinglefileData(file=sample('model.hdf5'))
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    builder = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder.tb_model = tb_model
+    builder.kpoints = k_mesh
+    reference = run(builder)['bands']
+
+    builder_sharded = WorkflowFactory('tbmodels.eigenvals_sharded'
+                                      ).get_builder()
+    builder_sharded.eigenvals.code = Code.get_from_string('tbmodels')
+    builder_sharded.eigenvals.metadata.options = dict(
+        resources=dict(num_machines=1, tot_num_mpiprocs=1), withmpi=False
+    )
+    builder_sharded.eigenvals.tb_model = tb_model
+    builder_sharded.kpoints = k_mesh
+    builder_sharded.num_shards = Int(3)
+    output = run(builder_sharded)
+
+    bands = output['bands']
+    assert isinstance(bands, DataFactory('array.bands'))
+    assert np.allclose(bands.get_kpoints(), reference.get_kpoints())
+    assert np.allclose(bands.get_bands(), reference.get_bands())
+
+
+def test_split_merge_kpoints(configure):  # pylint: disable=unused-argument
+    """
+    Test that splitting explicit k-points into shards and merging the bands keeps the cell, labels and weights of the k-points.
+    """
+    import numpy as np
+    from aiida.orm import Int
+    from aiida.plugins import DataFactory
+    from aiida_tbmodels.calcfunctions.kpoints import split_kpoints, merge_bands
+
+    cell = np.diag([1., 2., 3.])
+    kpoints = DataFactory('array.kpoints')()
+    kpoints.set_cell(cell)
+    kpoints.set_kpoints(
+        np.linspace(0, 0.5, 7)[:, np.newaxis] * [1, 0, 0],
+        labels=[(0, 'G'), (6, 'X')],
+        weights=np.arange(1, 8)
+    )
+
+    shards = split_kpoints(kpoints, Int(3))
+    assert len(shards) == 3
+    shard_last = shards['shard_2']
+    assert np.allclose(shard_last.cell, cell)
+    assert shard_last.labels == [(len(shard_last.get_kpoints()) - 1, 'X')]
+    assert shards['shard_1'].labels is None
+
+    bands = {}
+    for label, shard in shards.items():
+        bands[label] = DataFactory('array.bands')()
+        bands[label].set_kpointsdata(shard)
+        bands[label].set_bands(np.zeros((len(shard.get_kpoints()), 2)))
+    merged = merge_bands(kpoints, **bands)
+    assert np.allclose(merged.cell, cell)
+    assert merged.labels == [(0, 'G'), (6, 'X')]
+    assert np.allclose(merged.get_array('weights'), np.arange(1, 8))
+    assert merged.get_bands().shape == (7, 2)
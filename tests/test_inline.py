@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the in-process calcfunctions running the tbmodels commands.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import os
+
+import pytest
+
+pytest.importorskip('tbmodels')
+
+
+def test_eigenvals_inline(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the inline eigenvals function creates a bands output.
+    """
+    from aiida.plugins import CalculationFactory, DataFactory
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    output = CalculationFactory('tbmodels.eigenvals.inline')(
+        tb_model=DataFactory('singlefile')(file=sample('model.hdf5')),
+        kpoints=k_mesh
+    )
+    bands = output['bands']
+    assert isinstance(bands, DataFactory('array.bands'))
+    assert bands.get_bands().shape[0] == 64
+
+
+def test_eigenvals_inline_sparse(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the sparse mode of the inline eigenvals function gives the eigenvalues of the dense diagonalization which are closest to the target energy.
+    """
+    import numpy as np
+    from aiida.orm import Int, Float
+    from aiida.plugins import CalculationFactory, DataFactory
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+    eigenvals_inline = CalculationFactory('tbmodels.eigenvals.inline')
+
+    dense = eigenvals_inline(tb_model=tb_model,
+                             kpoints=k_mesh)['bands'].get_bands()
+    target_energy = float(np.median(dense))
+    sparse = eigenvals_inline(
+        tb_model=tb_model,
+        kpoints=k_mesh,
+        num_eigenvals=Int(2),
+        target_energy=Float(target_energy)
+    )['bands'].get_bands()
+
+    assert sparse.shape == (8, 2)
+    for dense_k, sparse_k in zip(dense, sparse):
+        closest = dense_k[np.argsort(abs(dense_k - target_energy))[:2]]
+        assert np.allclose(np.sort(closest), sparse_k)
+
+
+def test_eigenvals_inline_eigenvectors(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the eigenvectors output of the inline eigenvals function contains the eigenvectors of the Hamiltonian, and is consistent with the band window.
+    """
+    import numpy as np
+    from aiida.orm import Bool, List
+    from aiida.plugins import CalculationFactory, DataFactory
+    from aiida_tbmodels.calcfunctions.inline import load_model
+
+    tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+
+    output = CalculationFactory('tbmodels.eigenvals.inline')(
+        tb_model=tb_model,
+        kpoints=k_mesh,
+        band_window=List(list=[1, 3]),
+        eigenvectors=Bool(True)
+    )
+    eigenvectors = output['eigenvectors']
+    assert isinstance(eigenvectors, DataFactory('tbmodels.eigenvectors'))
+    assert eigenvectors.num_kpoints == 8
+    assert eigenvectors.num_bands == 2
+    assert np.allclose(
+        eigenvectors.get_eigenvals(), output['bands'].get_bands()
+    )
+
+    model = load_model(tb_model)
+    kpoints = eigenvectors.get_kpoints()
+    eigenvals = eigenvectors.get_eigenvals()
+    for i in [0, 5]:
+        vectors = eigenvectors.get_eigenvectors(i)
+        assert vectors.shape == (eigenvectors.num_orbitals, 2)
+        assert np.allclose(
+            np.dot(model.hamilton(kpoints[i]), vectors), vectors * eigenvals[i]
+        )
+
+
+def test_parse_inline(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the inline parse function creates a model output.
+    """
+    from aiida.orm import SinglefileData
+    from aiida.orm.nodes.data.folder import FolderData
+    from aiida.plugins import CalculationFactory
+
+    input_path = sample('bi_wannier_output')
+    input_folder = FolderData()
+    for filename in os.listdir(input_path):
+        input_folder.put_object_from_file(
+            os.path.join(input_path, filename), filename
+        )
+
+    output = CalculationFactory('tbmodels.parse.inline')(
+        wannier_folder=input_folder
+    )
+    assert isinstance(output['tb_model'], SinglefileData)
+
+
+def test_slice_inline(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the inline slice function creates a model output.
+    """
+    from aiida.orm import List, SinglefileData
+    from aiida.plugins import CalculationFactory
+
+    output = CalculationFactory('tbmodels.slice.inline')(
+        tb_model=SinglefileData(file=sample('model.hdf5')),
+        slice_idx=List(list=[0, 3, 2, 1])
+    )
+    assert isinstance(output['tb_model'], SinglefileData)
+
+
+def test_symmetrize_inline(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the inline symmetrize function creates a model output.
+    """
+    from aiida.orm import SinglefileData
+    from aiida.plugins import CalculationFactory
+
+    output = CalculationFactory('tbmodels.symmetrize.inline')(
+        tb_model=SinglefileData(file=sample('model.hdf5')),
+        symmetries=SinglefileData(file=sample('symmetries.hdf5'))
+    )
+    assert isinstance(output['tb_model'], SinglefileData)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the functions writing bands_inspect HDF5 files.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import pytest
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_write_kpoints_explicit(
+    configure,  # pylint: disable=unused-argument
+    tmpdir,
+    chunk_size
+):
+    """
+    Test that explicit k-points written in chunks are read back unchanged.
+    """
+    import h5py
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida_tbmodels.io import write_kpoints
+
+    kpoints_array = np.random.uniform(size=(100, 3))
+    kpoints = DataFactory('array.kpoints')()
+    kpoints.set_kpoints(kpoints_array)
+    kpoints.store()
+
+    filename = str(tmpdir.join('kpoints.hdf5'))
+    write_kpoints(kpoints, filename, 'w', chunk_size=chunk_size)
+    with h5py.File(filename, 'r') as hdf5_handle:
+        assert 'kpoints_explicit' in str(hdf5_handle['type_tag'][()])
+        assert np.allclose(hdf5_handle['kpoints'][()], kpoints_array)
+
+
+def test_write_kpoints_mesh(
+    configure,  # pylint: disable=unused-argument
+    tmpdir
+):
+    """
+    Test that a k-point mesh is written as mesh size and offset only.
+    """
+    import h5py
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida_tbmodels.io import write_kpoints
+
+    kpoints = DataFactory('array.kpoints')()
+    kpoints.set_kpoints_mesh([4, 3, 2], offset=[0.5, 0, 0])
+
+    filename = str(tmpdir.join('kpoints.hdf5'))
+    write_kpoints(kpoints, filename, 'w')
+    with h5py.File(filename, 'r') as hdf5_handle:
+        assert 'kpoints' not in hdf5_handle
+        assert np.all(hdf5_handle['mesh'][()] == [4, 3, 2])
+        assert np.allclose(hdf5_handle['offset'][()], [0.5, 0, 0])
+
+
+@pytest.mark.parametrize('mesh', [True, False])
+def test_write_kpoints_chunk(
+    configure,  # pylint: disable=unused-argument
+    tmpdir,
+    mesh
+):
+    """
+    Test that the chunks of k-points written separately add up to the explicit k-points.
+    """
+    import h5py
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida_tbmodels.io import write_kpoints_chunk, get_chunk_bounds
+    from aiida_tbmodels.calcfunctions.kpoints import get_explicit_kpoints
+
+    kpoints = DataFactory('array.kpoints')()
+    if mesh:
+        kpoints.set_kpoints_mesh([4, 3, 2], offset=[0.5, 0, 0])
+    else:
+        kpoints.set_kpoints(np.random.uniform(size=(23, 3)))
+    kpoints.store()
+
+    chunks = []
+    for i, (start, stop) in enumerate(get_chunk_bounds(24 if mesh else 23, 5)):
+        filename = str(tmpdir.join('kpoints_{}.hdf5'.format(i)))
+        write_kpoints_chunk(kpoints, start, stop, filename, 'w', chunk_size=2)
+        with h5py.File(filename, 'r') as hdf5_handle:
+            chunks.append(hdf5_handle['kpoints'][()])
+    assert np.allclose(np.concatenate(chunks), get_explicit_kpoints(kpoints))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+@pytest.mark.parametrize('band_slice', [slice(None), slice(2, 5)])
+def test_read_eigenvals_chunked(tmpdir, chunk_size, band_slice):
+    """
+    Test that eigenvalues read in chunks into a pre-allocated array match the stored values.
+    """
+    import h5py
+    import numpy as np
+    from aiida_tbmodels.io import get_eigenvals_shape, read_eigenvals_chunked
+
+    eigenvals = np.random.uniform(size=(100, 8))
+    filename = str(tmpdir.join('eigenvals.hdf5'))
+    with h5py.File(filename, 'w') as hdf5_handle:
+        hdf5_handle['eigenvals'] = eigenvals
+
+    with h5py.File(filename, 'r') as hdf5_handle:
+        num_kpoints, num_bands = get_eigenvals_shape(hdf5_handle)
+        out = np.empty((num_kpoints, len(range(num_bands)[band_slice])))
+        read_eigenvals_chunked(
+            hdf5_handle, out, band_slice=band_slice, chunk_size=chunk_size
+        )
+    assert np.allclose(out, eigenvals[:, band_slice])
+
+
+def test_get_band_slice():
+    """
+    Test the selection of bands by band and energy window.
+    """
+    import numpy as np
+    from aiida_tbmodels.io import get_band_slice
+
+    band_min = np.array([-3., -1., 0.5, 2.])
+    band_max = np.array([-2., 0., 1.5, 3.])
+    assert get_band_slice(4) == slice(0, 4)
+    assert get_band_slice(4, band_window=[1, 10]) == slice(1, 4)
+    assert get_band_slice(
+        4, energy_window=[-0.5, 1.], band_extrema=(band_min, band_max)
+    ) == slice(1, 3)
+    assert get_band_slice(
+        4,
+        band_window=[2, 4],
+        energy_window=[-0.5, 1.],
+        band_extrema=(band_min, band_max)
+    ) == slice(2, 3)
+    assert get_band_slice(
+        4, energy_window=[10., 11.], band_extrema=(band_min, band_max)
+    ) == slice(0, 0)
+
+
+@pytest.mark.parametrize('num_orbitals, compressed', [(4, False), (128, True)])
+def test_repack_model_compression(tmpdir, num_orbitals, compressed):
+    """
+    Test that only hopping matrices above the size threshold are compressed when repacking a model.
+    """
+    import h5py
+    import numpy as np
+    from aiida_tbmodels.io import repack_model
+
+    in_path = str(tmpdir.join('model.hdf5'))
+    out_path = str(tmpdir.join('model_repacked.hdf5'))
+    mat = np.zeros((num_orbitals, num_orbitals), dtype=complex)
+    mat[0, 1] = 1.
+    with h5py.File(in_path, 'w') as hdf5_handle:
+        hdf5_handle['size'] = num_orbitals
+        hdf5_handle['dim'] = 3
+        hdf5_handle['pos'] = np.zeros((num_orbitals, 3))
+        hdf5_handle['hop/0/R'] = np.array([1, 0, 0])
+        hdf5_handle['hop/0/mat'] = mat
+
+    repack_model(in_path, out_path, compression='gzip')
+    with h5py.File(out_path, 'r') as hdf5_handle:
+        assert np.allclose(hdf5_handle['hop/0/mat'][()], mat)
+        assert (hdf5_handle['hop/0/mat'].compression == 'gzip') == compressed
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the batch submission helpers.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+
+def test_get_model_nodes(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that model files with the same content are mapped to the same stored node.
+    """
+    from aiida_tbmodels.launch import get_model_nodes
+
+    tb_models = get_model_nodes([sample('model.hdf5'), sample('model.hdf5')])
+    assert tb_models[0].is_stored
+    assert tb_models[0].pk == tb_models[1].pk
+    assert get_model_nodes([sample('model.hdf5')])[0].pk == tb_models[0].pk
+
+
+def test_submit_batch(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    wait_for,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the batch submission runs each distinct set of inputs once.
+    """
+    from aiida.orm import List
+    from aiida.plugins import CalculationFactory
+    from aiida_tbmodels.launch import get_model_nodes, get_inputs_product, submit_batch
+
+    builder = get_tbmodels_process_builder('tbmodels.slice')
+    inputs_list = get_inputs_product({
+        'code': builder.code,
+        'metadata': {
+            'options': dict(builder.metadata.options)
+        }
+    },
+                                     tb_model=get_model_nodes([
+                                         sample('model.hdf5'),
+                                         sample('model.hdf5')
+                                     ]),
+                                     slice_idx=[
+                                         List(list=[0, 3, 2, 1]),
+                                         List(list=[1, 0])
+                                     ])
+    assert len(inputs_list) == 4
+
+    calcs = submit_batch(CalculationFactory('tbmodels.slice'), inputs_list)
+    assert len(calcs) == 4
+    assert calcs[0].pk == calcs[1].pk
+    assert calcs[2].pk == calcs[3].pk
+    assert calcs[0].pk != calcs[2].pk
+    for calc in calcs:
+        wait_for(calc.pk)
+        check_calc_ok(calc)
+
+
+def test_submit_batch_max_active(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    wait_for,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the batch submission does not exceed the maximum number of active processes in the group, and re-uses the processes of previous calls.
+    """
+    from aiida.orm import Group, List
+    from aiida.plugins import CalculationFactory
+    from aiida_tbmodels.launch import get_model_nodes, get_inputs_product, submit_batch
+
+    builder = get_tbmodels_process_builder('tbmodels.slice')
+    inputs_list = get_inputs_product({
+        'code': builder.code,
+        'metadata': {
+            'options': dict(builder.metadata.options)
+        }
+    },
+                                     tb_model=get_model_nodes([
+                                         sample('model.hdf5')
+                                     ]),
+                                     slice_idx=[
+                                         List(list=[0, 3, 2, 1]),
+                                         List(list=[1, 0])
+                                     ])
+    group = Group(label='test_submit_batch_max_active').store()
+    calculation_class = CalculationFactory('tbmodels.slice')
+
+    calcs = submit_batch(
+        calculation_class, inputs_list, group=group, max_active=1
+    )
+    assert calcs[0] is not None
+    assert calcs[1] is None
+    wait_for(calcs[0].pk)
+
+    calcs_next = submit_batch(
+        calculation_class, inputs_list, group=group, max_active=1
+    )
+    assert calcs_next[0].pk == calcs[0].pk
+    assert calcs_next[1] is not None
+    wait_for(calcs_next[1].pk)
+    assert group.count() == 2
+    for calc in calcs_next:
+        check_calc_ok(calc)
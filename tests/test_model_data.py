@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.model data class.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import pytest
+
+
+def _copy_model_reordered(in_path, out_path):
+    """
+    Write a copy of the model with the hoppings in reversed order and compressed datasets.
+    """
+    import h5py
+
+    with h5py.File(in_path,
+                   'r') as in_file, h5py.File(out_path, 'w') as out_file:
+        for key, value in in_file.items():
+            if key != 'hop':
+                out_file[key] = value[()]
+        hop_group = out_file.create_group('hop')
+        for i, entry in enumerate(reversed(list(in_file['hop'].values()))):
+            group = hop_group.create_group(str(i))
+            for key, value in entry.items():
+                group.create_dataset(key, data=value[()], compression='gzip')
+
+
+def test_content_hash(
+    configure,  # pylint: disable=unused-argument
+    sample,
+    tmpdir
+):
+    """
+    Test that equivalent models stored in different files have the same hash.
+    """
+    import h5py
+    from aiida.plugins import DataFactory
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+
+    copy_path = str(tmpdir.join('model_copy.hdf5'))
+    _copy_model_reordered(sample('model.hdf5'), copy_path)
+
+    model = TbModelData(file=sample('model.hdf5'))
+    model_copy = TbModelData(file=copy_path)
+    assert model.content_hash == model_copy.content_hash
+    assert model.get_hash() == model_copy.get_hash()
+
+    other_path = str(tmpdir.join('model_other.hdf5'))
+    _copy_model_reordered(sample('model.hdf5'), other_path)
+    with h5py.File(other_path, 'r+') as hdf5_handle:
+        hdf5_handle['pos'][0, 0] += 0.1
+    model_other = TbModelData(file=other_path)
+    assert model.get_hash() != model_other.get_hash()
+
+
+def test_invalid_model(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that a file which does not contain a model is rejected with a ValueError.
+    """
+    from aiida.plugins import DataFactory
+
+    with pytest.raises(ValueError):
+        DataFactory('tbmodels.model')(file=sample('symmetries.hdf5'))
+
+
+def test_slice_caching(
+    configure,  # pylint: disable=unused-argument
+    sample,
+    tmpdir,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that a slice calculation on an equivalent model is taken from the cache.
+    """
+    from aiida.orm import List
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+    from aiida.manage.caching import enable_caching
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+
+    copy_path = str(tmpdir.join('model_copy.hdf5'))
+    _copy_model_reordered(sample('model.hdf5'), copy_path)
+
+    with enable_caching(identifier='aiida.calculations:tbmodels.slice'):
+        calcs = []
+        for path in [sample('model.hdf5'), copy_path]:
+            builder = get_tbmodels_process_builder('tbmodels.slice')
+            builder.tb_model = TbModelData(file=path)
+            builder.slice_idx = List(list=[0, 3, 2, 1])
+            _, calc = run_get_node(builder)
+            check_calc_ok(calc)
+            calcs.append(calc)
+    assert calcs[1].is_created_from_cache
+
+
+def test_model_attributes(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that the model properties are stored as attributes which can be queried, and that single datasets can be read.
+    """
+    import numpy as np
+    from aiida.orm import QueryBuilder
+    from aiida.plugins import DataFactory
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+
+    model = TbModelData(file=sample('model.hdf5'))
+    model.store()
+    assert model.num_orbitals == 14
+    assert model.occ == 6
+    assert model.num_R > 0
+    assert model.num_hoppings > 0
+    assert model.file_size > 0
+    assert np.allclose(model.cell, 3.029 * (1 - np.eye(3)))
+    assert model.get_dataset('pos').shape == (14, 3)
+
+    query_builder = QueryBuilder()
+    query_builder.append(
+        TbModelData,
+        filters={
+            'attributes.num_orbitals': 14,
+            'attributes.occ': 6
+        },
+        project='id'
+    )
+    assert model.pk in [pk for pk, in query_builder.all()]
+
+
+def test_to_model(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that loading the model gives a TBmodels Model, which is taken from the cache if it is loaded again.
+    """
+    tbmodels = pytest.importorskip('tbmodels')
+    from aiida.plugins import DataFactory
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+
+    model_data = TbModelData(file=sample('model.hdf5'))
+    model = model_data.to_model()
+    assert isinstance(model, tbmodels.Model)
+    assert model.size == model_data.num_orbitals
+    assert TbModelData(file=sample('model.hdf5')).to_model() is model
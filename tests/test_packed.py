@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.packed calculation.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+
+def test_packed(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Test that the tasks of a packed calculation give the same results as separate calculations.
+    """
+    import numpy as np
+    from aiida.orm import List
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+    from aiida_tbmodels.data.model import TbModelData
+    from aiida_tbmodels.launch import get_packed_inputs
+
+    tb_model = TbModelData(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    builder = get_tbmodels_process_builder('tbmodels.packed')
+    inputs = get_packed_inputs([
+        {
+            'command': 'slice',
+            'tb_model': tb_model,
+            'slice_idx': [0, 3, 2, 1]
+        },
+        {
+            'command': 'eigenvals',
+            'tb_model': tb_model,
+            'kpoints': k_mesh
+        },
+    ])
+    assert len(inputs['tb_models']) == 1
+    builder.tasks = inputs['tasks']
+    builder.tb_models = inputs['tb_models']
+    builder.kpoints = inputs['kpoints']
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    assert 'failed_tasks' not in output
+
+    builder_slice = get_tbmodels_process_builder('tbmodels.slice')
+    builder_slice.tb_model = tb_model
+    builder_slice.slice_idx = List(list=[0, 3, 2, 1])
+    output_slice, _ = run_get_node(builder_slice)
+    sliced_model = output_slice['tb_model']
+    assert output['task_0'].content_hash == sliced_model.content_hash
+
+    builder_eigenvals = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder_eigenvals.tb_model = tb_model
+    builder_eigenvals.kpoints = k_mesh
+    output_eigenvals, _ = run_get_node(builder_eigenvals)
+    assert np.allclose(
+        output['task_1'].get_bands(), output_eigenvals['bands'].get_bands()
+    )
+
+
+def test_packed_options(configure):  # pylint: disable=unused-argument
+    """
+    Test that the packed calculation has no 'output_filename' option, since the tasks write to their own files.
+    """
+    from aiida.plugins import CalculationFactory
+
+    options = CalculationFactory('tbmodels.packed'
+                                 ).spec().inputs['metadata']['options']
+    assert 'run_parallel' in options
+    assert 'output_filename' not in options
+
+
+def _get_task_inputs(node):
+    """
+    Get the inputs of the calcfunction which created the given task output.
+    """
+    assert node.creator.process_label == 'unpack_task'
+    return {
+        entry.link_label: entry.node
+        for entry in node.creator.get_incoming().all()
+    }
+
+
+def test_packed_workchain(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+):
+    """
+    Test that the packed workflow returns the result of each task as a node whose inputs are the model and k-points or slice indices of that task.
+    """
+    import numpy as np
+    from aiida.orm import Code
+    from aiida.plugins import DataFactory, WorkflowFactory
+    from aiida.engine import run
+    from aiida_tbmodels.data.model import TbModelData
+    from aiida_tbmodels.launch import get_packed_inputs
+
+    tb_model = TbModelData(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+    k_mesh_small = DataFactory('array.kpoints')()
+    k_mesh_small.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+
+    builder = WorkflowFactory('tbmodels.packed').get_builder()
+    builder.packed.code = Code.get_from_string('tbmodels')
+    builder.packed.metadata.options = dict(
+        resources=dict(num_machines=1, tot_num_mpiprocs=1), withmpi=False
+    )
+    inputs = get_packed_inputs([
+        {
+            'command': 'slice',
+            'tb_model': tb_model,
+            'slice_idx': [0, 3, 2, 1]
+        },
+        {
+            'command': 'eigenvals',
+            'tb_model': tb_model,
+            'kpoints': k_mesh
+        },
+        {
+            'command': 'eigenvals',
+            'tb_model': tb_model,
+            'kpoints': k_mesh_small
+        },
+    ])
+    builder.packed.tasks = inputs['tasks']
+    builder.packed.tb_models = inputs['tb_models']
+    builder.packed.kpoints = inputs['kpoints']
+    output = run(builder)
+    assert 'failed_tasks' not in output
+
+    sliced = _get_task_inputs(output['task_0'])
+    assert sliced['tb_model'].pk == tb_model.pk
+    assert sliced['slice_idx'].get_list() == [0, 3, 2, 1]
+    assert 'kpoints' not in sliced
+
+    for label, kpoints in [('task_1', k_mesh), ('task_2', k_mesh_small)]:
+        bands = output[label]
+        task_inputs = _get_task_inputs(bands)
+        assert task_inputs['tb_model'].pk == tb_model.pk
+        assert task_inputs['kpoints'].pk == kpoints.pk
+        assert 'slice_idx' not in task_inputs
+        assert np.allclose(
+            bands.get_kpoints(), kpoints.get_kpoints_mesh(print_list=True)
+        )
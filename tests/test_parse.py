@@ -77,3 +77,57 @@ def test_parse_submit(
 
     assert isinstance(calc.outputs.tb_model, SinglefileData)
     assert calc.get_hash() == calc.get_extra('_aiida_hash')
+
+
+def test_parse_filtered_files(
+    configure,  # pylint: disable=unused-argument
+    get_tbmodels_parse_builder,  # pylint: disable=redefined-outer-name
+    check_calc_ok
+):
+    """
+    Test that only the files read by 'tbmodels parse' are copied to the calculation folder.
+    """
+    import io
+    from aiida.engine.launch import run_get_node
+
+    builder = get_tbmodels_parse_builder
+    builder.wannier_folder.put_object_from_filelike(
+        io.BytesIO(b'unused'), 'bi.amn', mode='wb', encoding=None
+    )
+    _, calc = run_get_node(builder)
+    check_calc_ok(calc)
+
+    remote_files = calc.outputs.remote_folder.listdir()
+    assert 'bi_hr.dat' in remote_files
+    assert 'bi.amn' not in remote_files
+
+
+@pytest.mark.parametrize('symlink', [False, True])
+def test_parse_remote_folder(
+    configure,  # pylint: disable=unused-argument
+    get_tbmodels_parse_builder,  # pylint: disable=redefined-outer-name
+    check_calc_ok,
+    symlink
+):
+    """
+    Test the parse calculation when the Wannier90 output is given as the remote folder of a previous calculation.
+    """
+    from aiida.orm import Str
+    from aiida.engine.launch import run_get_node
+
+    builder = get_tbmodels_parse_builder
+    _, parent_calc = run_get_node(builder)
+    check_calc_ok(parent_calc)
+
+    builder.wannier_folder = parent_calc.outputs.remote_folder
+    builder.wannier_prefix = Str('bi')
+    builder.metadata.options.symlink_wannier_files = symlink
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+
+    remote_files = calc.outputs.remote_folder.listdir()
+    assert 'bi_hr.dat' in remote_files
+    assert 'bi_wsvec.dat' in remote_files
+    assert 'bi_centres.xyz' not in remote_files
+    assert output['tb_model'
+                  ].content_hash == parent_calc.outputs.tb_model.content_hash
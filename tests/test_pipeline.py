@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.pipeline calculation.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import os
+
+
+def test_pipeline(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Run a parse -> slice -> eigenvals pipeline, and check that the intermediate models and the bands are returned.
+    """
+    from aiida.orm import List, SinglefileData
+    from aiida.orm.nodes.data.folder import FolderData
+    from aiida.plugins import DataFactory
+    from aiida.engine import run_get_node
+
+    builder = get_tbmodels_process_builder('tbmodels.pipeline')
+
+    input_path = sample('bi_wannier_output')
+    input_folder = FolderData()
+    for filename in os.listdir(input_path):
+        input_folder.put_object_from_file(
+            os.path.join(input_path, filename), filename
+        )
+    builder.wannier_folder = input_folder
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+    builder.kpoints = k_mesh
+
+    builder.steps = List(
+        list=[{
+            'command': 'parse'
+        }, {
+            'command': 'slice',
+            'slice_idx': [0, 2, 1, 3]
+        }, {
+            'command': 'eigenvals'
+        }]
+    )
+
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    assert isinstance(output['tb_model_step_0'], SinglefileData)
+    assert isinstance(output['tb_model_step_1'], SinglefileData)
+    assert output['bands'].get_bands().shape == (8, 4)
+    # The output files are not kept in the retrieved folder, since their
+    # content is stored in the output nodes.
+    retrieved_files = calc.outputs.retrieved.list_object_names()
+    assert not any(filename.endswith('.hdf5') for filename in retrieved_files)
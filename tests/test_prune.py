@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# © 2017-2019, ETH Zurich, Institut für Theoretische Physik
+# Author: Dominik Gresch <greschd@gmx.ch>
+"""
+Tests for the tbmodels.prune calcfunction.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    'prune_inputs', [{
+        'threshold': 0.01
+    }, {
+        'relative_threshold': 0.01
+    }, {
+        'cutoff': 8.
+    }]
+)
+def test_prune(
+    configure,  # pylint: disable=unused-argument
+    sample,
+    prune_inputs
+):
+    """
+    Test that pruning removes hoppings, and that the band error is reported.
+    """
+    from aiida.orm import Float
+    from aiida.plugins import CalculationFactory, DataFactory
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+    tb_model = TbModelData(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([4, 4, 4], offset=[0, 0, 0])
+
+    output = CalculationFactory('tbmodels.prune')(
+        tb_model=tb_model,
+        kpoints=k_mesh,
+        **{key: Float(value)
+           for key, value in prune_inputs.items()}
+    )
+    pruned = output['tb_model']
+    assert isinstance(pruned, TbModelData)
+    assert pruned.num_orbitals == tb_model.num_orbitals
+    assert pruned.num_hoppings < tb_model.num_hoppings
+    assert pruned.num_R < tb_model.num_R
+    assert 0 < output['band_error'].value < 1
+
+
+def test_prune_nothing(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that pruning without threshold or cutoff gives an equivalent model.
+    """
+    from aiida.plugins import CalculationFactory, DataFactory
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+    tb_model = TbModelData(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+
+    output = CalculationFactory('tbmodels.prune'
+                                )(tb_model=tb_model, kpoints=k_mesh)
+    assert output['tb_model'].num_hoppings == tb_model.num_hoppings
+    assert output['band_error'].value == pytest.approx(0)
+
+
+def test_prune_sparse(
+    configure,  # pylint: disable=unused-argument
+    sample
+):
+    """
+    Test that storing the pruned model in CSR format gives the same hoppings as the dense format of the input model.
+    """
+    from aiida.orm import Bool, Float
+    from aiida.plugins import CalculationFactory, DataFactory
+
+    TbModelData = DataFactory('tbmodels.model')  # pylint: disable=invalid-name
+    tb_model = TbModelData(file=sample('model.hdf5'))
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+    prune = CalculationFactory('tbmodels.prune')
+
+    dense = prune(tb_model=tb_model, kpoints=k_mesh, threshold=Float(0.01))
+    sparse = prune(
+        tb_model=tb_model,
+        kpoints=k_mesh,
+        threshold=Float(0.01),
+        sparse=Bool(True)
+    )
+    with sparse['tb_model'].open_hdf5() as hdf5_handle:
+        assert hdf5_handle['sparse'][()]
+    assert sparse['tb_model'].num_hoppings == dense['tb_model'].num_hoppings
+    assert sparse['tb_model'].num_R == dense['tb_model'].num_R
+    assert sparse['band_error'].value == pytest.approx(
+        dense['band_error'].value
+    )
@@ -34,3 +34,97 @@ def test_slice(
     output, calc = run_get_node(builder)
     check_calc_ok(calc)
     assert isinstance(output['tb_model'], SinglefileData)
+
+
+def test_slice_remote_storage(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Run the tbmodels.slice calculation with the output model kept on the remote, and check that it can be used as input for another calculation.
+    """
+    from aiida.plugins import DataFactory
+    from aiida.orm import List, RemoteData
+    from aiida.engine import run_get_node
+
+    builder = get_tbmodels_process_builder('tbmodels.slice')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    builder.slice_idx = List(list=[0, 3, 2, 1])
+    builder.metadata.options.model_storage = 'remote'
+
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    tb_model = output['tb_model']
+    assert isinstance(tb_model, RemoteData)
+    assert tb_model.get_attribute('filename') == 'model_out.hdf5'
+    assert len(tb_model.get_attribute('sha256')) == 64
+    assert tb_model.get_attribute('size') > 0
+
+    builder_eigenvals = get_tbmodels_process_builder('tbmodels.eigenvals')
+    builder_eigenvals.tb_model = tb_model
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([2, 2, 2], offset=[0, 0, 0])
+    builder_eigenvals.kpoints = k_mesh
+    output_eigenvals, calc_eigenvals = run_get_node(builder_eigenvals)
+    check_calc_ok(calc_eigenvals)
+    assert output_eigenvals['bands'].get_bands().shape == (8, 4)
+
+
+def test_slice_compressed(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Run the tbmodels.slice calculation with a compressed single-precision output model.
+    """
+    import h5py
+    import numpy as np
+    from aiida.plugins import DataFactory
+    from aiida.orm import List
+    from aiida.engine import run_get_node
+
+    builder = get_tbmodels_process_builder('tbmodels.slice')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    builder.slice_idx = List(list=[0, 3, 2, 1])
+    builder.metadata.options.model_compression = 'gzip'
+    builder.metadata.options.model_compression_opts = 9
+    builder.metadata.options.model_float32 = True
+
+    output, calc = run_get_node(builder)
+    check_calc_ok(calc)
+    with output['tb_model'].open(mode='rb') as model_file:
+        with h5py.File(model_file, 'r') as hdf5_handle:
+            for hop_entry in hdf5_handle['hop'].values():
+                # The hopping matrices of the sample model are too small
+                # to be compressed.
+                assert hop_entry['mat'].compression is None
+                assert hop_entry['mat'].dtype == np.complex64
+
+
+def test_slice_remote_storage_layout(
+    configure,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder
+):
+    """
+    Check that the storage layout options are rejected for a model kept on the remote, since the layout is only applied after retrieval.
+    """
+    import pytest
+    from aiida.plugins import DataFactory
+    from aiida.orm import List
+    from aiida.engine import run
+    from aiida.common.exceptions import InputValidationError
+
+    builder = get_tbmodels_process_builder('tbmodels.slice')
+    builder.tb_model = DataFactory('singlefile')(file=sample('model.hdf5'))
+    builder.slice_idx = List(list=[0, 3, 2, 1])
+    builder.metadata.options.model_storage = 'remote'
+    builder.metadata.options.model_compression = 'gzip'
+    builder.metadata.dry_run = True
+
+    with pytest.raises(InputValidationError):
+        run(builder)
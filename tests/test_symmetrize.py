@@ -9,6 +9,8 @@ Tests for the tbmodels.symmetrize calculation.
 
 from __future__ import division, print_function, unicode_literals
 
+import pytest
+
 
 def test_symmetrize(
     configure_with_daemon,  # pylint: disable=unused-argument
@@ -33,3 +35,44 @@ def test_symmetrize(
     output, calc = run_get_node(builder)
     check_calc_ok(calc)
     assert isinstance(output['tb_model'], SinglefileData)
+
+
+def test_symmetrize_expanded(
+    configure_with_daemon,  # pylint: disable=unused-argument
+    sample,
+    get_tbmodels_process_builder,
+    check_calc_ok
+):
+    """
+    Tests that symmetrizing with the expanded full group gives the same model as symmetrizing with the original symmetries.
+    """
+    import numpy as np
+    from aiida.plugins import DataFactory, CalculationFactory
+    from aiida.engine import run_get_node
+
+    pytest.importorskip('symmetry_representation')
+    SinglefileData = DataFactory('singlefile')  # pylint: disable=invalid-name
+    symmetries = SinglefileData(file=sample('symmetries.hdf5'))
+    expanded = CalculationFactory('tbmodels.expand_symmetries')(
+        symmetries=symmetries
+    )['symmetries']
+    assert expanded.get_attribute('full_group')
+    assert expanded.get_attribute('num_operations') > 1
+
+    k_mesh = DataFactory('array.kpoints')()
+    k_mesh.set_kpoints_mesh([3, 3, 3], offset=[0, 0, 0])
+    results = []
+    for sym in [symmetries, expanded]:
+        builder = get_tbmodels_process_builder('tbmodels.symmetrize')
+        builder.tb_model = SinglefileData(file=sample('model.hdf5'))
+        builder.symmetries = sym
+        output, calc = run_get_node(builder)
+        check_calc_ok(calc)
+
+        builder_eigenvals = get_tbmodels_process_builder('tbmodels.eigenvals')
+        builder_eigenvals.tb_model = output['tb_model']
+        builder_eigenvals.kpoints = k_mesh
+        output_eigenvals, calc_eigenvals = run_get_node(builder_eigenvals)
+        check_calc_ok(calc_eigenvals)
+        results.append(output_eigenvals['bands'].get_bands())
+    assert np.allclose(results[0], results[1], atol=1e-6)